@@ -3,21 +3,51 @@
 
 from __future__ import annotations
 
+import bisect
+import codecs
+import copy
 import csv
+import glob
+import gzip
+import hashlib
+import heapq
+import itertools
 import json
+import math
 import os
+import pickle
 import re
+import shutil
+import stat
 import statistics
 import subprocess
-from collections import defaultdict
+import time
+from array import array
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from socketserver import ThreadingMixIn, UnixStreamServer
 from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape as xml_escape
 
 import click
 
+try:
+    import numpy
+except ImportError:  # numpy only accelerates group-by reductions and column statistics
+    numpy = None
+
 
 SVG_NS = {"svg": "http://www.w3.org/2000/svg", "xlink": "http://www.w3.org/1999/xlink"}
+GZIP_MAGIC = b"\x1f\x8b"
+# Bump whenever a parser's normalized output changes shape so stale cache entries are ignored.
+PARSE_CACHE_VERSION = 7
+FOLDED_SUFFIXES = {".folded", ".collapsed"}
+JSON_WS_RE = re.compile(r"[ \t\n\r]*")
 
 
 def percentile(values: List[float], pct: float) -> float:
@@ -37,6 +67,88 @@ def percentile(values: List[float], pct: float) -> float:
     return ordered[low] * (1.0 - frac) + ordered[high] * frac
 
 
+class DDSketch:
+    """Mergeable quantile sketch with bounded relative error (DDSketch).
+
+    Non-negative values land in logarithmic buckets of ratio
+    gamma = (1 + a) / (1 - a), so every quantile is returned within a
+    relative error `a` of the exact answer while memory grows with
+    log(max / min) instead of the number of values. Past `max_bins` the
+    lowest buckets are collapsed, which only blurs the smallest values.
+    """
+
+    MIN_VALUE = 1e-12
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.bins: Dict[int, float] = {}
+        self.zero_count = 0.0
+        self.count = 0.0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        self.count += weight
+        self.sum += value * weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= self.MIN_VALUE:
+            self.zero_count += weight
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[key] = self.bins.get(key, 0.0) + weight
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def merge(self, other: "DDSketch") -> None:
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        for key, weight in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0.0) + weight
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min, 0.0)
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                value = 2.0 * self.gamma**key / (self.gamma + 1.0)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def _collapse(self) -> None:
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_bins
+        folded = sum(self.bins.pop(key) for key in keys[: excess + 1])
+        self.bins[keys[excess]] = self.bins.get(keys[excess], 0.0) + folded
+
+
+def sketch_percentiles(sketch: DDSketch) -> Dict[str, float]:
+    """The p50_s/p95_s/p99_s/max_s entry keys format_trace reads, from a duration sketch."""
+    return {"p50_s": sketch.quantile(0.5), "p95_s": sketch.quantile(0.95), "p99_s": sketch.quantile(0.99), "max_s": sketch.max}
+
+
 def parse_float(value) -> float | None:
     if value is None:
         return None
@@ -56,7 +168,34 @@ def normalize_key(key: str) -> str:
     return re.sub(r"[^a-z0-9]+", "_", key.strip().lower()).strip("_")
 
 
+# Workloads for PyTorch profiler (Kineto) event categories; gpu_memcpy and the
+# CUDA runtime/driver categories still look at the name for direction and syncs.
+KINETO_WORKLOADS = {
+    "kernel": "GPU Compute",
+    "gpu_memset": "Memset",
+    "cpu_op": "CPU Op",
+    "python_function": "Python",
+    "user_annotation": "Annotation",
+    "gpu_user_annotation": "Annotation",
+}
+KINETO_RUNTIME_CATEGORIES = {"cuda_runtime", "cuda_driver"}
+HOST_SYNC_NAMES = {
+    "cudaDeviceSynchronize",
+    "cudaStreamSynchronize",
+    "cudaEventSynchronize",
+    "cudaStreamWaitEvent",
+    "cudaMemcpy",
+    "aten::item",
+    "aten::_local_scalar_dense",
+}
+
+
 def classify_workload(name: str, category: str = "") -> str:
+    kinds = category.lower()
+    if kinds in KINETO_WORKLOADS:
+        return KINETO_WORKLOADS[kinds]
+    if kinds in KINETO_RUNTIME_CATEGORIES:
+        return "Synchronization" if name in HOST_SYNC_NAMES or "Synchronize" in name else "CPU Runtime"
     text = f"{name} {category}".lower()
     if any(token in text for token in ("memcpy hto d", "memcpy h2d", "htod", "host to device", "[cuda memcpy hto d]")):
         return "Memcpy HtoD"
@@ -94,27 +233,1641 @@ def bandwidth_to_human(num_bytes: float, duration_s: float) -> str:
     return f"{gbps:.2f} GB/s"
 
 
+def seconds_to_human(value: float, signed: bool = False) -> str:
+    sign = "+" if signed and value > 0 else ""
+    if abs(value) >= 1.0 or value == 0.0:
+        return f"{sign}{value:.3f}s"
+    if abs(value) >= 1e-3:
+        return f"{sign}{value * 1e3:.3f}ms"
+    return f"{sign}{value * 1e6:.1f}us"
+
+
+def unit_amount(value: float, unit: str, signed: bool = False) -> str:
+    """Format a normalized-profile value: seconds, samples, SVG pixel widths, bytes, or a raw pprof unit."""
+    if unit == "s":
+        return seconds_to_human(value, signed)
+    sign = "+" if signed and value > 0 else ""
+    if unit == "bytes":
+        return sign + bytes_to_human(value)
+    if unit == "width":
+        return f"{sign}{value:,.1f} px"
+    return f"{sign}{value:,.0f} {unit}"
+
+
+def open_text(path: Path):
+    """Open a text file, transparently decompressing gzip input."""
+    with path.open("rb") as fh:
+        magic = fh.read(2)
+    if magic == GZIP_MAGIC:
+        return gzip.open(path, "rt", encoding="utf-8")
+    return path.open("r", encoding="utf-8")
+
+
+class TraceEventStream:
+    """Incrementally decode the traceEvents array of a Chrome/Perfetto trace JSON file.
+
+    Only one event is materialized at a time, so memory stays bounded by the
+    chunk size and the largest single event rather than the whole document.
+    """
+
+    def __init__(self, fh, chunk_size: int = 1 << 20):
+        self._fh = fh
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._base = 0
+        self._eof = False
+
+    def __iter__(self):
+        self.seek_events()
+        yield from self.iter_array_items()
+
+    def seek_events(self) -> int:
+        """Advance to just inside the traceEvents array and return that character offset."""
+        first = self._peek()
+        if first == "[":
+            self._pos += 1
+            return self._base + self._pos
+        if first != "{":
+            raise click.ClickException("Unsupported JSON structure. Expected Perfetto/Chrome trace JSON with traceEvents.")
+        self._pos += 1
+        while True:
+            char = self._peek()
+            if char == ",":
+                self._pos += 1
+                continue
+            if char in {"}", ""}:
+                raise click.ClickException("Unsupported JSON structure. Expected Perfetto/Chrome trace JSON with traceEvents.")
+            key = self._decode_value()
+            if self._peek() != ":":
+                raise click.ClickException(f"Malformed trace JSON near object key {key!r}.")
+            self._pos += 1
+            if key == "traceEvents":
+                if self._peek() != "[":
+                    raise click.ClickException("Unsupported JSON structure. Expected traceEvents to be an array.")
+                self._pos += 1
+                return self._base + self._pos
+            self._peek()
+            self._decode_value()
+
+    def iter_array_items(self):
+        """Yield array elements from the current position, which must be inside the array."""
+        while True:
+            char = self._peek()
+            if char == "]":
+                self._pos += 1
+                return
+            if char == "":
+                # Chrome's JSON Array Format allows the closing bracket to be missing.
+                return
+            if char == ",":
+                self._pos += 1
+                continue
+            yield self._decode_value()
+
+    def _fill(self) -> bool:
+        chunk = self._fh.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._base += self._pos
+        self._buf = self._buf[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self._pos = JSON_WS_RE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _decode_value(self):
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A value ending exactly at the buffer edge may be a truncated number.
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as exc:
+                if self._eof:
+                    raise click.ClickException(f"Malformed trace JSON: {exc}") from exc
+            self._fill()
+
+
+class ByteRangeText:
+    """Read a byte range of a UTF-8 file as text, in chunks."""
+
+    def __init__(self, path: Path, start: int, end: int):
+        self._fh = path.open("rb")
+        self._fh.seek(start)
+        self._remaining = end - start
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def read(self, size: int) -> str:
+        while self._remaining > 0:
+            chunk = self._fh.read(min(size, self._remaining))
+            if not chunk:
+                break
+            self._remaining -= len(chunk)
+            text = self._decoder.decode(chunk)
+            if text:
+                return text
+        self._remaining = 0
+        return self._decoder.decode(b"", final=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._fh.close()
+
+
+EVENT_BOUNDARY_RE = re.compile(rb"\}\s*,\s*\{")
+
+
+def plan_trace_shards(path: Path, shard_count: int, window: int = 1 << 16) -> List[tuple]:
+    """Split an uncompressed trace's traceEvents array into byte ranges at event boundaries.
+
+    Returns an empty list for gzip input, which cannot be seeked into. Candidate
+    boundaries are `}, {` sequences; each is confirmed by decoding the object
+    that follows and checking that it is a trace event (it carries "ph") that is
+    itself followed by `,` or `]`.
+    """
+    with path.open("rb") as fh:
+        if fh.read(2) == GZIP_MAGIC:
+            return []
+    with path.open("r", encoding="latin-1") as fh:
+        # latin-1 maps bytes 1:1 onto characters, so character offsets are byte offsets.
+        start = TraceEventStream(fh).seek_events()
+    size = path.stat().st_size
+    bounds = [start]
+    with path.open("rb") as fh:
+        for idx in range(1, shard_count):
+            boundary = _next_event_boundary(fh, max(start + (size - start) * idx // shard_count, bounds[-1] + 1), size, window)
+            if boundary is None:
+                break
+            if boundary > bounds[-1]:
+                bounds.append(boundary)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _next_event_boundary(fh, offset: int, size: int, window: int) -> int | None:
+    decoder = json.JSONDecoder()
+    while offset < size:
+        fh.seek(offset)
+        data = fh.read(window)
+        match = EVENT_BOUNDARY_RE.search(data)
+        if match is None:
+            if len(data) < window:
+                return None
+            offset += len(data) - 8
+            continue
+        candidate = offset + match.end() - 1
+        span = window
+        while True:
+            fh.seek(candidate)
+            text = fh.read(span).decode("utf-8", errors="ignore")
+            try:
+                event, end = decoder.raw_decode(text)
+            except json.JSONDecodeError:
+                if candidate + span >= size or span >= 1 << 26:
+                    event, end = None, 0
+                    break
+                span *= 4
+                continue
+            break
+        tail = JSON_WS_RE.match(text, end).end()
+        if isinstance(event, dict) and "ph" in event and tail < len(text) and text[tail] in ",]":
+            return candidate
+        offset = candidate + 1
+    return None
+
+
+def _parse_trace_shard(json_path: Path, start: int, end: int, rows: bool = True) -> tuple:
+    """Worker: a shard's table columns, or with rows=False only its partial TraceSummary."""
+    parser = PerfettoTraceParser(json_path, rows=rows)
+    with ByteRangeText(json_path, start, end) as fh:
+        events = TraceEventStream(fh).iter_array_items()
+        return parser._ingest(events) if rows else parser._ingest_summary(events)
+
+
+class TraceSummary:
+    """Per-workload, per-track, and per-name totals consumed by format_trace."""
+
+    def __init__(self):
+        self.event_count = 0
+        self.total_time_s = 0.0
+        self.by_workload: Dict[str, float] = {}
+        self.by_workload_bytes: Dict[str, float] = {}
+        self.by_track: Dict[str, float] = {}
+        self.by_name: Dict[str, Dict] = {}
+        self.transfer_count = 0
+        self.transfer_time_s = 0.0
+        self.transfer_bytes = 0.0
+        self.nested = False
+        self.total_self_s = 0.0
+        # Duration sketches per name and per track; empty when percentiles came from SQL.
+        self.name_sketches: Dict[str, DDSketch] = {}
+        self.track_sketches: Dict[str, DDSketch] = {}
+
+    def merge(self, other: "TraceSummary") -> None:
+        """Fold another partial summary in; merge in event order to keep last-seen workloads."""
+        self.event_count += other.event_count
+        self.total_time_s += other.total_time_s
+        self.nested = self.nested or other.nested
+        self.total_self_s += other.total_self_s
+        for target, source in (
+            (self.by_workload, other.by_workload),
+            (self.by_workload_bytes, other.by_workload_bytes),
+            (self.by_track, other.by_track),
+        ):
+            for key, value in source.items():
+                target[key] = target.get(key, 0.0) + value
+        for name, entry in other.by_name.items():
+            current = self.by_name.get(name)
+            if current is None:
+                self.by_name[name] = dict(entry)
+                continue
+            current["time_s"] += entry["time_s"]
+            current["self_s"] += entry["self_s"]
+            current["count"] += entry["count"]
+            current["bytes"] += entry["bytes"]
+            current["workload"] = entry["workload"]
+        self.transfer_count += other.transfer_count
+        self.transfer_time_s += other.transfer_time_s
+        self.transfer_bytes += other.transfer_bytes
+        for target, source in ((self.name_sketches, other.name_sketches), (self.track_sketches, other.track_sketches)):
+            for key, sketch in source.items():
+                if key in target:
+                    target[key].merge(sketch)
+                else:
+                    target[key] = copy.deepcopy(sketch)
+        for name, sketch in self.name_sketches.items():
+            self.by_name[name].update(sketch_percentiles(sketch))
+
+
+class StringTable:
+    """Intern repeated strings to dense integer ids."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def intern(self, value: str) -> int:
+        idx = self.ids.get(value)
+        if idx is None:
+            idx = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return idx
+
+    def __getitem__(self, idx: int) -> str:
+        return self.values[idx]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class NameFilter:
+    """pprof-style --focus/--ignore/--hide regexes over frame names.
+
+    Each pattern is searched at most once per distinct name: verdicts are
+    cached by name and handed out per interned id, so filtering a table costs
+    one pass over its string table rather than a regex per event or sample.
+    """
+
+    def __init__(self, focus: str | None = None, ignore: str | None = None, hide: str | None = None):
+        try:
+            self.focus = re.compile(focus) if focus else None
+            self.ignore = re.compile(ignore) if ignore else None
+            self.hide = re.compile(hide) if hide else None
+        except re.error as exc:
+            raise ValueError(f"Invalid regex: {exc}") from None
+        self._cache: Dict[str, tuple] = {}
+
+    def __bool__(self) -> bool:
+        return self.focus is not None or self.ignore is not None or self.hide is not None
+
+    def match(self, name: str) -> tuple:
+        """(focus hit, ignore hit, hide hit) for one name."""
+        verdict = self._cache.get(name)
+        if verdict is None:
+            verdict = self._cache[name] = tuple(
+                pattern is not None and pattern.search(name) is not None for pattern in (self.focus, self.ignore, self.hide)
+            )
+        return verdict
+
+    def verdicts(self, table: StringTable) -> List[tuple]:
+        return [self.match(name) for name in table.values]
+
+    def keep(self, name: str) -> bool:
+        """Whether a name survives on its own, for inputs without call stacks."""
+        focus_hit, ignore_hit, hide_hit = self.match(name)
+        return (focus_hit or self.focus is None) and not ignore_hit and not hide_hit
+
+
+def group_sum(ids: array, weights: array | None, size: int) -> List[float]:
+    """Sum weights per dense id, or count rows per id when weights is None."""
+    if numpy is not None and len(ids):
+        keys = numpy.frombuffer(ids, dtype=f"u{ids.itemsize}")
+        values = numpy.frombuffer(weights, dtype=numpy.float64) if weights is not None else None
+        return numpy.bincount(keys, weights=values, minlength=size).tolist()
+    if weights is None:
+        counts = [0] * size
+        for key in ids:
+            counts[key] += 1
+        return counts
+    totals = [0.0] * size
+    for key, value in zip(ids, weights):
+        totals[key] += value
+    return totals
+
+
+def group_sketches(ids: array, values: array, size: int) -> List[DDSketch | None]:
+    """One DDSketch of values per dense id (None when absent)."""
+    sketches: List[DDSketch | None] = [None] * size
+    if numpy is not None and len(ids):
+        keys = numpy.frombuffer(ids, dtype=f"u{ids.itemsize}").astype(numpy.int64)
+        column = numpy.frombuffer(values, dtype=numpy.float64)
+        counts = numpy.bincount(keys, minlength=size)
+        present = numpy.flatnonzero(counts).tolist()
+        sums = numpy.bincount(keys, weights=column, minlength=size)
+        mins = numpy.full(size, numpy.inf)
+        maxs = numpy.full(size, -numpy.inf)
+        numpy.minimum.at(mins, keys, column)
+        numpy.maximum.at(maxs, keys, column)
+        zero = column <= DDSketch.MIN_VALUE
+        zeros = numpy.bincount(keys[zero], minlength=size)
+        for key in present:
+            sketch = sketches[key] = DDSketch()
+            sketch.count, sketch.sum = float(counts[key]), float(sums[key])
+            sketch.min, sketch.max, sketch.zero_count = float(mins[key]), float(maxs[key]), float(zeros[key])
+        positive = ~zero
+        if positive.any():
+            bins = numpy.ceil(numpy.log(column[positive]) / sketches[present[0]].log_gamma).astype(numpy.int64)
+            low = int(bins.min())
+            span = int(bins.max()) - low + 1
+            pairs, pair_counts = numpy.unique(keys[positive] * span + (bins - low), return_counts=True)
+            for pair, count in zip(pairs.tolist(), pair_counts.tolist()):
+                key, offset = divmod(pair, span)
+                sketches[key].bins[offset + low] = float(count)
+            for sketch in sketches:
+                if sketch is not None and len(sketch.bins) > sketch.max_bins:
+                    sketch._collapse()
+        return sketches
+    for key, value in zip(ids, values):
+        sketch = sketches[key]
+        if sketch is None:
+            sketch = sketches[key] = DDSketch()
+        sketch.add(value)
+    return sketches
+
+
+def group_last(ids: array, values: array, size: int) -> List[int]:
+    """Return the value of the last row seen for each dense id (-1 when absent)."""
+    if numpy is not None and len(ids):
+        keys = numpy.frombuffer(ids, dtype=f"u{ids.itemsize}")
+        column = numpy.frombuffer(values, dtype=f"u{values.itemsize}")
+        unique, first_reversed = numpy.unique(keys[::-1], return_index=True)
+        result = numpy.full(size, -1, dtype=numpy.int64)
+        result[unique] = column[len(keys) - 1 - first_reversed]
+        return result.tolist()
+    result = [-1] * size
+    for key, value in zip(ids, values):
+        result[key] = value
+    return result
+
+
+def take_rows(column: array, rows: array) -> array:
+    """Gather the given row indices of a column into a new array of the same type."""
+    if numpy is not None and len(rows):
+        values = numpy.frombuffer(column, dtype=column.typecode)[numpy.frombuffer(rows, dtype=rows.typecode)]
+        return array(column.typecode, values.tobytes())
+    return array(column.typecode, (column[row] for row in rows))
+
+
+def remap_ids(ids: array, mapping: List[int]) -> array:
+    """Translate interned ids from one StringTable into another."""
+    if numpy is not None and len(ids):
+        remapped = numpy.asarray(mapping, dtype=ids.typecode)[numpy.frombuffer(ids, dtype=ids.typecode)]
+        return array(ids.typecode, remapped.tobytes())
+    return array(ids.typecode, (mapping[key] for key in ids))
+
+
+class EventTable:
+    """Columnar trace event store shared by every trace parser.
+
+    Names, categories, tracks, and workloads are interned once and stored as
+    uint32 ids next to float64 duration and timestamp columns, so each event
+    costs a few dozen bytes instead of a dict of repeated strings; memory is
+    still linear in the event count. Workload classification is memoized per
+    (name, category) pair.
+
+    Tables built from timestamped slices set nested=True so summarize() derives
+    exclusive (self) time by sweeping each track's slices in start order.
+    Begin/end events are recorded as rows plus signed entries in marks and
+    paired into slices by resolve_begin_end().
+
+    Launch links ride along for launch_latency(): an optional per-row
+    correlation id column (created on the first correlated row, like bytes)
+    and flow endpoints stored as (flow key, track, ts, is_start) columns.
+    """
+
+    # Sweep points per chunk when building the (points x workloads) active-count matrix.
+    SWEEP_CHUNK = 1 << 18
+
+    def __init__(self, with_bytes: bool = False, nested: bool = False):
+        self.names = StringTable()
+        self.categories = StringTable()
+        self.tracks = StringTable()
+        self.workloads = StringTable()
+        self.name_ids = array("I")
+        self.category_ids = array("I")
+        self.track_ids = array("I")
+        self.workload_ids = array("I")
+        self.duration_s = array("d")
+        self.ts_us = array("d")
+        self.bytes = array("d") if with_bytes else None
+        self.correlation: array | None = None
+        self.flow_keys = StringTable()
+        self.flow_key_ids = array("I")
+        self.flow_track_ids = array("I")
+        self.flow_ts_us = array("d")
+        self.flow_starts = array("b")
+        self.nested = nested
+        self.marks = array("q")
+        self._workload_cache: Dict[tuple, int] = {}
+        self._summary: tuple | None = None
+
+    @classmethod
+    def from_dicts(cls, events: List[Dict]) -> "EventTable":
+        table = cls(with_bytes=any("bytes" in event for event in events))
+        for event in events:
+            duration_s = event.get("duration_s", 0.0)
+            if duration_s < 0.0:
+                continue
+            table.append(
+                event.get("name", "unnamed"),
+                event.get("category", ""),
+                event.get("track", ""),
+                duration_s,
+                event.get("ts_us", 0.0),
+                event.get("bytes", 0.0),
+                workload=event.get("workload"),
+            )
+        return table
+
+    def __len__(self) -> int:
+        return len(self.duration_s)
+
+    def append(
+        self,
+        name: str,
+        category: str,
+        track: str,
+        duration_s: float,
+        ts_us: float = 0.0,
+        bytes_value: float = 0.0,
+        workload: str | None = None,
+        correlation: int | None = None,
+    ) -> int:
+        if correlation is not None and self.correlation is None:
+            self.correlation = array("q", [-1]) * len(self)
+        name_id = self.names.intern(name)
+        category_id = self.categories.intern(category)
+        if workload is None:
+            key = (name_id, category_id)
+            workload_id = self._workload_cache.get(key)
+            if workload_id is None:
+                workload_id = self._workload_cache[key] = self.workloads.intern(classify_workload(name, category))
+        else:
+            workload_id = self.workloads.intern(workload)
+        self.name_ids.append(name_id)
+        self.category_ids.append(category_id)
+        self.track_ids.append(self.tracks.intern(track))
+        self.workload_ids.append(workload_id)
+        self.duration_s.append(duration_s)
+        self.ts_us.append(ts_us)
+        if self.bytes is not None:
+            self.bytes.append(bytes_value or 0.0)
+        if self.correlation is not None:
+            self.correlation.append(-1 if correlation is None else correlation)
+        return len(self.duration_s) - 1
+
+    def add_flow(self, key: str, track: str, ts_us: float, start: bool) -> None:
+        """Record one end of a flow arrow; it binds to the slice starting at ts_us on track."""
+        self.flow_key_ids.append(self.flow_keys.intern(key))
+        self.flow_track_ids.append(self.tracks.intern(track))
+        self.flow_ts_us.append(ts_us)
+        self.flow_starts.append(1 if start else 0)
+
+    def mark_begin(self, row: int) -> None:
+        self.marks.append(row + 1)
+
+    def mark_end(self, row: int) -> None:
+        self.marks.append(-(row + 1))
+
+    def extend(self, other: "EventTable") -> None:
+        """Append another table's rows, re-interning its strings into this table."""
+        base = len(self)
+        name_map = [self.names.intern(value) for value in other.names.values]
+        category_map = [self.categories.intern(value) for value in other.categories.values]
+        track_map = [self.tracks.intern(value) for value in other.tracks.values]
+        workload_map = [self.workloads.intern(value) for value in other.workloads.values]
+        for (name_id, category_id), workload_id in other._workload_cache.items():
+            self._workload_cache.setdefault((name_map[name_id], category_map[category_id]), workload_map[workload_id])
+        self.name_ids.extend(remap_ids(other.name_ids, name_map))
+        self.category_ids.extend(remap_ids(other.category_ids, category_map))
+        self.track_ids.extend(remap_ids(other.track_ids, track_map))
+        self.workload_ids.extend(remap_ids(other.workload_ids, workload_map))
+        self.duration_s.extend(other.duration_s)
+        self.ts_us.extend(other.ts_us)
+        if self.bytes is not None:
+            self.bytes.extend(other.bytes if other.bytes is not None else array("d", bytes(8 * len(other))))
+        if other.correlation is not None and self.correlation is None:
+            self.correlation = array("q", [-1]) * base
+        if self.correlation is not None:
+            self.correlation.extend(other.correlation if other.correlation is not None else array("q", [-1]) * len(other))
+        flow_key_map = [self.flow_keys.intern(value) for value in other.flow_keys.values]
+        self.flow_key_ids.extend(remap_ids(other.flow_key_ids, flow_key_map))
+        self.flow_track_ids.extend(remap_ids(other.flow_track_ids, track_map))
+        self.flow_ts_us.extend(other.flow_ts_us)
+        self.flow_starts.extend(other.flow_starts)
+        self.marks.extend(mark + base if mark > 0 else mark - base for mark in other.marks)
+        self.nested = self.nested or other.nested
+        self._summary = None
+
+    def resolve_begin_end(self) -> None:
+        """Pair B/E marks per track in file order; B rows become slices and E rows are dropped."""
+        if not self.marks:
+            return
+        stacks: Dict[int, List[int]] = {}
+        end_rows = array("q")
+        for mark in self.marks:
+            if mark > 0:
+                row = mark - 1
+                stacks.setdefault(self.track_ids[row], []).append(row)
+                continue
+            row = -mark - 1
+            end_rows.append(row)
+            stack = stacks.get(self.track_ids[row])
+            if stack:
+                begin = stack.pop()
+                self.duration_s[begin] = max(self.ts_us[row] - self.ts_us[begin], 0.0) / 1_000_000.0
+        self.marks = array("q")
+        dropped = set(end_rows)
+        self._take_rows(array("q", (row for row in range(len(self)) if row not in dropped)))
+
+    def filter_names(self, names: NameFilter) -> None:
+        """Keep focused rows and drop ignored or hidden ones, in place.
+
+        On nested tables focus and ignore also cover every slice nested inside a
+        matching one, while a hidden slice is dropped alone: its children then
+        nest directly in its parent, which takes over its exclusive time.
+        """
+        self.resolve_begin_end()
+        verdicts = names.verdicts(self.names)
+        if not self.nested:
+            allowed = [(focus_hit or names.focus is None) and not ignore_hit and not hide_hit for focus_hit, ignore_hit, hide_hit in verdicts]
+            if numpy is not None and len(self):
+                mask = numpy.asarray(allowed, dtype=bool)[numpy.frombuffer(self.name_ids, dtype=self.name_ids.typecode)]
+                self._take_rows(array("q", numpy.flatnonzero(mask).astype(numpy.int64).tobytes()))
+            else:
+                self._take_rows(array("q", (row for row, name_id in enumerate(self.name_ids) if allowed[name_id])))
+            return
+        kept = bytearray(len(self))
+        stack: List[tuple] = []
+        current_track = None
+        for row in self._nesting_order():
+            track = self.track_ids[row]
+            if track != current_track:
+                stack.clear()
+                current_track = track
+            start = self.ts_us[row]
+            while stack and stack[-1][0] <= start:
+                stack.pop()
+            focus_hit, ignore_hit, hide_hit = verdicts[self.name_ids[row]]
+            focused = focus_hit or names.focus is None or (bool(stack) and stack[-1][1])
+            ignored = ignore_hit or (bool(stack) and stack[-1][2])
+            kept[row] = focused and not ignored and not hide_hit
+            stack.append((start + self.duration_s[row] * 1_000_000.0, focused, ignored))
+        self._take_rows(array("q", (row for row, keep in enumerate(kept) if keep)))
+
+    def _take_rows(self, rows: array) -> None:
+        for attr in ("name_ids", "category_ids", "track_ids", "workload_ids", "duration_s", "ts_us", "bytes", "correlation"):
+            column = getattr(self, attr)
+            if column is not None:
+                setattr(self, attr, take_rows(column, rows))
+        self._summary = None
+
+    def _nesting_order(self) -> List[int]:
+        """Rows by (track, start, longest first), so every parent precedes its children."""
+        if numpy is not None:
+            return numpy.lexsort(
+                (
+                    -numpy.frombuffer(self.duration_s, dtype=numpy.float64),
+                    numpy.frombuffer(self.ts_us, dtype=numpy.float64),
+                    numpy.frombuffer(self.track_ids, dtype=self.track_ids.typecode),
+                )
+            ).tolist()
+        track_ids, ts_us, duration_s = self.track_ids, self.ts_us, self.duration_s
+        return sorted(range(len(self)), key=lambda row: (track_ids[row], ts_us[row], -duration_s[row]))
+
+    def parents(self) -> array:
+        """Enclosing slice per row on the same track (-1 for top-level rows)."""
+        parents = array("q", [-1]) * len(self)
+        stack: List[tuple] = []
+        current_track = None
+        for row in self._nesting_order():
+            track = self.track_ids[row]
+            if track != current_track:
+                stack.clear()
+                current_track = track
+            start = self.ts_us[row]
+            while stack and stack[-1][0] <= start:
+                stack.pop()
+            if stack:
+                parents[row] = stack[-1][1]
+            stack.append((start + self.duration_s[row] * 1_000_000.0, row))
+        return parents
+
+    def self_times(self) -> array:
+        """Exclusive time per row: duration minus the time covered by direct children on the same track."""
+        self_s = array("d", self.duration_s)
+        if not self.nested or not len(self):
+            return self_s
+        order = self._nesting_order()
+
+        stack: List[tuple] = []
+        current_track = None
+        for row in order:
+            track = self.track_ids[row]
+            if track != current_track:
+                stack.clear()
+                current_track = track
+            start = self.ts_us[row]
+            duration = self.duration_s[row]
+            end = start + duration * 1_000_000.0
+            while stack and stack[-1][0] <= start:
+                stack.pop()
+            if stack:
+                parent_end, parent = stack[-1]
+                covered = duration if end <= parent_end else (parent_end - start) / 1_000_000.0
+                self_s[parent] -= covered
+            stack.append((end, row))
+        for row, value in enumerate(self_s):
+            if value < 0.0:
+                self_s[row] = 0.0
+        return self_s
+
+    def summarize(self) -> TraceSummary:
+        if self._summary is not None and self._summary[0] == len(self):
+            return self._summary[1]
+        summary = TraceSummary()
+        summary.event_count = len(self)
+        summary.total_time_s = sum(self.duration_s)
+        summary.nested = self.nested
+        self_s = self.self_times()
+        summary.total_self_s = sum(self_s)
+
+        workload_time = group_sum(self.workload_ids, self.duration_s, len(self.workloads))
+        workload_count = group_sum(self.workload_ids, None, len(self.workloads))
+        workload_bytes = self._group_bytes(self.workload_ids, len(self.workloads))
+        for idx, count in enumerate(workload_count):
+            if not count:
+                continue
+            workload = self.workloads[idx]
+            summary.by_workload[workload] = workload_time[idx]
+            summary.by_workload_bytes[workload] = workload_bytes[idx]
+            if workload.startswith("Memcpy"):
+                summary.transfer_count += count
+                summary.transfer_time_s += workload_time[idx]
+                summary.transfer_bytes += workload_bytes[idx]
+
+        track_time = group_sum(self.track_ids, self.duration_s, len(self.tracks))
+        track_count = group_sum(self.track_ids, None, len(self.tracks))
+        track_sketches = group_sketches(self.track_ids, self.duration_s, len(self.tracks))
+        for idx, count in enumerate(track_count):
+            if count:
+                summary.by_track[self.tracks[idx]] = track_time[idx]
+                summary.track_sketches[self.tracks[idx]] = track_sketches[idx]
+
+        name_time = group_sum(self.name_ids, self.duration_s, len(self.names))
+        name_self = group_sum(self.name_ids, self_s, len(self.names))
+        name_count = group_sum(self.name_ids, None, len(self.names))
+        name_bytes = self._group_bytes(self.name_ids, len(self.names))
+        name_workload = group_last(self.name_ids, self.workload_ids, len(self.names))
+        name_sketches = group_sketches(self.name_ids, self.duration_s, len(self.names))
+        for idx, count in enumerate(name_count):
+            if not count:
+                continue
+            summary.by_name[self.names[idx]] = {
+                "time_s": name_time[idx],
+                "self_s": name_self[idx],
+                "count": count,
+                "bytes": name_bytes[idx],
+                "workload": self.workloads[name_workload[idx]],
+                **sketch_percentiles(name_sketches[idx]),
+            }
+            summary.name_sketches[self.names[idx]] = name_sketches[idx]
+        self._summary = (len(self), summary)
+        return summary
+
+    def concurrency(self, max_gaps: int = 10) -> Dict | None:
+        """Union busy time per workload, pairwise overlap, and idle gaps on device tracks.
+
+        One sweep over the sorted start/end points of every timed slice keeps
+        the set of workloads active between consecutive points, so busy time
+        is a union (nested or concurrent slices of one workload count once)
+        and each pair of concurrently active workloads accrues overlap. Device
+        tracks are tracks holding only GPU Compute, Memcpy, and Memset slices;
+        their idle gaps are the holes in each track's busy union.
+        """
+        if not self.nested:
+            return None
+        rows = [row for row in range(len(self)) if self.duration_s[row] > 0.0]
+        if not rows:
+            return None
+        busy, overlap, first, last = self._workload_sweep(rows)
+
+        names = self.workloads.values
+        device = {idx for idx, name in enumerate(names) if name.startswith(("GPU Compute", "Memcpy", "Memset"))}
+        track_rows = [0] * len(self.tracks)
+        device_rows = [0] * len(self.tracks)
+        for row in rows:
+            track_rows[self.track_ids[row]] += 1
+            if self.workload_ids[row] in device:
+                device_rows[self.track_ids[row]] += 1
+        device_tracks = {idx for idx, count in enumerate(device_rows) if count and count == track_rows[idx]}
+
+        gaps, device_busy_us, device_span_us = self._device_idle([row for row in rows if self.track_ids[row] in device_tracks], max_gaps)
+
+        return {
+            "span_s": (last - first) / 1_000_000.0,
+            "start_us": first,
+            "busy_s": {names[idx]: value / 1_000_000.0 for idx, value in enumerate(busy) if value > 0.0},
+            "overlap_s": {(names[left], names[right]): value / 1_000_000.0 for (left, right), value in overlap.items() if value > 0.0},
+            "device_tracks": len(device_tracks),
+            "device_busy_s": device_busy_us / 1_000_000.0,
+            "device_span_s": device_span_us / 1_000_000.0,
+            "gaps": [{"track": track, "start_us": start, "gap_s": gap / 1_000_000.0} for gap, start, track in gaps],
+        }
+
+    def launch_links(self) -> Dict[int, int]:
+        """Map each launched (device) row to the row that launched it.
+
+        Rows sharing a correlation id are joined through one hash map; the
+        earlier-starting row of each pair is the launch. Flow arrows fill in
+        pairs without correlation ids: each endpoint binds to the innermost
+        slice starting at its (track, ts), found through a second hash map.
+        """
+        links: Dict[int, int] = {}
+        ts_us = self.ts_us
+        if self.correlation is not None:
+            first: Dict[int, int] = {}
+            for row, correlation in enumerate(self.correlation):
+                if correlation < 0:
+                    continue
+                other = first.get(correlation)
+                if other is None:
+                    first[correlation] = row
+                elif other >= 0:
+                    launch, launched = (other, row) if ts_us[other] <= ts_us[row] else (row, other)
+                    links[launched] = launch
+                    first[correlation] = -1
+        if self.flow_key_ids:
+            wanted = set(zip(self.flow_track_ids, self.flow_ts_us))
+            starting: Dict[tuple, int] = {}
+            for row in range(len(self)):
+                key = (self.track_ids[row], ts_us[row])
+                if key in wanted:
+                    current = starting.get(key)
+                    if current is None or self.duration_s[row] < self.duration_s[current]:
+                        starting[key] = row
+            ends: Dict[int, List[int | None]] = {}
+            for key_id, track, ts, start in zip(self.flow_key_ids, self.flow_track_ids, self.flow_ts_us, self.flow_starts):
+                ends.setdefault(key_id, [None, None])[0 if start else 1] = starting.get((track, ts))
+            for launch, launched in ends.values():
+                if launch is not None and launched is not None and launch != launched:
+                    links.setdefault(launched, launch)
+        return links
+
+    def launch_latency(self, max_stretches: int = 10) -> Dict | None:
+        """Launch-to-start delay per launched name, and stretches where device tracks wait on launches.
+
+        A device track is starved between two consecutive slices when it sits
+        idle and the next slice was only launched after the previous one had
+        finished, so the gap is spent waiting on the CPU. Consecutive starved
+        gaps on a track form one stretch.
+        """
+        links = self.launch_links()
+        if not links:
+            return None
+        ts_us, duration_s = self.ts_us, self.duration_s
+        delays: Dict[int, DDSketch] = {}
+        overall = DDSketch()
+        for launched, launch in links.items():
+            delay = max(ts_us[launched] - ts_us[launch], 0.0)
+            overall.add(delay)
+            sketch = delays.get(self.name_ids[launched])
+            if sketch is None:
+                sketch = delays[self.name_ids[launched]] = DDSketch()
+            sketch.add(delay)
+
+        device_tracks = {self.track_ids[row] for row in links}
+        stretches: List[tuple] = []
+        starved_us = 0.0
+        starved_gaps = 0
+        order = sorted(
+            (row for row in range(len(self)) if duration_s[row] > 0.0 and self.track_ids[row] in device_tracks),
+            key=lambda row: (self.track_ids[row], ts_us[row]),
+        )
+        current_track = None
+        busy_until = 0.0
+        stretch = None
+        for row in order:
+            track = self.track_ids[row]
+            start = ts_us[row]
+            end = start + duration_s[row] * 1_000_000.0
+            launch = links.get(row)
+            starved = track == current_track and start > busy_until and launch is not None and ts_us[launch] >= busy_until
+            if starved:
+                gap = start - busy_until
+                starved_us += gap
+                starved_gaps += 1
+                if stretch is None:
+                    stretch = [0.0, busy_until, end, 0, self.tracks[track]]
+                stretch[0] += gap
+                stretch[2] = end
+                stretch[3] += 1
+            elif stretch is not None:
+                stretches.append(tuple(stretch))
+                stretch = None
+            if track != current_track:
+                current_track, busy_until = track, end
+            else:
+                busy_until = max(busy_until, end)
+        if stretch is not None:
+            stretches.append(tuple(stretch))
+
+        return {
+            "links": len(links),
+            "delay_us": overall,
+            "by_name": {self.names[name_id]: sketch for name_id, sketch in delays.items()},
+            "starved_s": starved_us / 1_000_000.0,
+            "starved_gaps": starved_gaps,
+            "stretches": [
+                {"track": track, "start_us": start, "duration_s": (end - start) / 1_000_000.0, "idle_s": idle / 1_000_000.0, "slices": slices}
+                for idle, start, end, slices, track in heapq.nlargest(max_stretches, stretches)
+            ],
+        }
+
+    def kineto_breakdown(self, max_syncs: int = 10) -> Dict | None:
+        """Device time per launching aten:: op and nn.Module, and host syncs ranked by stall time.
+
+        Only for traces with PyTorch profiler categories. Each kernel, copy,
+        or memset is followed back through launch_links() to its runtime
+        launch, then up the launching thread's nesting to the innermost
+        cpu_op and the innermost python_function (preferring "nn.Module:"
+        frames). Sync slices nested inside another sync count once.
+        """
+        kinds = [value.lower() for value in self.categories.values]
+        if not {"cpu_op", "kernel", "cuda_runtime"} & set(kinds):
+            return None
+        device = {idx for idx, kind in enumerate(kinds) if kind in {"kernel", "gpu_memcpy", "gpu_memset"}}
+        op_kind = {idx for idx, kind in enumerate(kinds) if kind == "cpu_op"}
+        python_kind = {idx for idx, kind in enumerate(kinds) if kind == "python_function"}
+        parents = self.parents()
+        links = self.launch_links()
+        context_cache: Dict[int, tuple] = {}
+
+        def context(row: int) -> tuple:
+            """(innermost aten op, innermost Python module) enclosing a row."""
+            cached = context_cache.get(row)
+            if cached is not None:
+                return cached
+            op = module = frame = None
+            parent = parents[row]
+            while parent >= 0 and (op is None or module is None):
+                category = self.category_ids[parent]
+                name = self.names[self.name_ids[parent]]
+                if op is None and category in op_kind:
+                    op = name
+                elif category in python_kind:
+                    if module is None and name.startswith("nn.Module:"):
+                        module = name
+                    elif frame is None:
+                        frame = name
+                parent = parents[parent]
+            context_cache[row] = (op or "(no cpu_op)", module or frame or "(no Python frame)")
+            return context_cache[row]
+
+        by_op: Dict[str, List[float]] = {}
+        by_module: Dict[str, List[float]] = {}
+        device_s = 0.0
+        unlinked_s = 0.0
+        sync_names = {idx for idx, name in enumerate(self.names.values) if name in HOST_SYNC_NAMES or name.endswith("Synchronize")}
+        syncs: Dict[tuple, List[float]] = {}
+        for row in range(len(self)):
+            duration = self.duration_s[row]
+            if self.category_ids[row] in device:
+                device_s += duration
+                launch = links.get(row)
+                if launch is None:
+                    unlinked_s += duration
+                    continue
+                op, module = context(launch)
+                for groups, key in ((by_op, op), (by_module, module)):
+                    entry = groups.setdefault(key, [0.0, 0])
+                    entry[0] += duration
+                    entry[1] += 1
+            elif self.name_ids[row] in sync_names:
+                parent = parents[row]
+                while parent >= 0 and self.name_ids[parent] not in sync_names:
+                    parent = parents[parent]
+                if parent >= 0:
+                    continue
+                key = (self.names[self.name_ids[row]], context(row)[1])
+                entry = syncs.setdefault(key, [0.0, 0, 0.0])
+                entry[0] += duration
+                entry[1] += 1
+                entry[2] = max(entry[2], duration)
+
+        ranked = sorted(syncs.items(), key=lambda item: item[1][0], reverse=True)[:max_syncs]
+        return {
+            "device_s": device_s,
+            "unlinked_s": unlinked_s,
+            "by_op": {key: tuple(value) for key, value in by_op.items()},
+            "by_module": {key: tuple(value) for key, value in by_module.items()},
+            "syncs": [
+                {"name": name, "context": where, "stall_s": total, "count": count, "max_s": longest}
+                for (name, where), (total, count, longest) in ranked
+            ],
+            "sync_total_s": sum(entry[0] for entry in syncs.values()),
+        }
+
+    def _workload_sweep(self, rows: List[int]) -> tuple:
+        """Union busy time per workload id, overlap per (id, id) pair, and the first/last instant, in microseconds."""
+        size = len(self.workloads)
+        if numpy is not None:
+            picked = numpy.array(rows, dtype=numpy.int64)
+            starts = numpy.frombuffer(self.ts_us, dtype=numpy.float64)[picked]
+            ends = starts + numpy.frombuffer(self.duration_s, dtype=numpy.float64)[picked] * 1_000_000.0
+            workloads = numpy.frombuffer(self.workload_ids, dtype=f"u{self.workload_ids.itemsize}")[picked].astype(numpy.int64)
+            coords = numpy.concatenate((starts, ends))
+            deltas = numpy.concatenate((numpy.ones(len(rows), dtype=numpy.int32), numpy.full(len(rows), -1, dtype=numpy.int32)))
+            order = numpy.lexsort((deltas, coords))
+            coords, deltas, workloads = coords[order], deltas[order], numpy.concatenate((workloads, workloads))[order]
+            spans = numpy.diff(coords)
+            busy = numpy.zeros(size)
+            overlap = numpy.zeros((size, size))
+            carry = numpy.zeros(size, dtype=numpy.int64)
+            # Active counts per workload after each point; spans[i] is the time until the next point.
+            for low in range(0, len(spans), self.SWEEP_CHUNK):
+                high = min(low + self.SWEEP_CHUNK, len(spans))
+                steps = numpy.zeros((high - low, size), dtype=numpy.int64)
+                steps[numpy.arange(high - low), workloads[low:high]] = deltas[low:high]
+                counts = numpy.cumsum(steps, axis=0) + carry
+                carry = counts[-1]
+                active = (counts > 0).astype(numpy.float64)
+                weighted = active * spans[low:high, None]
+                busy += weighted.sum(axis=0)
+                overlap += active.T @ weighted
+            pairs = {
+                (first, second): float(overlap[first, second])
+                for first, second in itertools.combinations(range(size), 2)
+                if overlap[first, second] > 0.0
+            }
+            return busy.tolist(), pairs, float(coords[0]), float(coords[-1])
+
+        points = []
+        for row in rows:
+            start = self.ts_us[row]
+            points.append((start, 1, self.workload_ids[row]))
+            points.append((start + self.duration_s[row] * 1_000_000.0, -1, self.workload_ids[row]))
+        # Ends sort before starts at the same instant, so back-to-back slices do not overlap.
+        points.sort()
+        active = [0] * size
+        busy = [0.0] * size
+        overlap: Dict[tuple, float] = defaultdict(float)
+        live: tuple = ()
+        pairs: List[tuple] = []
+        previous = points[0][0]
+        for point, delta, workload in points:
+            if live and point > previous:
+                span = point - previous
+                for member in live:
+                    busy[member] += span
+                for pair in pairs:
+                    overlap[pair] += span
+            previous = point
+            active[workload] += delta
+            if (delta > 0 and active[workload] == 1) or (delta < 0 and active[workload] == 0):
+                live = tuple(idx for idx, count in enumerate(active) if count)
+                pairs = list(itertools.combinations(live, 2))
+        return busy, dict(overlap), points[0][0], points[-1][0]
+
+    def _device_idle(self, rows: List[int], max_gaps: int) -> tuple:
+        """Largest gaps between busy intervals on each track, plus busy and spanned time across all the tracks."""
+        if not rows:
+            return [], 0.0, 0.0
+        if numpy is not None:
+            picked = numpy.array(rows, dtype=numpy.int64)
+            starts = numpy.frombuffer(self.ts_us, dtype=numpy.float64)[picked]
+            ends = starts + numpy.frombuffer(self.duration_s, dtype=numpy.float64)[picked] * 1_000_000.0
+            tracks = numpy.frombuffer(self.track_ids, dtype=f"u{self.track_ids.itemsize}")[picked]
+            coords = numpy.concatenate((starts, ends))
+            deltas = numpy.concatenate((numpy.ones(len(rows), dtype=numpy.int64), numpy.full(len(rows), -1, dtype=numpy.int64)))
+            tracks = numpy.concatenate((tracks, tracks))
+            # Per track, the running count returns to zero exactly where that track goes idle.
+            order = numpy.lexsort((deltas, coords, tracks))
+            track_coords, track_ids = coords[order], tracks[order]
+            idle = (numpy.cumsum(deltas[order])[:-1] == 0) & (track_ids[:-1] == track_ids[1:])
+            lengths = numpy.where(idle, numpy.diff(track_coords), 0.0)
+            top = [idx for idx in numpy.argsort(-lengths, kind="stable")[:max_gaps].tolist() if lengths[idx] > 0.0]
+            gaps = [(float(lengths[idx]), float(track_coords[idx]), self.tracks[int(track_ids[idx])]) for idx in top]
+            order = numpy.lexsort((deltas, coords))
+            busy = numpy.diff(coords[order])[numpy.cumsum(deltas[order])[:-1] > 0].sum()
+            return gaps, float(busy), float(ends.max() - starts.min())
+
+        merged: Dict[int, List[List[float]]] = {}
+        for row in sorted(rows, key=lambda row: (self.track_ids[row], self.ts_us[row])):
+            intervals = merged.setdefault(self.track_ids[row], [])
+            start = self.ts_us[row]
+            end = start + self.duration_s[row] * 1_000_000.0
+            if intervals and start <= intervals[-1][1]:
+                intervals[-1][1] = max(intervals[-1][1], end)
+            else:
+                intervals.append([start, end])
+        gaps = heapq.nlargest(
+            max_gaps,
+            (
+                (after[0] - before[1], before[1], self.tracks[track])
+                for track, intervals in merged.items()
+                for before, after in zip(intervals, intervals[1:])
+            ),
+        )
+        union = sorted(interval for intervals in merged.values() for interval in intervals)
+        busy = 0.0
+        busy_start, busy_end = union[0]
+        for start, end in union[1:]:
+            if start > busy_end:
+                busy += busy_end - busy_start
+                busy_start = start
+            busy_end = max(busy_end, end)
+        busy += busy_end - busy_start
+        return gaps, busy, max(end for _, end in union) - union[0][0]
+
+    def _group_bytes(self, ids: array, size: int) -> List[float]:
+        if self.bytes is None:
+            return [0.0] * size
+        return group_sum(ids, self.bytes, size)
+
+
+class CounterTable:
+    """Counter samples (trace "C" events) stored as parallel arrays.
+
+    Every numeric arg of a counter event is its own series, named
+    "pid=<pid> / <event name> / <arg>" and interned to a dense id. Samples
+    stay in file order; series() sorts them once per series by timestamp.
+    """
+
+    def __init__(self):
+        self.names = StringTable()
+        self.series_ids = array("I")
+        self.ts_us = array("d")
+        self.values = array("d")
+        self._series: List[tuple] | None = None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def append(self, name: str, ts_us: float, value: float) -> None:
+        self.series_ids.append(self.names.intern(name))
+        self.ts_us.append(ts_us)
+        self.values.append(value)
+        self._series = None
+
+    def extend(self, other: "CounterTable") -> None:
+        mapping = [self.names.intern(value) for value in other.names.values]
+        self.series_ids.extend(remap_ids(other.series_ids, mapping))
+        self.ts_us.extend(other.ts_us)
+        self.values.extend(other.values)
+        self._series = None
+
+    def series(self) -> List[tuple]:
+        """(timestamps, values) arrays per series id, in timestamp order."""
+        if self._series is None:
+            ts_us = self.ts_us
+            order = sorted(range(len(self)), key=lambda row: (self.series_ids[row], ts_us[row]))
+            series = [(array("d"), array("d")) for _ in range(len(self.names))]
+            for row in order:
+                stamps, values = series[self.series_ids[row]]
+                stamps.append(ts_us[row])
+                values.append(self.values[row])
+            self._series = series
+        return self._series
+
+    def stats(self) -> List[Dict]:
+        """Sample min/mean/max plus the time-weighted average of the step function each series traces."""
+        rows = []
+        for idx, (stamps, values) in enumerate(self.series()):
+            span = stamps[-1] - stamps[0]
+            if span > 0:
+                weighted = math.fsum(value * (after - before) for value, before, after in zip(values, stamps, stamps[1:]))
+                time_weighted = weighted / span
+            else:
+                time_weighted = values[-1]
+            rows.append(
+                {
+                    "name": self.names[idx],
+                    "samples": len(values),
+                    "min": min(values),
+                    "mean": math.fsum(values) / len(values),
+                    "max": max(values),
+                    "time_weighted": time_weighted,
+                    "first_us": stamps[0],
+                    "last_us": stamps[-1],
+                }
+            )
+        return rows
+
+    def value_at(self, series_id: int, ts_us: float) -> float | None:
+        """The series value in effect at ts_us (the last sample at or before it)."""
+        stamps, values = self.series()[series_id]
+        idx = bisect.bisect_right(stamps, ts_us) - 1
+        return values[idx] if idx >= 0 else None
+
+
+# flameprof titles end with "(primitive_calls calls tottime cumtime)".
+FLAMEPROF_STATS_RE = re.compile(r"\((\d+) (\d+) ([-\d.eE+]+) ([-\d.eE+]+)\)\s*$")
+FLAME_NAME_SUFFIX_RE = re.compile(
+    r"\s+(?:\((?:[\d,]+ samples?|\d+(?:\.\d+)?m?s)[^)]*\)|\d+(?:\.\d+)?%\s+\([^)]*\))\s*$"
+)
+
+
+def flame_frame_name(function: str) -> str:
+    """Strip the sample/time/percentage suffix flamegraph tools append to frame titles."""
+    return FLAME_NAME_SUFFIX_RE.sub("", function).strip() or function
+
+
+class FlameTree:
+    """Call tree rebuilt from flamegraph frame geometry.
+
+    Frames on adjacent rows nest by x-range: a frame's parent is the frame on
+    the neighbouring row, towards the root, whose [x, x + width] contains it.
+    The root row is the one holding the widest frame, which handles both
+    upward flamegraphs and downward icicle graphs; only rows contiguous with
+    it are used, so a second graph in the same SVG (flameprof's callee view)
+    is left out. Rows are matched with a bisect over x, so building the tree
+    is O(n log n).
+    """
+
+    def __init__(self, frames: List[Dict] = ()):
+        placed = [frame for frame in frames if "x" in frame and "y" in frame and frame.get("width", 0.0) > 0.0]
+        self.names: List[str] = []
+        self.values: List[float] = []
+        self.parents: List[int] = []
+        self.children: List[List[int]] = []
+        self.unit = "width"
+        if not placed:
+            return
+        rows: Dict[float, List[Dict]] = defaultdict(list)
+        for frame in placed:
+            rows[round(frame["y"], 2)].append(frame)
+        widest = max(placed, key=lambda frame: frame["width"])
+        root_y = round(widest["y"], 2)
+        row_keys = self._stack_rows(sorted(rows), root_y)
+        stacked = [frame for key in row_keys for frame in rows[key]]
+
+        # Sample counts are exact per frame; otherwise scale widths by the root's time when known.
+        # flameprof titles carry per-function (not per-stack) times, so they cannot be used directly.
+        if all(frame.get("samples") for frame in stacked):
+            self.unit = "samples"
+            self._scale = None
+        elif widest.get("time_s"):
+            self.unit = "seconds"
+            self._scale = widest["time_s"] / widest["width"]
+        else:
+            self._scale = 1.0
+        eps = widest["width"] * 1e-6 + 0.5
+
+        previous: List[tuple] = []
+        for key in row_keys:
+            row = sorted(rows[key], key=lambda frame: frame["x"])
+            starts = [start for start, _, _ in previous]
+            current = []
+            for frame in row:
+                parent = -1
+                idx = bisect.bisect_right(starts, frame["x"] + eps) - 1
+                if idx >= 0:
+                    start, end, node = previous[idx]
+                    if frame["x"] + frame["width"] <= end + eps:
+                        parent = node
+                node = self._add(frame, parent)
+                current.append((frame["x"], frame["x"] + frame["width"], node))
+            previous = current
+
+    @classmethod
+    def from_nodes(cls, names: List[str], values: List[float], parents: List[int], unit: str) -> "FlameTree":
+        """Wrap an already-built tree (parents listed before their children)."""
+        tree = cls()
+        tree.names, tree.values, tree.parents, tree.unit = names, values, parents, unit
+        tree.children = [[] for _ in names]
+        for node, parent in enumerate(parents):
+            if parent >= 0:
+                tree.children[parent].append(node)
+        return tree
+
+    @staticmethod
+    def _stack_rows(ys: List[float], root_y: float) -> List[float]:
+        """Contiguous rows from the root outwards; growing upwards (smaller y) wins when both sides have rows."""
+        if len(ys) == 1:
+            return ys
+        pitch = min(b - a for a, b in zip(ys, ys[1:]))
+        index = ys.index(root_y)
+        below = ys[index + 1] - root_y if index + 1 < len(ys) else None
+        step = -1 if index > 0 and root_y - ys[index - 1] <= pitch * 1.5 else 1
+        if step == 1 and (below is None or below > pitch * 1.5):
+            return [root_y]
+        stacked = [root_y]
+        index += step
+        while 0 <= index < len(ys) and abs(ys[index] - stacked[-1]) <= pitch * 1.5:
+            stacked.append(ys[index])
+            index += step
+        return stacked
+
+    def _add(self, frame: Dict, parent: int) -> int:
+        if self._scale is None:
+            value = float(frame["samples"])
+        else:
+            value = frame["width"] * self._scale
+        node = len(self.names)
+        self.names.append(flame_frame_name(str(frame["function"])))
+        self.values.append(value)
+        self.parents.append(parent)
+        self.children.append([])
+        if parent >= 0:
+            self.children[parent].append(node)
+        return node
+
+    @property
+    def roots(self) -> List[int]:
+        return [node for node, parent in enumerate(self.parents) if parent < 0]
+
+    def to_trie(self) -> "StackTrie":
+        """Each node's self value as samples on its root-to-node stack (parents precede children)."""
+        trie = StackTrie()
+        mapped = [0] * len(self.names)
+        for node, (name, self_value) in enumerate(zip(self.names, self.self_values())):
+            parent = self.parents[node]
+            mapped[node] = trie.node_for([name], mapped[parent] if parent >= 0 else 0)
+            trie.self_counts[mapped[node]] += self_value
+        return trie.finish()
+
+    @property
+    def total(self) -> float:
+        return sum(self.values[node] for node in self.roots)
+
+    def self_values(self) -> List[float]:
+        return [
+            max(value - sum(self.values[child] for child in children), 0.0)
+            for value, children in zip(self.values, self.children)
+        ]
+
+    def depth(self) -> int:
+        deepest = 0
+        for node in range(len(self.names)):
+            depth = 0
+            while node >= 0:
+                depth += 1
+                node = self.parents[node]
+            deepest = max(deepest, depth)
+        return deepest
+
+    def function_totals(self) -> List[Dict]:
+        """Per-function self and inclusive values; recursive frames count inclusive time once per stack."""
+        self_values = self.self_values()
+        totals: Dict[str, Dict] = {}
+        active: Dict[str, int] = defaultdict(int)
+        stack = [(node, False) for node in reversed(self.roots)]
+        while stack:
+            node, leaving = stack.pop()
+            name = self.names[node]
+            if leaving:
+                active[name] -= 1
+                continue
+            entry = totals.setdefault(name, {"function": name, "self": 0.0, "inclusive": 0.0, "frames": 0})
+            entry["self"] += self_values[node]
+            entry["frames"] += 1
+            if not active[name]:
+                entry["inclusive"] += self.values[node]
+            active[name] += 1
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(self.children[node]))
+        return sorted(totals.values(), key=lambda entry: entry["self"], reverse=True)
+
+    def heaviest_paths(self, limit: int = 10) -> List[tuple]:
+        """Root-to-frame stacks ending at the frames with the most self time."""
+        self_values = self.self_values()
+        ranked = sorted(range(len(self.names)), key=lambda node: self_values[node], reverse=True)
+        paths = []
+        for node in ranked[:limit]:
+            if self_values[node] <= 0:
+                break
+            path = []
+            walker = node
+            while walker >= 0:
+                path.append(self.names[walker])
+                walker = self.parents[walker]
+            paths.append((self_values[node], list(reversed(path))))
+        return paths
+
+
+class StackTrie:
+    """Prefix trie of folded call stacks over interned frame names.
+
+    Node 0 is a synthetic root; every other node is one (parent, frame) edge,
+    kept in flat arrays. Memory grows with the number of distinct stack
+    prefixes rather than input lines, so folded files with tens of millions
+    of lines aggregate in bounded space.
+    """
+
+    def __init__(self):
+        self.frames = StringTable()
+        self.frame_ids = array("l", [-1])
+        self.parents = array("l", [-1])
+        self.inclusive = array("d", [0.0])
+        self.self_counts = array("d", [0.0])
+        self.edges: Dict[int, int] = {}
+        self.lines = 0
+
+    def __len__(self) -> int:
+        return len(self.parents) - 1
+
+    @property
+    def total(self) -> float:
+        return self.inclusive[0]
+
+    def node_for(self, stack: List[str], node: int = 0) -> int:
+        """Trie node for a stack below `node` (the root by default), inserting missing prefixes."""
+        for name in stack:
+            key = (node << 32) | self.frames.intern(name)
+            child = self.edges.get(key)
+            if child is None:
+                child = self.edges[key] = len(self.parents)
+                self.frame_ids.append(key & 0xFFFFFFFF)
+                self.parents.append(node)
+                self.inclusive.append(0.0)
+                self.self_counts.append(0.0)
+            node = child
+        return node
+
+    def add(self, stack: List[str], count: float) -> None:
+        """Add `count` samples to a stack; call finish() before reading inclusive counts."""
+        self.self_counts[self.node_for(stack)] += count
+        self.lines += 1
+
+    def finish(self) -> "StackTrie":
+        """Roll self counts up into inclusive counts; children always sit after their parents."""
+        inclusive = array("d", self.self_counts)
+        parents = self.parents
+        for node in range(len(parents) - 1, 0, -1):
+            inclusive[parents[node]] += inclusive[node]
+        self.inclusive = inclusive
+        return self
+
+    def filtered(self, names: NameFilter) -> "StackTrie":
+        """A new trie of the stacks that pass focus/ignore, rebuilt without hidden frames.
+
+        A stack is kept when any of its frames matches focus and none matches
+        ignore; hidden frames are cut out, so their self samples go to the caller.
+        Each distinct stack is visited once, whatever its sample count.
+        """
+        verdicts = names.verdicts(self.frames)
+        size = len(self.parents)
+        focused = bytearray(size)
+        ignored = bytearray(size)
+        focused[0] = names.focus is None
+        kept = array("d", bytes(8 * size))
+        for node in range(1, size):
+            parent = self.parents[node]
+            focus_hit, ignore_hit, _ = verdicts[self.frame_ids[node]]
+            focused[node] = focus_hit or focused[parent]
+            ignored[node] = ignore_hit or ignored[parent]
+            if focused[node] and not ignored[node]:
+                kept[node] = self.self_counts[node]
+        # Only materialize nodes that carry kept samples or lead to ones that do.
+        needed = bytearray(size)
+        for node in range(size - 1, 0, -1):
+            if kept[node] or needed[node]:
+                needed[self.parents[node]] = 1
+                needed[node] = 1
+
+        trie = StackTrie()
+        trie.lines = self.lines
+        mapped = array("l", [0]) * size
+        for node in range(1, size):
+            if not needed[node]:
+                continue
+            frame_id = self.frame_ids[node]
+            target = mapped[self.parents[node]]
+            if not verdicts[frame_id][2]:
+                target = trie.node_for([self.frames[frame_id]], target)
+            mapped[node] = target
+            if target and kept[node]:
+                trie.self_counts[target] += kept[node]
+        return trie.finish()
+
+    def function_values(self) -> tuple:
+        """Per-function flat (leaf) and cumulative (once per stack) totals."""
+        flat: Dict[str, float] = defaultdict(float)
+        cum: Dict[str, float] = defaultdict(float)
+        for node in range(1, len(self.parents)):
+            count = self.self_counts[node]
+            if not count:
+                continue
+            flat[self.frames[self.frame_ids[node]]] += count
+            seen = set()
+            while node:
+                seen.add(self.frame_ids[node])
+                node = self.parents[node]
+            for frame_id in seen:
+                cum[self.frames[frame_id]] += count
+        return flat, cum
+
+    def to_frames(self, unit: str, width: float = 1_000_000.0) -> List[Dict]:
+        """Flamegraph frames with x/y/width geometry that FlameTree rebuilds into this trie's call tree."""
+        total = self.total or 1.0
+        children = self.children()
+        largest = max((self.inclusive[child] for child in children[0]), default=0.0) or 1.0
+        frames = []
+        stack = [(0, 0.0, -1)]
+        while stack:
+            node, x, depth = stack.pop()
+            child_x = x
+            for child in children[node]:
+                stack.append((child, child_x, depth + 1))
+                child_x += self.inclusive[child] / total * width
+            if not node:
+                continue
+            value = self.inclusive[node]
+            frame = {
+                "function": self.frames[self.frame_ids[node]],
+                "x": x,
+                "y": -float(depth),
+                "width": value / total * width,
+                "percentage": value / largest * 100.0,
+            }
+            if unit == "samples":
+                frame["samples"] = value
+            elif unit == "seconds":
+                frame["time_s"] = value
+            frames.append(frame)
+        frames.sort(key=lambda frame: frame["width"], reverse=True)
+        return frames
+
+    def children(self) -> List[List[int]]:
+        """Child lists ordered by frame name, as flamegraph.pl lays them out."""
+        children: List[List[int]] = [[] for _ in self.parents]
+        for node in range(1, len(self.parents)):
+            children[self.parents[node]].append(node)
+        for kids in children:
+            if len(kids) > 1:
+                kids.sort(key=lambda node: self.frames[self.frame_ids[node]])
+        return children
+
+    def iter_folded(self):
+        """Yield one `frame;frame;frame count` line per stack that has self samples."""
+        children = self.children()
+        path: List[str] = []
+        stack = [(child, 1) for child in reversed(children[0])]
+        while stack:
+            node, depth = stack.pop()
+            del path[depth - 1 :]
+            path.append(self.frames[self.frame_ids[node]])
+            count = self.self_counts[node]
+            if count:
+                yield f"{';'.join(path)} {count:.15g}"
+            stack.extend((child, depth + 1) for child in reversed(children[node]))
+
+    def write_folded(self, fh) -> None:
+        for line in self.iter_folded():
+            fh.write(line + "\n")
+
+    def to_tree(self, unit: str = "samples") -> FlameTree:
+        """FlameTree view without the synthetic root, for the shared call-tree report."""
+        names = [self.frames[frame_id] for frame_id in self.frame_ids[1:]]
+        parents = [parent - 1 for parent in self.parents[1:]]
+        return FlameTree.from_nodes(names, list(self.inclusive[1:]), parents, unit)
+
+    def write_svg(self, fh, title: str = "Flame Graph", width: int = 1200, frame_height: int = 16, min_width: float = 0.1) -> None:
+        """Render a flamegraph.pl-style SVG; frames narrower than `min_width` pixels are dropped with their children."""
+        total = self.total or 1.0
+        pad_x, pad_top, pad_bottom = 10, 40, 20
+        scale = (width - 2 * pad_x) / total
+        children = self.children()
+
+        placed = []
+        stack = [(0, 0, 0.0)]
+        while stack:
+            node, depth, x = stack.pop()
+            node_width = self.inclusive[node] * scale
+            if node_width < min_width:
+                continue
+            placed.append((node, depth, x, node_width))
+            for child in children[node]:
+                stack.append((child, depth + 1, x))
+                x += self.inclusive[child] * scale
+        # An empty profile (or one whose every frame is under min_width) still gets a valid, frameless SVG.
+        depth_max = max((depth for _, depth, _, _ in placed), default=0)
+        height = pad_top + pad_bottom + (depth_max + 1) * frame_height
+
+        fh.write(
+            f'<?xml version="1.0" standalone="no"?>\n'
+            f'<svg version="1.1" width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+            f'xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">\n'
+            f'<rect x="0" y="0" width="{width}" height="{height}" fill="#fdf6e3"/>\n'
+            f'<text x="{width / 2:.0f}" y="24" text-anchor="middle" font-size="17" font-family="Verdana">{xml_escape(title)}</text>\n'
+            f'<g id="frames">\n'
+        )
+        if not placed:
+            fh.write(f'<text x="{width / 2:.0f}" y="{pad_top + frame_height - 5}" text-anchor="middle" font-size="12" font-family="Verdana">No frames to draw</text>\n')
+        for node, depth, x, node_width in placed:
+            name = "all" if node == 0 else self.frames[self.frame_ids[node]]
+            count = self.inclusive[node]
+            y = height - pad_bottom - (depth + 1) * frame_height
+            label = f"{name} ({count:,.0f} samples, {count / total * 100.0:.2f}%)"
+            chars = int((node_width - 6) / 7)
+            text = name if len(name) <= chars else (name[: chars - 2] + ".." if chars > 2 else "")
+            fh.write(
+                f'<g class="func_g"><title>{xml_escape(label)}</title>'
+                f'<rect x="{pad_x + x:.2f}" y="{y}" width="{node_width:.2f}" height="{frame_height - 1}" fill="{flame_color(name)}" rx="2" ry="2"/>'
+                f'<text x="{pad_x + x + 3:.2f}" y="{y + frame_height - 5}" font-size="12" font-family="Verdana">{xml_escape(text)}</text></g>\n'
+            )
+        fh.write("</g>\n</svg>\n")
+
+
+def flame_color(name: str) -> str:
+    """Stable warm colour per frame name, in flamegraph.pl's "hot" palette."""
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=3).digest()
+    return f"rgb({205 + digest[0] % 50},{digest[1] % 230},{digest[2] % 55})"
+
+
+class FoldedStackParser:
+    """Stream Brendan Gregg's collapsed stack format (`frame;frame;frame count`) into a StackTrie."""
+
+    def __init__(self, folded_path: Path):
+        self.folded_path = folded_path
+
+    # Repeated stacks skip the trie walk; the memo is dropped whenever it fills so memory stays bounded.
+    MEMO_LIMIT = 1 << 17
+
+    def parse(self) -> StackTrie:
+        trie = StackTrie()
+        memo: Dict[str, int] = {}
+        self_counts = trie.self_counts
+        with open_text(self.folded_path) as fh:
+            for line in fh:
+                stack, sep, count = line.rstrip("\r\n").rpartition(" ")
+                if not sep or not stack:
+                    continue
+                try:
+                    samples = float(count)
+                except ValueError:
+                    continue
+                node = memo.get(stack)
+                if node is None:
+                    if len(memo) >= self.MEMO_LIMIT:
+                        memo.clear()
+                    node = memo[stack] = trie.node_for(stack.split(";"))
+                self_counts[node] += samples
+                trie.lines += 1
+        return trie.finish()
+
+
 class FlamegraphParser:
-    """Parse SVG flamegraph files, including Graphviz SVG emitted by go tool pprof."""
+    """Parse SVG flamegraph files, including Graphviz SVG emitted by go tool pprof.
+
+    The SVG is streamed with iterparse: each frame group is handled when it
+    closes and then detached from its parent, so memory tracks the frames kept
+    rather than the whole DOM.
+    """
+
+    # flamegraph.pl and pprof use <g>; flameprof wraps each frame in a nested <svg class="func_g">.
+    FRAME_TAGS = {f"{{{SVG_NS['svg']}}}g", f"{{{SVG_NS['svg']}}}svg"}
 
     def __init__(self, svg_path: Path):
         self.svg_path = svg_path
 
     def parse(self) -> List[Dict]:
-        tree = ET.parse(self.svg_path)
-        root = tree.getroot()
         frames: List[Dict] = []
-
-        for g in root.findall(".//svg:g", SVG_NS):
-            cls = g.get("class")
-            if cls == "func_g":
-                frame = self._extract_func_g_frame(g)
-                if frame:
-                    frames.append(frame)
-            elif cls == "node":
-                frame = self._extract_graphviz_frame(g)
-                if frame:
-                    frames.append(frame)
+        for frame in self.iter_frames():
+            frames.append(frame)
 
         total_time = max((f.get("time_s", 0.0) for f in frames), default=0.0)
         for frame in frames:
@@ -124,15 +1877,45 @@ class FlamegraphParser:
         frames.sort(key=lambda item: item.get("time_s", 0.0), reverse=True)
         return frames
 
+    def iter_frames(self):
+        stack = []
+        for event, elem in ET.iterparse(self.svg_path, events=("start", "end")):
+            if event == "start":
+                stack.append(elem)
+                continue
+            stack.pop()
+            if elem.tag not in self.FRAME_TAGS:
+                continue
+            cls = elem.get("class")
+            if cls == "func_g":
+                frame = self._extract_func_g_frame(elem)
+            elif cls == "node":
+                frame = self._extract_graphviz_frame(elem)
+            else:
+                continue
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+            if frame:
+                yield frame
+
     def _extract_func_g_frame(self, g) -> Dict | None:
         title_elem = g.find("svg:title", SVG_NS)
+        if title_elem is None:
+            title_elem = g.find("svg:g/svg:title", SVG_NS)
         if title_elem is None or not title_elem.text:
             return None
         frame = self._parse_generic_title(title_elem.text)
         rect = g.find("svg:rect", SVG_NS)
-        if rect is not None:
-            frame["width"] = float(rect.get("width", 0) or 0)
-            frame["x"] = float(rect.get("x", 0) or 0)
+        if rect is None:
+            rect = g.find("svg:g/svg:rect", SVG_NS)
+        for key in ("x", "y", "width", "height"):
+            # Relative rect sizes ("100%") mean the geometry lives on the wrapping element.
+            value = rect.get(key) if rect is not None else None
+            if value is None or value.endswith("%"):
+                value = g.get(key)
+            if value is not None and not value.endswith("%"):
+                frame[key] = float(value or 0)
         return frame if frame.get("function") else None
 
     def _extract_graphviz_frame(self, g) -> Dict | None:
@@ -164,6 +1947,9 @@ class FlamegraphParser:
         sample_match = re.search(r"([\d,]+)\s+samples", title)
         if sample_match:
             info["samples"] = sample_match.group(1).replace(",", "")
+        flameprof_match = FLAMEPROF_STATS_RE.search(title)
+        if flameprof_match and "time_s" not in info:
+            info["time_s"] = float(flameprof_match.group(4))
         return info
 
     def _parse_graphviz_title(self, title: str) -> Dict:
@@ -177,6 +1963,14 @@ class FlamegraphParser:
         return info
 
 
+def add_percentages(data: List[Dict], key: str) -> List[Dict]:
+    data.sort(key=lambda x: x.get(key, 0), reverse=True)
+    total = sum(item.get(key, 0) for item in data)
+    for item in data:
+        item["percentage"] = item.get(key, 0) / total * 100 if total > 0 else 0
+    return data
+
+
 class ProfileParser:
     """Parse Python profile files or text profile output."""
 
@@ -211,7 +2005,7 @@ class ProfileParser:
                 }
             )
 
-        return self._add_percentages(profile_data, key="cumtime")
+        return add_percentages(profile_data, key="cumtime")
 
     def _parse_text_profile(self) -> List[Dict]:
         profile_data = []
@@ -230,28 +2024,434 @@ class ProfileParser:
                     "percall_cum": float(percall_cum),
                 }
             )
-        return self._add_percentages(profile_data, key="cumtime")
+        return add_percentages(profile_data, key="cumtime")
 
-    def _add_percentages(self, data: List[Dict], key: str) -> List[Dict]:
-        data.sort(key=lambda x: x.get(key, 0), reverse=True)
-        total = sum(item.get(key, 0) for item in data)
-        for item in data:
-            item["percentage"] = item.get(key, 0) / total * 100 if total > 0 else 0
-        return data
 
+# Coefficient of variation (stddev / mean) above which a merged function is flagged as uneven across inputs.
+HIGH_VARIANCE_CV = 0.5
 
-class GoPprofParser:
-    """Parse Go CPU profiles by shelling out to go tool pprof -top."""
 
-    TOP_RE = re.compile(
-        r"^\s*(\d+(?:\.\d+)?(?:ms|s))\s+(\d+(?:\.\d+)?)%\s+(\d+(?:\.\d+)?)%\s+"
-        r"(\d+(?:\.\d+)?(?:ms|s))\s+(\d+(?:\.\d+)?)%\s+(.+)$"
-    )
+def merge_profiles(profiles: List[List[Dict]]) -> List[Dict]:
+    """Sum per-function ProfileParser rows across runs, keeping the per-run spread of cumulative time.
 
-    def __init__(self, profile_path: Path):
+    A function missing from a run counts as zero for that run, so a function
+    only one worker spends time in shows up as high variance.
+    """
+    merged: Dict[str, Dict] = {}
+    per_run: Dict[str, List[float]] = {}
+    for run_idx, rows in enumerate(profiles):
+        for row in rows:
+            name = row["function"]
+            entry = merged.get(name)
+            if entry is None:
+                entry = merged[name] = {key: value for key, value in row.items() if key not in {"percentage", "percall", "percall_cum"}}
+                entry.update(ncalls=0, tottime=0.0, cumtime=0.0)
+                per_run[name] = [0.0] * len(profiles)
+            entry["ncalls"] += row.get("ncalls", 0)
+            entry["tottime"] += row.get("tottime", 0.0)
+            entry["cumtime"] += row.get("cumtime", 0.0)
+            per_run[name][run_idx] += row.get("cumtime", 0.0)
+    for name, entry in merged.items():
+        runs = per_run[name]
+        mean = statistics.fmean(runs)
+        entry.update(
+            runs=sum(1 for value in runs if value > 0),
+            cumtime_mean=mean,
+            cumtime_std=statistics.pstdev(runs),
+            cumtime_min=min(runs),
+            cumtime_max=max(runs),
+            percall=entry["tottime"] / entry["ncalls"] if entry["ncalls"] else 0,
+            percall_cum=entry["cumtime"] / entry["ncalls"] if entry["ncalls"] else 0,
+        )
+        entry["cumtime_cv"] = entry["cumtime_std"] / mean if mean > 0 else 0.0
+    return add_percentages(list(merged.values()), key="cumtime")
+
+
+def _parse_profile_rows(input_path: Path, cache: bool) -> List[Dict]:
+    return run_parser(ProfileParser(input_path), input_path, ParseCache() if cache else None)
+
+
+def merge_profile_files(paths: List[Path], jobs: int, cache: bool) -> List[Dict]:
+    """Load pstats files in a process pool (results kept in input order) and merge them."""
+    if len(paths) == 1 or jobs == 1:
+        return merge_profiles([_parse_profile_rows(path, cache) for path in paths])
+    with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as pool:
+        return merge_profiles(list(pool.map(_parse_profile_rows, paths, [cache] * len(paths))))
+
+
+class CallGraph:
+    """pstats caller graph with per-edge cumulative time.
+
+    A Kahn-style sweep yields a topological order in O(V + E); recursion
+    cycles are entered at their hottest frame and the edges closing them are
+    dropped, which leaves a DAG. Time is split across callers by each caller edge's cumulative time
+    and flows down a path in proportion to each callee's share of its
+    caller's cumulative time.
+    """
+
+    def __init__(self, labels: List[str], self_times: List[float], cum_times: List[float], callees: List[List[tuple]]):
+        self.labels = labels
+        self.self_times = self_times
+        self.cum_times = cum_times
+        self.callees = callees
+
+    @classmethod
+    def from_stats(cls, stats: Dict) -> "CallGraph":
+        index = {func: idx for idx, func in enumerate(stats)}
+        labels = [f"{func_name} ({filename}:{line})" for filename, line, func_name in stats]
+        self_times = [entry[2] for entry in stats.values()]
+        cum_times = [entry[3] for entry in stats.values()]
+        callees: List[List[tuple]] = [[] for _ in labels]
+        for callee, (_, _, _, ct, callers) in stats.items():
+            target = index[callee]
+            # cProfile records (cc, nc, tt, ct) per caller; the profile module only records call counts.
+            calls = sum(value for value in callers.values() if not isinstance(value, tuple)) or 1
+            for caller, value in callers.items():
+                source = index.get(caller)
+                if source is None or source == target:
+                    continue
+                edge_time = value[3] if isinstance(value, tuple) else ct * value / calls
+                callees[source].append((target, edge_time))
+        return cls(labels, self_times, cum_times, callees)
+
+    def topological_dag(self) -> tuple:
+        """Topological order of the call graph plus its callee lists with cycle-closing edges removed."""
+        size = len(self.labels)
+        indegree = [0] * size
+        for edges in self.callees:
+            for target, _ in edges:
+                indegree[target] += 1
+        ready = [node for node in range(size) if not indegree[node]]
+        emitted = [False] * size
+        dag: List[List[tuple]] = [[] for _ in range(size)]
+        order = []
+        hottest = None
+        while len(order) < size:
+            if not ready:
+                # Only recursion cycles are left: enter one at its hottest frame and drop the edges back into it.
+                if hottest is None:
+                    hottest = iter(sorted(range(size), key=lambda node: self.cum_times[node], reverse=True))
+                ready.append(next(node for node in hottest if not emitted[node]))
+            node = ready.pop()
+            if emitted[node]:
+                continue
+            emitted[node] = True
+            order.append(node)
+            kept = dag[node]
+            for target, edge_time in self.callees[node]:
+                if emitted[target]:
+                    continue
+                kept.append((target, edge_time))
+                indegree[target] -= 1
+                if not indegree[target]:
+                    ready.append(target)
+        return order, dag
+
+    def heaviest_paths(self, limit: int = 10) -> List[Dict]:
+        """Top-`limit` root-to-callee paths by the time spent at their last frame.
+
+        Best-first search over the DAG, ordered by the exact best completion
+        of each partial path (computed bottom-up in reverse topological
+        order), so paths come out heaviest first and only near-optimal
+        branches are ever expanded.
+        """
+        order, dag = self.topological_dag()
+        scale = [1.0 / cum if cum > 0 else 0.0 for cum in self.cum_times]
+        own_share = [min(tt * inv, 1.0) for tt, inv in zip(self.self_times, scale)]
+
+        best = [0.0] * len(self.labels)
+        for node in reversed(order):
+            value = own_share[node]
+            inv = scale[node]
+            for target, edge_time in dag[node]:
+                candidate = min(edge_time * inv, 1.0) * best[target]
+                if candidate > value:
+                    value = candidate
+            best[node] = value
+
+        has_caller = [False] * len(self.labels)
+        for edges in dag:
+            for target, _ in edges:
+                has_caller[target] = True
+        # Heap items: (-upper bound, tiebreak, flow, node, prefix id, terminal); prefixes[id] = (node, flow, parent id).
+        prefixes: List[tuple] = []
+        heap = []
+        for node in order:
+            if not has_caller[node] and self.cum_times[node] > 0:
+                heapq.heappush(heap, (-self.cum_times[node] * best[node], len(heap), self.cum_times[node], node, -1, False))
+        paths = []
+        counter = len(heap)
+        while heap and len(paths) < limit:
+            _, _, flow, node, parent, terminal = heapq.heappop(heap)
+            if terminal:
+                chain = []
+                walker = parent
+                while walker >= 0:
+                    step_node, step_flow, walker = prefixes[walker]
+                    chain.append((self.labels[step_node], step_flow))
+                chain.reverse()
+                paths.append({"self_time": flow, "frames": chain})
+                continue
+            prefixes.append((node, flow, parent))
+            prefix = len(prefixes) - 1
+            candidates = [(flow * own_share[node], None)]
+            candidates += [(flow * min(edge_time * scale[node], 1.0), target) for target, edge_time in dag[node]]
+            for child_flow, target in candidates:
+                if child_flow <= 0:
+                    continue
+                counter += 1
+                if target is None:
+                    heapq.heappush(heap, (-child_flow, counter, child_flow, node, prefix, True))
+                else:
+                    heapq.heappush(heap, (-child_flow * best[target], counter, child_flow, target, prefix, False))
+        return paths
+
+    @property
+    def total(self) -> float:
+        callees = {target for edges in self.callees for target, _ in edges}
+        return sum(cum for node, cum in enumerate(self.cum_times) if node not in callees)
+
+
+class CallGraphParser:
+    """Load the pstats caller graph for hot-path extraction."""
+
+    def __init__(self, profile_path: Path):
+        self.profile_path = profile_path
+
+    def parse(self) -> CallGraph:
+        import pstats
+
+        try:
+            stats = pstats.Stats(str(self.profile_path))
+        except Exception as exc:
+            raise click.ClickException(f"{self.profile_path} is not a pstats profile; hot paths need the caller graph") from exc
+        stats.strip_dirs()
+        return CallGraph.from_stats(stats.stats)
+
+
+def _read_varint(buf, pos: int) -> tuple:
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def iter_proto_fields(buf):
+    """Yield (field number, wire type, value) for each field of a protobuf message.
+
+    Varints decode to ints, length-delimited fields to memoryview slices, and
+    fixed-width fields to little-endian ints.
+    """
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field, wire = key >> 3, key & 7
+        if wire == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire == 2:
+            length, pos = _read_varint(buf, pos)
+            if pos + length > end:
+                raise ValueError("truncated protobuf field")
+            value = buf[pos : pos + length]
+            pos += length
+        elif wire == 1:
+            value = int.from_bytes(buf[pos : pos + 8], "little")
+            pos += 8
+        elif wire == 5:
+            value = int.from_bytes(buf[pos : pos + 4], "little")
+            pos += 4
+        else:
+            raise ValueError(f"unsupported protobuf wire type {wire}")
+        yield field, wire, value
+
+
+def proto_varints(wire: int, value) -> List[int]:
+    """Values of a repeated varint field, packed or not."""
+    if wire == 0:
+        return [value]
+    values = []
+    pos = 0
+    while pos < len(value):
+        item, pos = _read_varint(value, pos)
+        values.append(item)
+    return values
+
+
+def pprof_entries(flat: Dict[str, float], cum: Dict[str, float], total: float, scale: float = 1.0) -> List[Dict]:
+    """`go tool pprof -top` rows: flat and cumulative per function, ordered by flat then cumulative."""
+    entries = []
+    running = 0
+    for name, cum_value in sorted(cum.items(), key=lambda item: (flat.get(item[0], 0), item[1]), reverse=True):
+        flat_value = flat.get(name, 0)
+        running += flat_value
+        entries.append(
+            {
+                "function": name,
+                "flat_s": flat_value * scale,
+                "flat_pct": flat_value / total * 100.0 if total else 0.0,
+                "sum_pct": running / total * 100.0 if total else 0.0,
+                "cum_s": cum_value * scale,
+                "cum_pct": cum_value / total * 100.0 if total else 0.0,
+            }
+        )
+    return entries
+
+
+class GoPprofParser:
+    """Decode Go pprof profiles (gzipped profile.proto) in-process.
+
+    Every sample is kept, so flat and cumulative totals are exact and the
+    full call stacks land in a StackTrie. Profiles that are not protobuf
+    (legacy text formats) fall back to `go tool pprof -top` when Go is
+    installed.
+    """
+
+    TOP_RE = re.compile(
+        r"^\s*(\d+(?:\.\d+)?(?:ms|s))\s+(\d+(?:\.\d+)?)%\s+(\d+(?:\.\d+)?)%\s+"
+        r"(\d+(?:\.\d+)?(?:ms|s))\s+(\d+(?:\.\d+)?)%\s+(.+)$"
+    )
+    TIME_UNITS = {"nanoseconds": 1e-9, "microseconds": 1e-6, "milliseconds": 1e-3, "seconds": 1.0}
+
+    def __init__(self, profile_path: Path):
         self.profile_path = profile_path
 
     def parse(self) -> Dict:
+        raw = self.profile_path.read_bytes()
+        try:
+            if raw[:2] == GZIP_MAGIC:
+                raw = gzip.decompress(raw)
+            return self._decode(memoryview(raw))
+        except (ValueError, IndexError, KeyError, OSError, EOFError) as exc:
+            if shutil.which("go"):
+                return self._parse_go_tool()
+            raise click.ClickException(f"{self.profile_path} is not a pprof protobuf profile ({exc}) and `go` is not installed")
+
+    def _decode(self, buf: memoryview) -> Dict:
+        strings: List[str] = []
+        sample_types = []
+        samples = []
+        locations: Dict[int, List[int]] = {}
+        functions: Dict[int, tuple] = {}
+        duration_ns = 0
+        default_type = 0
+        for field, wire, value in iter_proto_fields(buf):
+            if field == 1 and wire == 2:
+                sample_types.append(self._decode_value_type(value))
+            elif field == 2 and wire == 2:
+                samples.append(value)
+            elif field == 4 and wire == 2:
+                location_id, function_ids = self._decode_location(value)
+                locations[location_id] = function_ids
+            elif field == 5 and wire == 2:
+                function_id, name_idx, filename_idx = self._decode_function(value)
+                functions[function_id] = (name_idx, filename_idx)
+            elif field == 6 and wire == 2:
+                strings.append(bytes(value).decode("utf-8", "replace"))
+            elif field == 10 and wire == 0:
+                duration_ns = value
+            elif field == 14 and wire == 0:
+                default_type = value
+        if not sample_types:
+            raise ValueError("profile has no sample types")
+
+        # go tool pprof shows the last sample type unless the profile names a default.
+        value_index = len(sample_types) - 1
+        if default_type:
+            value_index = next((idx for idx, (type_idx, _) in enumerate(sample_types) if type_idx == default_type), value_index)
+        sample_type, unit = (strings[idx] for idx in sample_types[value_index])
+        scale = self.TIME_UNITS.get(unit, 1.0)
+
+        # Many samples share a stack; fold them before resolving frames.
+        stack_values: Dict[tuple, int] = defaultdict(int)
+        for sample in samples:
+            location_ids: List[int] = []
+            values: List[int] = []
+            for field, wire, value in iter_proto_fields(sample):
+                if field == 1:
+                    location_ids.extend(proto_varints(wire, value))
+                elif field == 2:
+                    values.extend(proto_varints(wire, value))
+            amount = values[value_index] if value_index < len(values) else 0
+            if amount >= 1 << 63:
+                amount -= 1 << 64
+            if amount:
+                stack_values[tuple(location_ids)] += amount
+
+        frame_names = {
+            function_id: strings[name_idx] or f"function#{function_id}" for function_id, (name_idx, _) in functions.items()
+        }
+        location_frames: Dict[int, List[str]] = {}
+        for location_id, function_ids in locations.items():
+            location_frames[location_id] = [frame_names.get(function_id, f"function#{function_id}") for function_id in function_ids]
+
+        # Sums stay in integer profile units until the end so totals are exact.
+        flat: Dict[str, int] = defaultdict(int)
+        cum: Dict[str, int] = defaultdict(int)
+        trie = StackTrie()
+        total = 0
+        for location_ids, value in stack_values.items():
+            # Locations run leaf first; inlined frames within a location are listed innermost first too.
+            leaf_first = [name for location_id in location_ids for name in location_frames.get(location_id) or [f"location#{location_id}"]]
+            if not leaf_first:
+                continue
+            total += value
+            flat[leaf_first[0]] += value
+            for name in set(leaf_first):
+                cum[name] += value
+            trie.add(leaf_first[::-1], value * scale)
+        trie.finish()
+
+        return {
+            "duration_s": duration_ns / 1e9,
+            "total_samples_s": total * scale,
+            "sample_type": sample_type,
+            "unit": "seconds" if unit in self.TIME_UNITS else unit,
+            "entries": pprof_entries(flat, cum, total, scale),
+            "stacks": trie,
+        }
+
+    @staticmethod
+    def _decode_value_type(buf: memoryview) -> tuple:
+        type_idx = unit_idx = 0
+        for field, _, value in iter_proto_fields(buf):
+            if field == 1:
+                type_idx = value
+            elif field == 2:
+                unit_idx = value
+        return type_idx, unit_idx
+
+    @staticmethod
+    def _decode_location(buf: memoryview) -> tuple:
+        location_id = 0
+        function_ids = []
+        for field, wire, value in iter_proto_fields(buf):
+            if field == 1:
+                location_id = value
+            elif field == 4 and wire == 2:
+                for line_field, _, line_value in iter_proto_fields(value):
+                    if line_field == 1:
+                        function_ids.append(line_value)
+                        break
+        return location_id, function_ids
+
+    @staticmethod
+    def _decode_function(buf: memoryview) -> tuple:
+        function_id = name_idx = filename_idx = 0
+        for field, _, value in iter_proto_fields(buf):
+            if field == 1:
+                function_id = value
+            elif field == 2:
+                name_idx = value
+            elif field == 4:
+                filename_idx = value
+        return function_id, name_idx, filename_idx
+
+    def _parse_go_tool(self) -> Dict:
         output = subprocess.run(
             ["go", "tool", "pprof", "-top", "-nodecount=200", str(self.profile_path)],
             check=True,
@@ -289,6 +2489,7 @@ class GoPprofParser:
         return {
             "duration_s": total_duration_s,
             "total_samples_s": total_samples_s,
+            "unit": "seconds",
             "entries": entries,
         }
 
@@ -300,8 +2501,153 @@ class GoPprofParser:
         return float(value)
 
 
+class StutterTracker:
+    """Streaming frame-spike detection and attribution for harness CSV rows.
+
+    A row is a spike when `frame_max_ms` exceeds `spike_factor` times the
+    median of the preceding `window` rows. Its excess over that median is
+    the row's jank, split between GC pause (`pause_delta_ns`), update and
+    draw time over their own rolling medians; whatever those do not cover
+    is unexplained. Spikes at most `cluster_gap` rows apart form a cluster.
+    Only the rolling windows and the `keep` worst clusters are held.
+    """
+
+    SOURCES = ("gc", "update", "draw", "unexplained")
+
+    def __init__(self, spike_factor: float = 2.0, window: int = 30, min_history: int = 5, cluster_gap: int = 2, keep: int = 10):
+        self.spike_factor = spike_factor
+        self.window = window
+        self.min_history = min_history
+        self.cluster_gap = cluster_gap
+        self.keep = keep
+        self.history = {field: (deque(), []) for field in ("frame_max_ms", "update_max_ms", "draw_max_ms")}
+        self.heap = deque(maxlen=window + 1)
+        self.heap_growth_total = 0.0
+        self.heap_growth_seconds = 0
+        self.rows = 0
+        self.spikes = 0
+        self.jank = dict.fromkeys(self.SOURCES, 0.0)
+        self.clusters: List[tuple] = []
+        self.cluster_count = 0
+        self.gc_growth: List[float] = []
+        self.current: Dict | None = None
+        self.last_spike_row = -1
+
+    def add(self, row: Dict) -> None:
+        self.rows += 1
+        heap_alloc = row.get("heap_alloc")
+        t_unix = row.get("t_unix")
+        has_heap = isinstance(heap_alloc, float) and isinstance(t_unix, int)
+        if has_heap and self.heap and t_unix > self.heap[-1][0]:
+            self.heap_growth_total += max(heap_alloc - self.heap[-1][1], 0.0)
+            self.heap_growth_seconds += t_unix - self.heap[-1][0]
+        frame = row.get("frame_max_ms")
+        medians = {field: self._median(field) for field in self.history}
+        if isinstance(frame, float) and len(self.history["frame_max_ms"][0]) >= self.min_history:
+            baseline = medians["frame_max_ms"]
+            if baseline > 0 and frame > self.spike_factor * baseline:
+                self._spike(row, frame - baseline, medians)
+        if self.current is not None and self.rows - self.last_spike_row > self.cluster_gap:
+            self._close_cluster()
+        for field in self.history:
+            value = row.get(field)
+            if isinstance(value, float):
+                self._push(field, value)
+        if has_heap:
+            self.heap.append((t_unix, heap_alloc))
+
+    def _spike(self, row: Dict, excess: float, medians: Dict[str, float]) -> None:
+        gc_ms = (row.get("pause_delta_ns") or 0.0) / 1e6
+        contributions = {
+            "gc": gc_ms,
+            "update": max((row.get("update_max_ms") or 0.0) - medians["update_max_ms"], 0.0),
+            "draw": max((row.get("draw_max_ms") or 0.0) - medians["draw_max_ms"], 0.0),
+        }
+        explained = sum(contributions.values())
+        scale = excess / explained if explained > excess else 1.0
+        shares = {source: value * scale for source, value in contributions.items()}
+        shares["unexplained"] = max(excess - explained, 0.0)
+
+        self.spikes += 1
+        for source, value in shares.items():
+            self.jank[source] += value
+        if self.current is None:
+            growth = None
+            if len(self.heap) >= 2 and self.heap[-1][0] > self.heap[0][0]:
+                growth = (self.heap[-1][1] - self.heap[0][1]) / (self.heap[-1][0] - self.heap[0][0])
+            self.current = {
+                "start": row.get("t_unix", ""),
+                "rows": 0,
+                "peak_ms": 0.0,
+                "jank": dict.fromkeys(self.SOURCES, 0.0),
+                "gc": 0,
+                "heap_growth": growth,
+            }
+        cluster = self.current
+        cluster["rows"] += 1
+        cluster["peak_ms"] = max(cluster["peak_ms"], row["frame_max_ms"])
+        cluster["gc"] += int(row.get("num_gc_delta") or 0) or (1 if gc_ms > 0 else 0)
+        for source, value in shares.items():
+            cluster["jank"][source] += value
+        self.last_spike_row = self.rows
+
+    def _close_cluster(self) -> None:
+        cluster = self.current
+        self.current = None
+        cluster["total_jank"] = sum(cluster["jank"].values())
+        cluster["source"] = max(cluster["jank"], key=cluster["jank"].get)
+        if cluster["source"] == "gc" and cluster["heap_growth"] is not None:
+            self.gc_growth.append(cluster["heap_growth"])
+        self.cluster_count += 1
+        entry = (cluster["total_jank"], self.cluster_count, cluster)
+        if len(self.clusters) < self.keep:
+            heapq.heappush(self.clusters, entry)
+        elif entry > self.clusters[0]:
+            heapq.heapreplace(self.clusters, entry)
+
+    def _push(self, field: str, value: float) -> None:
+        order, ordered = self.history[field]
+        order.append(value)
+        bisect.insort(ordered, value)
+        if len(order) > self.window:
+            del ordered[bisect.bisect_left(ordered, order.popleft())]
+
+    def _median(self, field: str) -> float:
+        ordered = self.history[field][1]
+        if not ordered:
+            return 0.0
+        mid = len(ordered) // 2
+        return ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2.0
+
+    def summary(self) -> Dict:
+        if self.current is not None:
+            self._close_cluster()
+        return {
+            "spike_factor": self.spike_factor,
+            "window": self.window,
+            "rows": self.rows,
+            "spikes": self.spikes,
+            "clusters": self.cluster_count,
+            "jank_ms": dict(self.jank),
+            "worst_clusters": [cluster for _, _, cluster in sorted(self.clusters, key=lambda entry: entry[0], reverse=True)],
+            "gc_heap_growth": statistics.fmean(self.gc_growth) if self.gc_growth else None,
+            "gc_clusters": len(self.gc_growth),
+            "heap_growth": self.heap_growth_total / self.heap_growth_seconds if self.heap_growth_seconds else None,
+        }
+
+
 class PerfCSVParser:
-    """Parse harness CSV logs and compute steady-state summaries."""
+    """Stream harness CSV logs and summarize the run after its warm-up.
+
+    Only the first `warmup_scan_rows` rows are buffered, to locate the end
+    of warm-up with a single change-point search over `fps` and
+    `frame_p99_ms`; everything after streams through running totals,
+    quantile sketches, and one buffered window, so memory stays constant
+    however long the log is. Each non-overlapping `window_rows` window is
+    reduced to percentiles; at most MAX_WINDOWS of them are kept, by
+    dropping every other kept window and doubling the keep stride whenever
+    the list fills.
+    """
 
     FLOAT_FIELDS = {
         "fps",
@@ -317,87 +2663,407 @@ class PerfCSVParser:
         "gc_cpu_fraction",
     }
     INT_FIELDS = {"t_unix", "wave", "enemies", "bullets", "num_gc", "num_gc_delta"}
+    SUMMARY_FIELDS = ("fps", "frame_max_ms", "frame_p99_ms", "draw_max_ms", "update_max_ms", "heap_alloc", "heap_inuse")
+    CHANGE_POINT_FIELDS = ("fps", "frame_p99_ms")
+    MIN_SEGMENT_ROWS = 5
+    # Share of the variance a warm-up/steady split must explain before rows are trimmed.
+    MIN_CHANGE_POINT_GAIN = 0.3
+    WORST_ROWS = 5
+    MAX_WINDOWS = 96
 
-    def __init__(self, csv_path: Path):
+    def __init__(self, csv_path: Path, warmup_scan_rows: int = 300, window_rows: int = 30, trim_warmup: bool = True):
         self.csv_path = csv_path
+        self.warmup_scan_rows = warmup_scan_rows
+        self.window_rows = window_rows
+        self.trim_warmup = trim_warmup
+
+    @property
+    def cache_tag(self) -> str:
+        return f"scan={self.warmup_scan_rows if self.trim_warmup else 0}:window={self.window_rows}"
 
     def parse(self) -> Dict:
-        rows = []
-        with self.csv_path.open(newline="") as fh:
-            reader = csv.DictReader(fh)
-            for raw in reader:
-                row = {}
-                for key, value in raw.items():
-                    if value is None or value == "":
-                        row[key] = value
-                    elif key in self.INT_FIELDS:
-                        row[key] = int(float(value))
-                    elif key in self.FLOAT_FIELDS:
-                        row[key] = float(value)
-                    else:
-                        row[key] = value
-                rows.append(row)
+        self.samples = 0
+        self.steady_rows = 0
+        self.sketches = {field: DDSketch() for field in self.SUMMARY_FIELDS}
+        self.worst: List[tuple] = []
+        self.stutter = StutterTracker()
+        self.windows: List[Dict] = []
+        self.window: List[Dict] = []
+        self.window_count = 0
+        self.window_stride = 1
+        head: List[Dict] = []
+        warmup_rows = 0
+
+        with open_text(self.csv_path) as fh:
+            for row in self.iter_rows(fh):
+                self.samples += 1
+                if head is not None:
+                    head.append(row)
+                    if len(head) < self.warmup_scan_rows:
+                        continue
+                    warmup_rows = self.detect_warmup(head) if self.trim_warmup else 0
+                    for buffered in head[warmup_rows:]:
+                        self._consume(buffered)
+                    warmup_summary = self._warmup_summary(head[:warmup_rows])
+                    head = None
+                    continue
+                self._consume(row)
+        if head is not None:
+            warmup_rows = self.detect_warmup(head) if self.trim_warmup else 0
+            for buffered in head[warmup_rows:]:
+                self._consume(buffered)
+            warmup_summary = self._warmup_summary(head[:warmup_rows])
+        self._close_window()
 
         return {
-            "rows": rows,
-            "fps": [row["fps"] for row in rows if "fps" in row],
-            "frame_max_ms": [row["frame_max_ms"] for row in rows if "frame_max_ms" in row],
-            "frame_p99_ms": [row["frame_p99_ms"] for row in rows if "frame_p99_ms" in row],
-            "update_max_ms": [row["update_max_ms"] for row in rows if "update_max_ms" in row],
-            "draw_max_ms": [row["draw_max_ms"] for row in rows if "draw_max_ms" in row],
-            "heap_alloc": [row["heap_alloc"] for row in rows if "heap_alloc" in row],
-            "heap_inuse": [row["heap_inuse"] for row in rows if "heap_inuse" in row],
+            "samples": self.samples,
+            "steady_rows": self.steady_rows,
+            "warmup": warmup_summary,
+            "metrics": {field: sketch for field, sketch in self.sketches.items() if sketch.count},
+            "windows": self.windows,
+            "window_rows": self.window_rows,
+            "window_count": self.window_count,
+            "window_stride": self.window_stride,
+            "worst_rows": [row for _, _, row in sorted(self.worst, reverse=True)],
+            "stutter": self.stutter.summary(),
         }
 
+    def iter_rows(self, fh):
+        for raw in csv.DictReader(fh):
+            row = {}
+            for key, value in raw.items():
+                if value is None or value == "":
+                    row[key] = value
+                elif key in self.INT_FIELDS:
+                    row[key] = int(float(value))
+                elif key in self.FLOAT_FIELDS:
+                    row[key] = float(value)
+                else:
+                    row[key] = value
+            yield row
+
+    def detect_warmup(self, rows: List[Dict]) -> int:
+        """Rows before the best single change point, if warm-up is worse than what follows; else 0.
+
+        Each series is split where two constant segments explain it best
+        (least squared error, from prefix sums); the normalized costs of the
+        series are added so a split must fit FPS and frame time together.
+        """
+        n = len(rows)
+        if n < 2 * self.MIN_SEGMENT_ROWS:
+            return 0
+        series = []
+        for field in self.CHANGE_POINT_FIELDS:
+            values = [row.get(field) for row in rows]
+            if all(isinstance(value, float) for value in values):
+                series.append((field, values))
+        if not series:
+            return 0
+
+        combined = [0.0] * (n + 1)
+        for _, values in series:
+            prefix = [0.0]
+            prefix_sq = [0.0]
+            for value in values:
+                prefix.append(prefix[-1] + value)
+                prefix_sq.append(prefix_sq[-1] + value * value)
+
+            def sse(lo: int, hi: int) -> float:
+                total = prefix[hi] - prefix[lo]
+                return prefix_sq[hi] - prefix_sq[lo] - total * total / (hi - lo)
+
+            whole = sse(0, n)
+            for split in range(self.MIN_SEGMENT_ROWS, n - self.MIN_SEGMENT_ROWS + 1):
+                combined[split] += (sse(0, split) + sse(split, n)) / whole if whole > 0 else 1.0
+
+        split = min(range(self.MIN_SEGMENT_ROWS, n - self.MIN_SEGMENT_ROWS + 1), key=lambda idx: combined[idx])
+        if 1.0 - combined[split] / len(series) < self.MIN_CHANGE_POINT_GAIN:
+            return 0
+        for field, values in series:
+            before = statistics.fmean(values[:split])
+            after = statistics.fmean(values[split:])
+            # Lower FPS or slower frames before the split is warm-up; the opposite is a mid-run regression.
+            if (field == "fps" and before < after) or (field != "fps" and before > after):
+                return split
+        return 0
+
+    def _warmup_summary(self, rows: List[Dict]) -> Dict:
+        summary = {"rows": len(rows)}
+        if rows and isinstance(rows[0].get("t_unix"), int):
+            summary["start"] = rows[0]["t_unix"]
+        fps = [row["fps"] for row in rows if isinstance(row.get("fps"), float)]
+        if fps:
+            summary["fps_mean"] = statistics.fmean(fps)
+        frame = [row["frame_p99_ms"] for row in rows if isinstance(row.get("frame_p99_ms"), float)]
+        if frame:
+            summary["frame_p99_ms_mean"] = statistics.fmean(frame)
+        return summary
+
+    def _consume(self, row: Dict) -> None:
+        self.steady_rows += 1
+        self.stutter.add(row)
+        for field, sketch in self.sketches.items():
+            value = row.get(field)
+            if isinstance(value, float):
+                sketch.add(value)
+        frame_max = row.get("frame_max_ms")
+        if isinstance(frame_max, float):
+            entry = (frame_max, -self.steady_rows, row)
+            if len(self.worst) < self.WORST_ROWS:
+                heapq.heappush(self.worst, entry)
+            elif entry > self.worst[0]:
+                heapq.heapreplace(self.worst, entry)
+        self.window.append(row)
+        if len(self.window) >= self.window_rows:
+            self._close_window()
+
+    def _close_window(self) -> None:
+        if not self.window:
+            return
+        index = self.window_count
+        self.window_count += 1
+        if index % self.window_stride:
+            self.window = []
+            return
+        fps = [row["fps"] for row in self.window if isinstance(row.get("fps"), float)]
+        frame = [row["frame_max_ms"] for row in self.window if isinstance(row.get("frame_max_ms"), float)]
+        self.windows.append(
+            {
+                "start": self.window[0].get("t_unix", ""),
+                "rows": len(self.window),
+                "fps_p50": percentile(fps, 50) if fps else None,
+                "frame_max_p50": percentile(frame, 50) if frame else None,
+                "frame_max_p95": percentile(frame, 95) if frame else None,
+                "frame_max_p99": percentile(frame, 99) if frame else None,
+            }
+        )
+        self.window = []
+        if len(self.windows) > self.MAX_WINDOWS:
+            self.windows = self.windows[::2]
+            self.window_stride *= 2
+
 
 class PerfettoTraceParser:
-    """Parse exported Perfetto or Chrome trace JSON."""
+    """Stream exported Perfetto or Chrome trace JSON (plain or gzipped) into an EventTable.
+
+    Complete (X), instant (i/I), and paired begin/end (B/E) events are kept,
+    and counter (C) events go to a CounterTable.
+    With jobs > 1, uncompressed input is split into byte-range shards that are
+    parsed in a process pool and concatenated in file order.
 
-    def __init__(self, json_path: Path):
+    The file is streamed, but every slice stays in the table (a few dozen bytes
+    per event), so memory is O(events): self time, concurrency, launch latency,
+    Kineto attribution, filtering, and serve mode all need the rows.
+    rows=False instead summarizes every SUMMARY_CHUNK slices into a running
+    TraceSummary and drops them, keeping memory bounded by the number of
+    distinct names and tracks; those row-based views are then skipped,
+    nesting is not reconstructed (self time equals duration), and counters
+    are not collected. Sharded workers then send back only their
+    partial summaries, merged in file order, instead of their table columns,
+    together with their unmatched B and E marks, which the parent pairs across
+    shard boundaries. As with rows, a B that is never closed counts as a
+    zero-length slice.
+    """
+
+    # Slices buffered before each summarize-and-merge in summary-only mode.
+    SUMMARY_CHUNK = 1 << 16
+
+    def __init__(self, json_path: Path, jobs: int = 1, rows: bool = True):
         self.json_path = json_path
+        self.jobs = jobs
+        self.rows = rows
+
+    @property
+    def cache_tag(self) -> str:
+        return "" if self.rows else "summary"
 
     def parse(self) -> Dict:
-        payload = json.loads(self.json_path.read_text())
-        trace_events = payload.get("traceEvents") if isinstance(payload, dict) else payload
-        if not isinstance(trace_events, list):
-            raise click.ClickException("Unsupported JSON structure. Expected Perfetto/Chrome trace JSON with traceEvents.")
+        if self.jobs > 1:
+            shards = plan_trace_shards(self.json_path, self.jobs)
+            if len(shards) > 1:
+                return self._parse_sharded(shards) if self.rows else self._summarize_sharded(shards)
+        if not self.rows:
+            with open_text(self.json_path) as fh:
+                summary, min_ts, max_ts, open_slices, _ = self._ingest_summary(TraceEventStream(fh))
+            self._close_unmatched(summary, open_slices)
+            return {
+                "summary": summary,
+                "source": "perfetto_json",
+                "trace_span_s": ((max_ts - min_ts) / 1_000_000.0) if min_ts is not None and max_ts is not None else 0.0,
+            }
+        with open_text(self.json_path) as fh:
+            table, counters, min_ts, max_ts = self._ingest(TraceEventStream(fh))
+        table.resolve_begin_end()
+
+        return {
+            "events": table,
+            "counters": counters,
+            "source": "perfetto_json",
+            "trace_span_s": ((max_ts - min_ts) / 1_000_000.0) if min_ts is not None and max_ts is not None else 0.0,
+        }
+
+    def _parse_sharded(self, shards: List[tuple]) -> Dict:
+        table = EventTable(nested=True)
+        counters = CounterTable()
+        min_ts = None
+        max_ts = None
+        with ProcessPoolExecutor(max_workers=min(self.jobs, len(shards))) as pool:
+            futures = [pool.submit(_parse_trace_shard, self.json_path, start, end) for start, end in shards]
+            for future in futures:
+                shard_table, shard_counters, shard_min, shard_max = future.result()
+                table.extend(shard_table)
+                counters.extend(shard_counters)
+                if shard_min is not None:
+                    min_ts = shard_min if min_ts is None else min(min_ts, shard_min)
+                    max_ts = shard_max if max_ts is None else max(max_ts, shard_max)
+        table.resolve_begin_end()
+
+        return {
+            "events": table,
+            "counters": counters,
+            "source": "perfetto_json",
+            "trace_span_s": ((max_ts - min_ts) / 1_000_000.0) if min_ts is not None and max_ts is not None else 0.0,
+        }
+
+    def _summarize_sharded(self, shards: List[tuple]) -> Dict:
+        summary = TraceSummary()
+        open_slices: Dict[str, List[tuple]] = defaultdict(list)
+        min_ts = None
+        max_ts = None
+        with ProcessPoolExecutor(max_workers=min(self.jobs, len(shards))) as pool:
+            futures = [pool.submit(_parse_trace_shard, self.json_path, start, end, False) for start, end in shards]
+            for future in futures:
+                shard_summary, shard_min, shard_max, shard_open, shard_orphans = future.result()
+                summary.merge(shard_summary)
+                # A shard's orphan Es close, in order, the Bs still open from earlier shards on the same track.
+                paired = EventTable()
+                for track, ends in shard_orphans.items():
+                    stack = open_slices.get(track)
+                    for end_us in ends:
+                        if not stack:
+                            break
+                        name, category, start_us = stack.pop()
+                        paired.append(name, category, track, max(end_us - start_us, 0.0) / 1_000_000.0, start_us)
+                for track, opened in shard_open.items():
+                    open_slices[track].extend(opened)
+                if len(paired):
+                    summary.merge(paired.summarize())
+                if shard_min is not None:
+                    min_ts = shard_min if min_ts is None else min(min_ts, shard_min)
+                    max_ts = shard_max if max_ts is None else max(max_ts, shard_max)
+        self._close_unmatched(summary, open_slices)
+        return {
+            "summary": summary,
+            "source": "perfetto_json",
+            "trace_span_s": ((max_ts - min_ts) / 1_000_000.0) if min_ts is not None and max_ts is not None else 0.0,
+        }
 
-        events = []
+    def _ingest(self, trace_events) -> tuple:
+        table = EventTable(nested=True)
+        counters = CounterTable()
         min_ts = None
         max_ts = None
         for event in trace_events:
             if not isinstance(event, dict):
                 continue
             phase = event.get("ph", "X")
-            if phase not in {"X", "i", "I"}:
+            if phase == "C":
+                ts_us = parse_float(event.get("ts")) or 0.0
+                args = event.get("args")
+                if isinstance(args, dict):
+                    prefix = f"pid={event.get('pid', '?')} / {event.get('name', 'counter')}"
+                    for key, value in args.items():
+                        if isinstance(value, (int, float)) and not isinstance(value, bool):
+                            counters.append(f"{prefix} / {key}", ts_us, float(value))
+                continue
+            if phase in {"s", "f"}:
+                flow_id = event.get("id", event.get("bind_id"))
+                if flow_id is not None:
+                    ts_us = parse_float(event.get("ts")) or 0.0
+                    table.add_flow(f"{event.get('cat', '')}:{flow_id}", self._track_name(event), ts_us, phase == "s")
                 continue
-            dur_us = parse_float(event.get("dur"))
+            if phase not in {"X", "i", "I", "B", "E"}:
+                continue
+            dur_us = parse_float(event.get("dur")) if phase == "X" else None
             if dur_us is None or dur_us < 0:
                 dur_us = 0.0
             ts_us = parse_float(event.get("ts")) or 0.0
             name = str(event.get("name", "unnamed"))
             category = str(event.get("cat", ""))
+            args = event.get("args")
+            correlation = args.get("correlation") if isinstance(args, dict) else None
+            if not isinstance(correlation, int) or isinstance(correlation, bool):
+                correlation = None
+            row = table.append(name, category, self._track_name(event), dur_us / 1_000_000.0, ts_us, correlation=correlation)
+            if phase == "B":
+                table.mark_begin(row)
+            elif phase == "E":
+                table.mark_end(row)
+            end_us = ts_us + dur_us
+            min_ts = ts_us if min_ts is None else min(min_ts, ts_us)
+            max_ts = end_us if max_ts is None else max(max_ts, end_us)
+        return table, counters, min_ts, max_ts
+
+    def _ingest_summary(self, trace_events) -> tuple:
+        """Bounded-memory _ingest: pair B/E per track as they stream and fold slices into a TraceSummary in chunks.
+
+        Also returns the Bs still open at the end and the Es that found no open B,
+        per track in file order, so sharded callers can pair them across shards.
+        """
+        summary = TraceSummary()
+        chunk = EventTable()
+        open_slices: Dict[str, List[tuple]] = defaultdict(list)
+        orphan_ends: Dict[str, List[float]] = defaultdict(list)
+        min_ts = None
+        max_ts = None
+        for event in trace_events:
+            if not isinstance(event, dict):
+                continue
+            phase = event.get("ph", "X")
+            if phase not in {"X", "i", "I", "B", "E"}:
+                continue
+            ts_us = parse_float(event.get("ts")) or 0.0
             track = self._track_name(event)
-            workload = classify_workload(name, category)
-            events.append(
-                {
-                    "name": name,
-                    "category": category,
-                    "track": track,
-                    "workload": workload,
-                    "duration_s": dur_us / 1_000_000.0,
-                    "ts_us": ts_us,
-                }
-            )
+            if phase in {"B", "E"}:
+                min_ts = ts_us if min_ts is None else min(min_ts, ts_us)
+                max_ts = ts_us if max_ts is None else max(max_ts, ts_us)
+            if phase == "B":
+                open_slices[track].append((str(event.get("name", "unnamed")), str(event.get("cat", "")), ts_us))
+                continue
+            if phase == "E":
+                stack = open_slices.get(track)
+                if not stack:
+                    orphan_ends[track].append(ts_us)
+                    continue
+                name, category, start_us = stack.pop()
+                dur_us = max(ts_us - start_us, 0.0)
+                ts_us = start_us
+            else:
+                dur_us = parse_float(event.get("dur")) if phase == "X" else None
+                if dur_us is None or dur_us < 0:
+                    dur_us = 0.0
+                name = str(event.get("name", "unnamed"))
+                category = str(event.get("cat", ""))
+            chunk.append(name, category, track, dur_us / 1_000_000.0, ts_us)
             end_us = ts_us + dur_us
             min_ts = ts_us if min_ts is None else min(min_ts, ts_us)
             max_ts = end_us if max_ts is None else max(max_ts, end_us)
+            if len(chunk) >= self.SUMMARY_CHUNK:
+                summary.merge(chunk.summarize())
+                chunk = EventTable()
+        if len(chunk):
+            summary.merge(chunk.summarize())
+        return summary, min_ts, max_ts, open_slices, orphan_ends
 
-        return {
-            "events": events,
-            "source": "perfetto_json",
-            "trace_span_s": ((max_ts - min_ts) / 1_000_000.0) if min_ts is not None and max_ts is not None else 0.0,
-        }
+    @staticmethod
+    def _close_unmatched(summary: TraceSummary, open_slices: Dict[str, List[tuple]]) -> None:
+        """Count Bs that were never closed as zero-length slices, as resolve_begin_end does for rows."""
+        unmatched = EventTable()
+        for track, stack in open_slices.items():
+            for name, category, start_us in stack:
+                unmatched.append(name, category, track, 0.0, start_us)
+        if len(unmatched):
+            summary.merge(unmatched.summarize())
 
     def _track_name(self, event: Dict) -> str:
         pid = event.get("pid", "?")
@@ -408,28 +3074,137 @@ class PerfettoTraceParser:
         return " / ".join(str(piece) for piece in pieces)
 
 
+class TraceProcessorSession:
+    """One trace_processor instance per trace that answers every query against the loaded trace.
+
+    With the perfetto Python package installed, trace_processor_shell runs in
+    HTTP RPC mode on a local port and loads the trace once. Without it, each
+    query falls back to a one-shot `trace_processor_shell -q` run.
+    """
+
+    def __init__(self, trace_path: Path, binary: str):
+        self.trace_path = trace_path
+        self.binary = binary
+        self._processor = None
+
+    def __enter__(self):
+        try:
+            from perfetto.trace_processor import TraceProcessor, TraceProcessorConfig
+        except ImportError:
+            return self
+        self._processor = TraceProcessor(trace=str(self.trace_path), config=TraceProcessorConfig(bin_path=self.binary))
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._processor is not None:
+            self._processor.close()
+            self._processor = None
+
+    def query(self, sql: str) -> List[Dict[str, str]]:
+        """Run a query and return rows as strings, matching the CSV output of the one-shot path."""
+        if self._processor is None:
+            output = subprocess.run(
+                [self.binary, str(self.trace_path), "-q", sql],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            return list(csv.DictReader(output.splitlines()))
+        result = self._processor.query(sql)
+        return [
+            {column: "" if getattr(row, column) is None else str(getattr(row, column)) for column in result.column_names}
+            for row in result
+        ]
+
+
 class PerfettoBinaryParser:
-    """Parse binary Perfetto traces through trace_processor_shell when available."""
+    """Parse binary Perfetto traces through trace_processor_shell when available.
+
+    By default the per-name/per-track totals, self time, and duration
+    percentiles are computed inside trace_processor and only summary rows come
+    back. rows=True fetches every slice instead, for views that need them.
+    Either way a report issues exactly one query through the trace's
+    TraceProcessorSession, so the one-shot fallback also loads the trace once.
+    """
+
+    SLICE_BASE = """
+      SELECT
+        s.id AS id,
+        s.name AS name,
+        ifnull(s.category, '') AS category,
+        s.ts AS ts,
+        s.dur AS dur,
+        ifnull(p.name, '') AS process_name,
+        ifnull(t.name, '') AS thread_name,
+        ifnull(t.tid, 0) AS tid,
+        ifnull(p.pid, 0) AS pid
+      FROM slice s
+      LEFT JOIN thread_track tt ON s.track_id = tt.id
+      LEFT JOIN thread t ON tt.utid = t.utid
+      LEFT JOIN process p ON t.upid = p.upid
+      WHERE s.dur >= 0
+    """
+
+    QUERY = f"""
+    WITH base AS ({SLICE_BASE})
+    SELECT name, category, ts, dur, process_name, thread_name, tid, pid FROM base;
+    """
 
-    QUERY = """
+    # Group totals and percentile ranks come back from one statement, tagged by `kind`, so even the
+    # one-shot `trace_processor_shell -q` fallback loads the trace only once per report.
+    # Percentiles use nearest rank: rank = ceil(p * n / 100), written with integer division.
+    AGGREGATE_QUERY = f"""
+    WITH
+      base AS ({SLICE_BASE}),
+      children AS (
+        SELECT parent_id, sum(dur) AS child_dur
+        FROM slice
+        WHERE parent_id IS NOT NULL AND dur >= 0
+        GROUP BY parent_id
+      ),
+      ranked AS (
+        SELECT
+          name,
+          dur,
+          row_number() OVER (PARTITION BY name ORDER BY dur) AS rn,
+          count(*) OVER (PARTITION BY name) AS n
+        FROM slice
+        WHERE dur >= 0
+      )
     SELECT
-      s.name AS name,
-      ifnull(s.category, '') AS category,
-      s.ts AS ts,
-      s.dur AS dur,
-      ifnull(p.name, '') AS process_name,
-      ifnull(t.name, '') AS thread_name,
-      ifnull(t.tid, 0) AS tid,
-      ifnull(p.pid, 0) AS pid
-    FROM slice s
-    LEFT JOIN thread_track tt ON s.track_id = tt.id
-    LEFT JOIN thread t ON tt.utid = t.utid
-    LEFT JOIN process p ON t.upid = p.upid
-    WHERE s.dur >= 0;
+      'group' AS kind,
+      b.name AS name,
+      b.category AS category,
+      b.process_name AS process_name,
+      b.thread_name AS thread_name,
+      b.tid AS tid,
+      b.pid AS pid,
+      count(*) AS cnt,
+      sum(b.dur) AS total_dur,
+      sum(max(b.dur - ifnull(c.child_dur, 0), 0)) AS self_dur,
+      min(b.ts) AS first_ts,
+      max(b.ts + b.dur) AS last_ts,
+      NULL AS n,
+      NULL AS rn,
+      NULL AS dur
+    FROM base b
+    LEFT JOIN children c ON c.parent_id = b.id
+    GROUP BY b.name, b.category, b.process_name, b.thread_name, b.tid, b.pid
+    UNION ALL
+    SELECT 'percentile', name, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, n, rn, dur
+    FROM ranked
+    WHERE rn IN ((50 * n + 99) / 100, (95 * n + 99) / 100, (99 * n + 99) / 100, n);
     """
 
-    def __init__(self, trace_path: Path):
+    PERCENTILES = (("p50_s", 50), ("p95_s", 95), ("p99_s", 99), ("max_s", 100))
+
+    def __init__(self, trace_path: Path, rows: bool = False):
         self.trace_path = trace_path
+        self.rows = rows
+
+    @property
+    def cache_tag(self) -> str:
+        return "rows" if self.rows else "aggregate"
 
     def parse(self) -> Dict:
         binary = self._find_trace_processor_binary()
@@ -437,36 +3212,26 @@ class PerfettoBinaryParser:
             raise click.ClickException(
                 "No trace processor binary found. Set TRACE_PROCESSOR_BIN or install trace_processor_shell."
             )
-        output = subprocess.run(
-            [binary, str(self.trace_path), "-q", self.QUERY],
-            check=True,
-            capture_output=True,
-            text=True,
-        ).stdout
-        reader = csv.DictReader(output.splitlines())
-        events = []
+        with TraceProcessorSession(self.trace_path, binary) as session:
+            return self.parse_session(session)
+
+    def parse_session(self, session) -> Dict:
+        if not self.rows:
+            rows = session.query(self.AGGREGATE_QUERY)
+            summary, span_s = self._summarize_aggregate_rows(
+                [row for row in rows if row.get("kind") == "group"], [row for row in rows if row.get("kind") == "percentile"]
+            )
+            return {"summary": summary, "source": "perfetto_binary", "trace_span_s": span_s}
+
+        events = EventTable(nested=True)
         min_ts = None
         max_ts = None
-        for row in reader:
+        for row in session.query(self.QUERY):
             dur = parse_float(row.get("dur")) or 0.0
             ts = parse_float(row.get("ts")) or 0.0
             name = row.get("name") or "unnamed"
             category = row.get("category") or ""
-            thread_name = row.get("thread_name") or ""
-            process_name = row.get("process_name") or ""
-            tid = row.get("tid") or "?"
-            pid = row.get("pid") or "?"
-            track = " / ".join(piece for piece in [process_name, thread_name, f"pid={pid}", f"tid={tid}"] if piece)
-            events.append(
-                {
-                    "name": name,
-                    "category": category,
-                    "track": track,
-                    "workload": classify_workload(name, category),
-                    "duration_s": dur / 1_000_000_000.0,
-                    "ts_us": ts / 1000.0,
-                }
-            )
+            events.append(name, category, self._track_name(row), dur / 1_000_000_000.0, ts / 1000.0)
             end_ts = ts + dur
             min_ts = ts if min_ts is None else min(min_ts, ts)
             max_ts = end_ts if max_ts is None else max(max_ts, end_ts)
@@ -477,20 +3242,74 @@ class PerfettoBinaryParser:
             "trace_span_s": ((max_ts - min_ts) / 1_000_000_000.0) if min_ts is not None and max_ts is not None else 0.0,
         }
 
-    def _find_trace_processor_binary(self) -> str | None:
-        candidates = [
-            os.environ.get("TRACE_PROCESSOR_BIN"),
-            "trace_processor_shell",
-            "trace_processor",
-        ]
-        for candidate in candidates:
-            if not candidate:
-                continue
-            try:
-                subprocess.run([candidate, "--help"], capture_output=True, text=True, check=False)
-                return candidate
-            except FileNotFoundError:
+    def _summarize_aggregate_rows(self, groups: List[Dict], percentile_rows: List[Dict]) -> tuple:
+        ranked: Dict[str, Dict[int, float]] = defaultdict(dict)
+        counts: Dict[str, int] = {}
+        for row in percentile_rows:
+            name = row.get("name") or "unnamed"
+            counts[name] = int(parse_float(row.get("n")) or 0)
+            ranked[name][int(parse_float(row.get("rn")) or 0)] = (parse_float(row.get("dur")) or 0.0) / 1_000_000_000.0
+        # trace_processor returns groups unordered; first-seen order keeps ties stable like the row path.
+        groups.sort(key=lambda row: parse_float(row.get("first_ts")) or 0.0)
+
+        summary = TraceSummary()
+        summary.nested = True
+        min_ts = None
+        max_ts = None
+        for row in groups:
+            name = row.get("name") or "unnamed"
+            category = row.get("category") or ""
+            workload = classify_workload(name, category)
+            track = self._track_name(row)
+            count = int(parse_float(row.get("cnt")) or 0)
+            time_s = (parse_float(row.get("total_dur")) or 0.0) / 1_000_000_000.0
+            self_s = (parse_float(row.get("self_dur")) or 0.0) / 1_000_000_000.0
+            summary.event_count += count
+            summary.total_time_s += time_s
+            summary.total_self_s += self_s
+            summary.by_workload[workload] = summary.by_workload.get(workload, 0.0) + time_s
+            summary.by_workload_bytes.setdefault(workload, 0.0)
+            summary.by_track[track] = summary.by_track.get(track, 0.0) + time_s
+            entry = summary.by_name.setdefault(name, {"time_s": 0.0, "self_s": 0.0, "count": 0, "bytes": 0.0, "workload": workload})
+            entry["time_s"] += time_s
+            entry["self_s"] += self_s
+            entry["count"] += count
+            entry["workload"] = workload
+            if workload.startswith("Memcpy"):
+                summary.transfer_count += count
+                summary.transfer_time_s += time_s
+            first_ts = parse_float(row.get("first_ts"))
+            last_ts = parse_float(row.get("last_ts"))
+            if first_ts is not None and last_ts is not None:
+                min_ts = first_ts if min_ts is None else min(min_ts, first_ts)
+                max_ts = last_ts if max_ts is None else max(max_ts, last_ts)
+
+        for name, by_rank in ranked.items():
+            entry = summary.by_name.get(name)
+            total = counts.get(name, 0)
+            if entry is None or not total:
                 continue
+            for key, pct in self.PERCENTILES:
+                value = by_rank.get((pct * total + 99) // 100)
+                if value is not None:
+                    entry[key] = value
+
+        span_s = ((max_ts - min_ts) / 1_000_000_000.0) if min_ts is not None and max_ts is not None else 0.0
+        return summary, span_s
+
+    def _track_name(self, row: Dict) -> str:
+        thread_name = row.get("thread_name") or ""
+        process_name = row.get("process_name") or ""
+        tid = row.get("tid") or "?"
+        pid = row.get("pid") or "?"
+        return " / ".join(piece for piece in [process_name, thread_name, f"pid={pid}", f"tid={tid}"] if piece)
+
+    def _find_trace_processor_binary(self) -> str | None:
+        for candidate in (os.environ.get("TRACE_PROCESSOR_BIN"), "trace_processor_shell", "trace_processor"):
+            if candidate:
+                resolved = shutil.which(candidate)
+                if resolved:
+                    return resolved
         return None
 
 
@@ -508,7 +3327,7 @@ class NsightCSVParser:
                 row = {normalize_key(key): value for key, value in raw.items() if key is not None}
                 rows.append(row)
 
-        events = []
+        events = EventTable(with_bytes=True)
         kernel_metrics = []
         for row in rows:
             name = row.get("name") or row.get("operation") or row.get("kernel_name") or row.get("range") or "unnamed"
@@ -520,20 +3339,7 @@ class NsightCSVParser:
             dram_bw = self._metric(row, "dram_throughput_gb_s", "dram_bandwidth_gb_s", "memory_throughput_gb_s")
             mem_bw = self._metric(row, "mem_bw_gb_s", "memory_bandwidth_gb_s", "bandwidth_gb_s")
             sm_efficiency = self._metric(row, "sm_efficiency", "compute_throughput_pct", "sm_active_pct")
-            events.append(
-                {
-                    "name": name,
-                    "category": category,
-                    "track": str(track),
-                    "workload": classify_workload(name, category),
-                    "duration_s": duration_ns / 1_000_000_000.0,
-                    "bytes": bytes_value or 0.0,
-                    "occupancy": occupancy,
-                    "dram_bw_gb_s": dram_bw,
-                    "mem_bw_gb_s": mem_bw,
-                    "sm_efficiency_pct": sm_efficiency,
-                }
-            )
+            events.append(name, category, str(track), duration_ns / 1_000_000_000.0, bytes_value=bytes_value or 0.0)
             if occupancy is not None or dram_bw is not None or mem_bw is not None or sm_efficiency is not None:
                 kernel_metrics.append(
                     {
@@ -550,7 +3356,7 @@ class NsightCSVParser:
             "events": events,
             "kernel_metrics": kernel_metrics,
             "source": "nsight_csv",
-            "trace_span_s": sum(event["duration_s"] for event in events),
+            "trace_span_s": sum(events.duration_s),
         }
 
     def _duration_ns(self, row: Dict) -> float:
@@ -610,9 +3416,293 @@ class NsightCSVParser:
         return None
 
 
+def nice_bucket_width(span: float, max_buckets: int) -> float:
+    """Smallest 1/2/5 x 10^k width that covers span in at most max_buckets buckets."""
+    if span <= 0:
+        return 1.0
+    raw = span / max_buckets
+    scale = 10.0 ** math.floor(math.log10(raw))
+    for step in (1.0, 2.0, 5.0, 10.0):
+        if step * scale >= raw:
+            return step * scale
+    return 10.0 * scale
+
+
+def strict_float(value: str) -> float | None:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_datetime(value: str) -> float | None:
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class ColumnTable:
+    """Typed, column-major storage for a CSV of metrics.
+
+    Numeric columns are array('q') (ints) or array('d') (floats, NaN for
+    missing cells), datetime columns are array('d') of epoch seconds, and
+    string columns are array('I') ids into a per-column StringTable.
+    """
+
+    TYPECODES = {"int": "q", "float": "d", "datetime": "d", "string": "I"}
+
+    def __init__(self, names: List[str], types: List[str]):
+        self.names = names
+        self.types = types
+        self.columns = [array(self.TYPECODES[kind]) for kind in types]
+        self.strings = [StringTable() if kind == "string" else None for kind in types]
+        self.invalid = [0] * len(names)
+        self.rows = 0
+
+    def index(self, name: str) -> int:
+        try:
+            return self.names.index(name)
+        except ValueError:
+            raise click.ClickException(f"Unknown column {name!r}; available: {', '.join(self.names)}") from None
+
+    def extend(self, chunk: List[List[str]]) -> None:
+        """Append a chunk of raw rows, converting one column at a time."""
+        width = len(self.names)
+        if set(map(len, chunk)) != {width}:
+            chunk = [row + [""] * (width - len(row)) if len(row) < width else row[:width] for row in chunk]
+        for idx, values in enumerate(zip(*chunk)):
+            kind = self.types[idx]
+            if kind == "string":
+                table = self.strings[idx]
+                for value in dict.fromkeys(values):
+                    table.intern(value)
+                self.columns[idx].extend(map(table.ids.__getitem__, values))
+            elif kind == "datetime":
+                # Log timestamps repeat across rows, so convert each distinct value once.
+                distinct = list(dict.fromkeys(values))
+                lookup = dict(zip(distinct, self._convert(idx, distinct, parse_datetime)))
+                self.columns[idx].extend(map(lookup.__getitem__, values))
+            else:
+                self._extend_numeric(idx, values)
+        self.rows += len(chunk)
+
+    def _extend_numeric(self, idx: int, values) -> None:
+        column = self.columns[idx]
+        if column.typecode == "q":
+            try:
+                column.extend(map(int, values))
+                return
+            except (ValueError, OverflowError):
+                # A blank or fractional cell: ints cannot hold NaN, so widen the column.
+                column = self.columns[idx] = array("d", column[: self.rows])
+                self.types[idx] = "float"
+        try:
+            column.extend(map(float, values))
+            return
+        except ValueError:
+            del column[self.rows :]
+        try:
+            # Blank cells are the usual culprit; keep them on the C-level path as NaN.
+            column.extend(map(float, [value or "nan" for value in values]))
+        except ValueError:
+            del column[self.rows :]
+            column.extend(self._convert(idx, values, strict_float))
+
+    def _convert(self, idx: int, values, convert) -> List[float]:
+        converted = []
+        for value in values:
+            number = convert(value) if value.strip() else None
+            if number is None:
+                if value.strip():
+                    self.invalid[idx] += 1
+                number = math.nan
+            converted.append(number)
+        return converted
+
+    def numeric(self, idx: int) -> List[float]:
+        """Non-missing values of a numeric or datetime column."""
+        column = self.columns[idx]
+        if column.typecode == "q":
+            return column.tolist()
+        return [value for value in column if value == value]
+
+    def column_stats(self, idx: int) -> Dict:
+        column = self.columns[idx]
+        if numpy is not None and len(column):
+            values = numpy.frombuffer(column, dtype=numpy.int64 if column.typecode == "q" else numpy.float64)
+            values = values[~numpy.isnan(values)] if column.typecode == "d" else values.astype(numpy.float64)
+            if not len(values):
+                return {"count": 0, "missing": self.rows}
+            p50, p95, p99 = numpy.percentile(values, [50, 95, 99]).tolist()
+            return {
+                "count": int(len(values)),
+                "missing": self.rows - int(len(values)),
+                "mean": float(values.mean()),
+                "std": float(values.std()),
+                "min": float(values.min()),
+                "p50": p50,
+                "p95": p95,
+                "p99": p99,
+                "max": float(values.max()),
+            }
+        values = sorted(self.numeric(idx))
+        if not values:
+            return {"count": 0, "missing": self.rows}
+        mean = math.fsum(values) / len(values)
+        return {
+            "count": len(values),
+            "missing": self.rows - len(values),
+            "mean": mean,
+            "std": math.sqrt(math.fsum((value - mean) ** 2 for value in values) / len(values)),
+            "min": float(values[0]),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": float(values[-1]),
+        }
+
+    def string_stats(self, idx: int, top: int = 3) -> Dict:
+        table = self.strings[idx]
+        counts = group_sum(self.columns[idx], None, len(table))
+        ranked = sorted(range(len(table)), key=lambda value_id: counts[value_id], reverse=True)
+        return {
+            "distinct": len(table),
+            "missing": int(counts[table.ids[""]]) if "" in table.ids else 0,
+            "top": [(table[value_id], int(counts[value_id])) for value_id in ranked[:top] if table[value_id]],
+        }
+
+    def bucketed(self, time_idx: int, max_buckets: int) -> Dict:
+        """Per-bucket row counts and numeric column means over the time column."""
+        times = self.columns[time_idx]
+        present = [value for value in times if value == value] if times.typecode == "d" else times
+        if not present:
+            raise click.ClickException(f"Time column {self.names[time_idx]!r} has no numeric values")
+        start = min(present)
+        width = nice_bucket_width(max(present) - start, max_buckets)
+        start = math.floor(start / width) * width
+        size = int((max(present) - start) // width) + 1
+        targets = [idx for idx, kind in enumerate(self.types) if idx != time_idx and kind in {"int", "float"}]
+        means = {}
+        if numpy is not None:
+            stamps = self._as_float64(times)
+            # Rows without a timestamp go to a spill bucket at index `size`.
+            ids = numpy.where(numpy.isnan(stamps), size, (stamps - start) // width).astype(numpy.int64)
+            counts = numpy.bincount(ids, minlength=size + 1)[:size].tolist()
+            for idx in targets:
+                values = self._as_float64(self.columns[idx])
+                valid = ~numpy.isnan(values)
+                sums = numpy.bincount(ids[valid], weights=values[valid], minlength=size + 1)[:size].tolist()
+                filled = numpy.bincount(ids[valid], minlength=size + 1)[:size].tolist()
+                means[self.names[idx]] = [total / count if count else None for total, count in zip(sums, filled)]
+        else:
+            ids = [int((stamp - start) // width) if stamp == stamp else size for stamp in times]
+            counts = [0] * (size + 1)
+            for bucket in ids:
+                counts[bucket] += 1
+            for idx in targets:
+                sums = [0.0] * (size + 1)
+                filled = [0] * (size + 1)
+                for bucket, value in zip(ids, self.columns[idx]):
+                    if value == value:
+                        sums[bucket] += value
+                        filled[bucket] += 1
+                means[self.names[idx]] = [total / count if count else None for total, count in zip(sums[:size], filled[:size])]
+        buckets = [
+            {"start": start + bucket * width, "rows": int(counts[bucket]), "means": {name: values[bucket] for name, values in means.items()}}
+            for bucket in range(size)
+            if counts[bucket]
+        ]
+        return {"column": self.names[time_idx], "type": self.types[time_idx], "width": width, "buckets": buckets}
+
+    @staticmethod
+    def _as_float64(column: array):
+        if column.typecode == "q":
+            return numpy.frombuffer(column, dtype=numpy.int64).astype(numpy.float64)
+        return numpy.frombuffer(column, dtype=numpy.float64)
+
+
+class MetricsCSVParser:
+    """Load any metrics CSV into a ColumnTable and summarize every column.
+
+    Column types are inferred from the first INFER_ROWS rows; the file is
+    then read in CHUNK_ROWS chunks and converted a column at a time, so the
+    per-cell work is a C-level int()/float() map for clean numeric data.
+    """
+
+    INFER_ROWS = 1000
+    CHUNK_ROWS = 1 << 16
+    MAX_BUCKETS = 48
+
+    def __init__(self, csv_path: Path, time_column: str | None = None):
+        self.csv_path = csv_path
+        self.time_column = time_column
+
+    @property
+    def cache_tag(self) -> str:
+        return f"time={self.time_column}" if self.time_column else ""
+
+    def parse(self) -> Dict:
+        with self.csv_path.open(newline="") as fh:
+            reader = csv.reader(fh)
+            names = [header.strip() for header in next(reader, [])]
+            if not names:
+                raise click.ClickException(f"{self.csv_path} has no header row")
+            sample = list(filter(None, itertools.islice(reader, self.INFER_ROWS)))
+            table = ColumnTable(names, [self.infer_type([row[idx] if idx < len(row) else "" for row in sample]) for idx in range(len(names))])
+            table.extend(sample)
+            while True:
+                chunk = list(filter(None, itertools.islice(reader, self.CHUNK_ROWS)))
+                if not chunk:
+                    break
+                table.extend(chunk)
+
+        stats = {}
+        for idx, kind in enumerate(table.types):
+            stats[names[idx]] = table.string_stats(idx) if kind == "string" else table.column_stats(idx)
+            stats[names[idx]]["invalid"] = table.invalid[idx]
+        result = {"table": table, "rows": table.rows, "stats": stats, "time": None}
+        if self.time_column:
+            time_idx = table.index(self.time_column)
+            if table.types[time_idx] == "string":
+                raise click.ClickException(f"Time column {self.time_column!r} is not numeric or ISO 8601")
+            result["time"] = table.bucketed(time_idx, self.MAX_BUCKETS)
+        return result
+
+    @staticmethod
+    def infer_type(values: List[str]) -> str:
+        values = [value.strip() for value in values if value.strip()]
+        if not values:
+            return "string"
+        kind = "int"
+        for value in values:
+            if kind == "int":
+                try:
+                    int(value)
+                    continue
+                except ValueError:
+                    kind = "float"
+            if strict_float(value) is None:
+                kind = None
+                break
+        if kind:
+            return kind
+        if all(parse_datetime(value) is not None for value in values):
+            return "datetime"
+        return "string"
+
+
 class MarkdownFormatter:
     """Format parsed performance data as markdown."""
 
+    MAX_WINDOW_ROWS = 48
+    MAX_BUCKET_COLUMNS = 6
+    MAX_COUNTER_SLICES = 10
+    MAX_COUNTER_COLUMNS = 4
+
     def format_flamegraph(self, frames: List[Dict], input_file: str) -> str:
         total_time = max((frame.get("time_s", 0.0) for frame in frames), default=0.0)
         lines = [
@@ -646,9 +3736,72 @@ class MarkdownFormatter:
             for frame in significant[:20]:
                 lines.append(f"- `{frame.get('function', 'Unknown')}`: {frame.get('time_s', 0.0):.2f}s ({frame.get('percentage', 0.0):.2f}%)")
 
+        tree = FlameTree(frames)
+        total = tree.total
+        if total > 0:
+            lines.extend(self._format_flame_tree(tree, total))
+
         return "\n".join(lines)
 
-    def format_profile(self, profile_data: List[Dict], input_file: str, top_n: int = 50, hotspot_threshold: float = 1.0) -> str:
+    def format_folded(self, trie: StackTrie, input_file: str, top_n: int = 20) -> str:
+        lines = [
+            f"# Folded Stack Analysis: {Path(input_file).name}",
+            "",
+            "## Summary",
+            "",
+            f"- Stack lines: {trie.lines:,}",
+            f"- Total samples: {trie.total:,.0f}",
+            f"- Unique frames: {len(trie.frames):,}",
+            f"- Trie nodes: {len(trie):,}",
+        ]
+        if trie.total > 0:
+            lines.extend(self._format_flame_tree(trie.to_tree(), trie.total, limit=top_n))
+        return "\n".join(lines)
+
+    def _format_flame_tree(self, tree: FlameTree, total: float, limit: int = 20) -> List[str]:
+        def amount(value: float) -> str:
+            if tree.unit == "samples":
+                return f"{value:,.0f} samples"
+            if tree.unit == "seconds":
+                return f"{value:.3f}s"
+            if tree.unit == "bytes":
+                return bytes_to_human(value)
+            if tree.unit == "width":
+                return f"{value / total * 100.0:.2f}%"
+            return f"{value:,.0f} {tree.unit}"
+
+        lines = [
+            "",
+            "## Call Tree",
+            "",
+            f"- Frames placed: {len(tree.names)} ({len(tree.roots)} roots, max depth {tree.depth()})",
+            f"- Total: {amount(total)}",
+            "",
+            "### Top Functions By Self Time",
+            "",
+            "Recursive frames are merged: inclusive time counts each stack once.",
+            "",
+            "| Rank | Function | Self | Self % | Inclusive | Inclusive % |",
+            "|------|----------|------|--------|-----------|-------------|",
+        ]
+        for idx, entry in enumerate(tree.function_totals()[:limit], start=1):
+            lines.append(
+                f"| {idx} | `{self._truncate(entry['function'], 70)}` | {amount(entry['self'])} | "
+                f"{entry['self'] / total * 100.0:.2f}% | {amount(entry['inclusive'])} | {entry['inclusive'] / total * 100.0:.2f}% |"
+            )
+
+        paths = tree.heaviest_paths(10)
+        if paths:
+            lines.extend(["", "### Heaviest Paths", ""])
+            for idx, (value, path) in enumerate(paths, start=1):
+                # Keep the tail of long frame names: it holds the function, not the file path.
+                stack = " -> ".join(f"`{name if len(name) <= 60 else '...' + name[-57:]}`" for name in path)
+                lines.append(f"{idx}. {value / total * 100.0:.2f}% self ({amount(value)}): {stack}")
+        return lines
+
+    def format_profile(
+        self, profile_data: List[Dict], input_file: str, top_n: int = 50, hotspot_threshold: float = 1.0, merged_inputs: int = 0
+    ) -> str:
         lines = [
             f"# Profile Analysis: {Path(input_file).name}",
             "",
@@ -656,6 +3809,10 @@ class MarkdownFormatter:
             "",
             f"- Functions profiled: {len(profile_data)}",
         ]
+        if merged_inputs:
+            uneven = [item for item in profile_data if item.get("cumtime_cv", 0.0) >= HIGH_VARIANCE_CV]
+            lines.append(f"- Inputs merged: {merged_inputs}")
+            lines.append(f"- High-variance functions (stddev >= {HIGH_VARIANCE_CV:.0%} of mean): {len(uneven)}")
         total_time = sum(x.get("cumtime", 0) for x in profile_data)
         if total_time > 0:
             lines.append(f"- Total cumulative time: {total_time:.3f}s")
@@ -686,10 +3843,55 @@ class MarkdownFormatter:
                     f"{item.get('cumtime', 0):.3f}s cumulative, {item.get('percentage', 0):.2f}%"
                 )
 
+        if merged_inputs:
+            lines.extend(
+                [
+                    "",
+                    f"## Spread Across {merged_inputs} Inputs",
+                    "",
+                    "Cumulative time per input; inputs where a function never ran count as zero.",
+                    "",
+                    "| Rank | Function | Mean | Std Dev | Min | Max | CV | Inputs | Flag |",
+                    "|------|----------|------|---------|-----|-----|----|--------|------|",
+                ]
+            )
+            for idx, item in enumerate(profile_data[:top_n], start=1):
+                func_name = self._truncate(item.get("func_name", item.get("function", "Unknown")), 48)
+                flag = "high variance" if item.get("cumtime_cv", 0.0) >= HIGH_VARIANCE_CV else ""
+                lines.append(
+                    f"| {idx} | `{func_name}` | {item['cumtime_mean']:.3f}s | {item['cumtime_std']:.3f}s | {item['cumtime_min']:.3f}s | "
+                    f"{item['cumtime_max']:.3f}s | {item['cumtime_cv']:.2f} | {item['runs']}/{merged_inputs} | {flag} |"
+                )
+
+        return "\n".join(lines)
+
+    def format_call_paths(self, graph: CallGraph, limit: int = 10) -> str:
+        total = graph.total
+        lines = [
+            f"## Heaviest Call Paths (top {limit})",
+            "",
+            "Each function's time is split across its callers by per-edge cumulative time; "
+            "times after each frame are the share of the path's time that flows through it.",
+        ]
+        for idx, path in enumerate(graph.heaviest_paths(limit), start=1):
+            share = path["self_time"] / total * 100.0 if total > 0 else 0.0
+            leaf = path["frames"][-1][0]
+            lines.extend(["", f"{idx}. `{self._truncate(leaf, 80)}`: {seconds_to_human(path['self_time'])} own time ({share:.2f}% of total)"])
+            for name, flow in path["frames"]:
+                lines.append(f"   - `{self._truncate(name, 80)}` {seconds_to_human(flow)}")
         return "\n".join(lines)
 
     def format_go_pprof(self, data: Dict, input_file: str, top_n: int = 30, hotspot_threshold: float = 1.0) -> str:
         entries = data.get("entries", [])
+        unit = data.get("unit", "seconds")
+
+        def amount(value: float) -> str:
+            if unit == "seconds":
+                return f"{value:.2f}s"
+            if unit == "bytes":
+                return bytes_to_human(value)
+            return f"{value:,.0f} {unit}"
+
         lines = [
             f"# Go pprof Analysis: {Path(input_file).name}",
             "",
@@ -697,7 +3899,11 @@ class MarkdownFormatter:
             "",
             f"- Entries parsed: {len(entries)}",
             f"- Profile duration: {data.get('duration_s', 0.0):.2f}s",
-            f"- Total CPU samples: {data.get('total_samples_s', 0.0):.2f}s",
+        ]
+        if "sample_type" in data:
+            lines.append(f"- Sample type: {data['sample_type']} ({unit})")
+        lines += [
+            f"- Total {'CPU' if unit == 'seconds' else data.get('sample_type', '')} samples: {amount(data.get('total_samples_s', 0.0))}",
             "",
             f"## Top {top_n} By Cumulative Time",
             "",
@@ -707,8 +3913,8 @@ class MarkdownFormatter:
 
         for idx, item in enumerate(entries[:top_n], start=1):
             lines.append(
-                f"| {idx} | `{self._truncate(item['function'], 90)}` | {item['flat_s']:.2f}s | {item['flat_pct']:.2f}% | "
-                f"{item['cum_s']:.2f}s | {item['cum_pct']:.2f}% |"
+                f"| {idx} | `{self._truncate(item['function'], 90)}` | {amount(item['flat_s'])} | {item['flat_pct']:.2f}% | "
+                f"{amount(item['cum_s'])} | {item['cum_pct']:.2f}% |"
             )
 
         hotspots = [item for item in entries if item["cum_pct"] >= hotspot_threshold]
@@ -716,37 +3922,134 @@ class MarkdownFormatter:
             lines.extend(["", f"## Hotspots (>{hotspot_threshold}% cumulative)", ""])
             for item in hotspots[:20]:
                 lines.append(
-                    f"- `{item['function']}`: {item['cum_s']:.2f}s cumulative ({item['cum_pct']:.2f}%), "
-                    f"{item['flat_s']:.2f}s flat ({item['flat_pct']:.2f}%)"
+                    f"- `{item['function']}`: {amount(item['cum_s'])} cumulative ({item['cum_pct']:.2f}%), "
+                    f"{amount(item['flat_s'])} flat ({item['flat_pct']:.2f}%)"
                 )
 
+        stacks = data.get("stacks")
+        if stacks is not None and stacks.total > 0:
+            lines.extend(self._format_flame_tree(stacks.to_tree(unit), stacks.total, limit=min(top_n, 20)))
+
+        return "\n".join(lines)
+
+    def format_metrics_csv(self, data: Dict, input_file: str) -> str:
+        table = data["table"]
+        stats = data["stats"]
+
+        def number(value) -> str:
+            if value is None:
+                return "-"
+            return f"{value:.6g}"
+
+        def timestamp(value: float) -> str:
+            return datetime.fromtimestamp(value, timezone.utc).isoformat(timespec="seconds")
+
+        numeric = [name for name, kind in zip(table.names, table.types) if kind in {"int", "float"}]
+        text = [name for name, kind in zip(table.names, table.types) if kind == "string"]
+        dates = [name for name, kind in zip(table.names, table.types) if kind == "datetime"]
+        lines = [
+            f"# CSV Metrics Analysis: {Path(input_file).name}",
+            "",
+            "## Summary",
+            "",
+            f"- Rows: {data['rows']:,}",
+            f"- Columns: {len(table.names)} ({len(numeric)} numeric, {len(dates)} datetime, {len(text)} text)",
+        ]
+        for name in dates:
+            if stats[name]["count"]:
+                lines.append(f"- `{name}`: {timestamp(stats[name]['min'])} -> {timestamp(stats[name]['max'])}")
+        invalid = [f"`{name}` ({stats[name]['invalid']})" for name in table.names if stats[name]["invalid"]]
+        if invalid:
+            lines.append(f"- Unparseable cells counted as missing: {', '.join(invalid)}")
+
+        if numeric:
+            lines.extend(
+                [
+                    "",
+                    "## Numeric Columns",
+                    "",
+                    "| Column | Type | Count | Missing | Mean | Std | Min | P50 | P95 | P99 | Max |",
+                    "|--------|------|-------|---------|------|-----|-----|-----|-----|-----|-----|",
+                ]
+            )
+            for name, kind in zip(table.names, table.types):
+                if kind not in {"int", "float"}:
+                    continue
+                row = stats[name]
+                values = " | ".join(number(row.get(key)) for key in ("mean", "std", "min", "p50", "p95", "p99", "max"))
+                lines.append(f"| `{name}` | {kind} | {row['count']:,} | {row['missing']:,} | {values} |")
+
+        if text:
+            lines.extend(["", "## Text Columns", "", "| Column | Distinct | Missing | Most Common |", "|--------|----------|---------|-------------|"])
+            for name in text:
+                row = stats[name]
+                common = ", ".join(f"`{value}` ({count:,})" for value, count in row["top"]) or "-"
+                lines.append(f"| `{name}` | {row['distinct']:,} | {row['missing']:,} | {common} |")
+
+        time_buckets = data["time"]
+        if time_buckets:
+            columns = list(time_buckets["buckets"][0]["means"])[: self.MAX_BUCKET_COLUMNS] if time_buckets["buckets"] else []
+            width = seconds_to_human(time_buckets["width"]) if time_buckets["type"] == "datetime" else f"{time_buckets['width']:g}"
+            lines.extend(
+                [
+                    "",
+                    f"## Time Buckets by `{time_buckets['column']}` (width {width})",
+                    "",
+                    "| Bucket Start | Rows | " + " | ".join(f"Mean `{name}`" for name in columns) + " |",
+                    "|--------------|------|" + "|".join("-" * (len(name) + 7) for name in columns) + "|",
+                ]
+            )
+            for bucket in time_buckets["buckets"]:
+                start = timestamp(bucket["start"]) if time_buckets["type"] == "datetime" else f"{bucket['start']:g}"
+                means = " | ".join(number(bucket["means"][name]) for name in columns)
+                lines.append(f"| {start} | {bucket['rows']:,} | {means} |")
+
         return "\n".join(lines)
 
     def format_perf_csv(self, data: Dict, input_file: str) -> str:
-        rows = data["rows"]
-        fps = data["fps"]
-        frame_max = data["frame_max_ms"]
-        draw_max = data["draw_max_ms"]
-        update_max = data["update_max_ms"]
-        heap_alloc = data["heap_alloc"]
-        heap_inuse = data["heap_inuse"]
+        metrics = data["metrics"]
+        warmup = data["warmup"]
+
+        def spread(field: str, unit: str, digits: int) -> str:
+            sketch = metrics.get(field)
+            if sketch is None:
+                return "n/a"
+            return f"{sketch.mean:.{digits}f}{unit} / {sketch.max:.{digits}f}{unit}"
 
+        def heap_range(field: str) -> str:
+            sketch = metrics.get(field)
+            if sketch is None:
+                return "n/a"
+            return f"{sketch.min / 1024 / 1024:.1f} MiB -> {sketch.max / 1024 / 1024:.1f} MiB"
+
+        fps = metrics.get("fps")
         lines = [
             f"# Perf CSV Analysis: {Path(input_file).name}",
             "",
             "## Summary",
             "",
-            f"- Samples: {len(rows)} seconds",
-            f"- Avg FPS: {statistics.mean(fps):.2f}" if fps else "- Avg FPS: n/a",
-            f"- FPS P50/P95/P99: {percentile(fps, 50):.2f} / {percentile(fps, 95):.2f} / {percentile(fps, 99):.2f}" if fps else "- FPS P50/P95/P99: n/a",
-            f"- Frame max avg / worst: {statistics.mean(frame_max):.2f}ms / {max(frame_max):.2f}ms" if frame_max else "- Frame max avg / worst: n/a",
-            f"- Draw max avg / worst: {statistics.mean(draw_max):.3f}ms / {max(draw_max):.3f}ms" if draw_max else "- Draw max avg / worst: n/a",
-            f"- Update max avg / worst: {statistics.mean(update_max):.3f}ms / {max(update_max):.3f}ms" if update_max else "- Update max avg / worst: n/a",
-            f"- Heap alloc range: {min(heap_alloc)/1024/1024:.1f} MiB -> {max(heap_alloc)/1024/1024:.1f} MiB" if heap_alloc else "- Heap alloc range: n/a",
-            f"- Heap in-use range: {min(heap_inuse)/1024/1024:.1f} MiB -> {max(heap_inuse)/1024/1024:.1f} MiB" if heap_inuse else "- Heap in-use range: n/a",
+            f"- Samples: {data['samples']} seconds ({data['steady_rows']} steady-state)",
+        ]
+        if warmup["rows"]:
+            detail = f", avg FPS {warmup['fps_mean']:.2f}" if "fps_mean" in warmup else ""
+            lines.append(f"- Warm-up trimmed: first {warmup['rows']} samples{detail}")
+        else:
+            lines.append("- Warm-up trimmed: none detected")
+        lines += [
+            f"- Avg FPS: {fps.mean:.2f}" if fps else "- Avg FPS: n/a",
+            (
+                f"- FPS P50/P95/P99: {fps.quantile(0.50):.2f} / {fps.quantile(0.95):.2f} / {fps.quantile(0.99):.2f}"
+                if fps
+                else "- FPS P50/P95/P99: n/a"
+            ),
+            f"- Frame max avg / worst: {spread('frame_max_ms', 'ms', 2)}",
+            f"- Draw max avg / worst: {spread('draw_max_ms', 'ms', 3)}",
+            f"- Update max avg / worst: {spread('update_max_ms', 'ms', 3)}",
+            f"- Heap alloc range: {heap_range('heap_alloc')}",
+            f"- Heap in-use range: {heap_range('heap_inuse')}",
         ]
 
-        worst_rows = sorted(rows, key=lambda row: row.get("frame_max_ms", 0.0), reverse=True)[:5]
+        worst_rows = data["worst_rows"]
         if worst_rows:
             lines.extend(
                 [
@@ -764,36 +4067,94 @@ class MarkdownFormatter:
                     f"{row.get('wave', 0)} | {row.get('enemies', 0)} | {row.get('bullets', 0)} |"
                 )
 
+        stutter = data.get("stutter")
+        if stutter and stutter["spikes"]:
+            lines.extend(self._format_stutter(stutter))
+
+        windows = data["windows"]
+        if windows:
+            stride = math.ceil(len(windows) / self.MAX_WINDOW_ROWS)
+            every = stride * data.get("window_stride", 1)
+            lines.extend(["", f"## Consecutive {data['window_rows']}-Sample Windows", ""])
+            if every > 1:
+                lines.extend([f"Showing 1 of every {every} non-overlapping windows ({data.get('window_count', len(windows))} total).", ""])
+            lines.extend(
+                [
+                    "| Start t_unix | Samples | FPS P50 | Frame Max P50 ms | P95 ms | P99 ms |",
+                    "|--------------|---------|---------|------------------|--------|--------|",
+                ]
+            )
+
+            def cell(value, digits: int) -> str:
+                return "-" if value is None else f"{value:.{digits}f}"
+
+            for window in windows[::stride]:
+                lines.append(
+                    f"| {window['start']} | {window['rows']} | {cell(window['fps_p50'], 1)} | {cell(window['frame_max_p50'], 2)} | "
+                    f"{cell(window['frame_max_p95'], 2)} | {cell(window['frame_max_p99'], 2)} |"
+                )
+
         return "\n".join(lines)
 
-    def format_trace(self, data: Dict, input_file: str, top_n: int = 20) -> str:
-        events = [event for event in data.get("events", []) if event.get("duration_s", 0.0) >= 0.0]
-        total_event_time = sum(event.get("duration_s", 0.0) for event in events)
-        by_workload = defaultdict(float)
-        by_workload_bytes = defaultdict(float)
-        by_track = defaultdict(float)
-        by_name = defaultdict(lambda: {"time_s": 0.0, "count": 0, "bytes": 0.0, "workload": "Other"})
+    def _format_stutter(self, stutter: Dict) -> List[str]:
+        labels = {"gc": "GC pause", "update": "Update", "draw": "Draw", "unexplained": "Unexplained"}
+        total_jank = sum(stutter["jank_ms"].values())
+        lines = [
+            "",
+            "## Stutter Analysis",
+            "",
+            f"- Spikes (frame max > {stutter['spike_factor']:g}x rolling {stutter['window']}-sample median): "
+            f"{stutter['spikes']} in {stutter['clusters']} clusters",
+            f"- Total jank above median: {total_jank:.1f}ms",
+        ]
+        if stutter["gc_heap_growth"] is not None:
+            baseline = f" (run-wide allocation rate {stutter['heap_growth'] / 1024 / 1024:.2f} MiB/s)" if stutter["heap_growth"] is not None else ""
+            lines.append(
+                f"- Heap growth before GC-driven clusters: {stutter['gc_heap_growth'] / 1024 / 1024:.2f} MiB/s "
+                f"over {stutter['gc_clusters']} clusters{baseline}"
+            )
+        lines.extend(["", "| Source | Jank ms | Share |", "|--------|---------|-------|"])
+        for source, label in labels.items():
+            value = stutter["jank_ms"][source]
+            share = value / total_jank * 100.0 if total_jank > 0 else 0.0
+            lines.append(f"| {label} | {value:.1f} | {share:.1f}% |")
+        lines.extend(
+            [
+                "",
+                "### Worst Spike Clusters",
+                "",
+                "| Start t_unix | Samples | Peak Frame ms | Jank ms | Main Source | GCs | Heap Growth Before |",
+                "|--------------|---------|---------------|---------|-------------|-----|--------------------|",
+            ]
+        )
+        for cluster in stutter["worst_clusters"]:
+            growth = "-" if cluster["heap_growth"] is None else f"{cluster['heap_growth'] / 1024 / 1024:.2f} MiB/s"
+            lines.append(
+                f"| {cluster['start']} | {cluster['rows']} | {cluster['peak_ms']:.2f} | {cluster['total_jank']:.1f} | "
+                f"{labels[cluster['source']]} | {cluster['gc']} | {growth} |"
+            )
+        return lines
 
-        for event in events:
-            duration_s = event.get("duration_s", 0.0)
-            workload = event.get("workload", "Other")
-            by_workload[workload] += duration_s
-            by_workload_bytes[workload] += event.get("bytes", 0.0)
-            by_track[event.get("track", "")] += duration_s
-            name_entry = by_name[event.get("name", "unnamed")]
-            name_entry["time_s"] += duration_s
-            name_entry["count"] += 1
-            name_entry["bytes"] += event.get("bytes", 0.0)
-            name_entry["workload"] = workload
+    def format_trace(self, data: Dict, input_file: str, top_n: int = 20) -> str:
+        summary = trace_summary(data)
+        total_event_time = summary.total_time_s
+        by_workload = summary.by_workload
+        by_workload_bytes = summary.by_workload_bytes
+        by_track = summary.by_track
+        by_name = summary.by_name
 
         lines = [
             f"# Trace Analysis: {Path(input_file).name}",
             "",
             "## Summary",
             "",
-            f"- Events analyzed: {len(events)}",
+            f"- Events analyzed: {summary.event_count}",
             f"- Trace span: {data.get('trace_span_s', 0.0):.3f}s",
             f"- Total timed event duration: {total_event_time:.3f}s",
+        ]
+        if summary.nested:
+            lines.append(f"- Total self time (nested slices not double-counted): {summary.total_self_s:.3f}s")
+        lines += [
             f"- Source: {data.get('source')}" if data.get("source") else "- Source: unknown",
             "",
             "## Time By Workload",
@@ -811,56 +4172,101 @@ class MarkdownFormatter:
                 f"{bytes_to_human(bytes_value) if bytes_value > 0 else '-'} | {bandwidth_to_human(bytes_value, time_s)} |"
             )
 
-        top_names = sorted(by_name.items(), key=lambda item: item[1]["time_s"], reverse=True)[:top_n]
+        # Without nesting (summary-only, flat kernel lists) self time is just the duration, so rank by inclusive time.
+        rank_key = "self_s" if summary.nested else "time_s"
+        top_names = sorted(by_name.items(), key=lambda item: item[1].get(rank_key, item[1]["time_s"]), reverse=True)[:top_n]
         if top_names:
+            show_tail = any("p50_s" in entry for _, entry in top_names)
+            if summary.nested:
+                header = "| Rank | Operation | Workload | Self | Inclusive | Calls | Avg |"
+                divider = "|------|-----------|----------|------|-----------|-------|-----|"
+                ranking = "Ranked by self (exclusive) time; inclusive time also counts nested child slices."
+            else:
+                header = "| Rank | Operation | Workload | Inclusive | Calls | Avg |"
+                divider = "|------|-----------|----------|-----------|-------|-----|"
+                ranking = "Ranked by inclusive time; nesting is not reconstructed, so enclosing slices include their children."
+            if show_tail:
+                header += " P50 | P95 | P99 | Max |"
+                divider += "-----|-----|-----|-----|"
             lines.extend(
                 [
                     "",
                     f"## Top {top_n} Operations",
                     "",
-                    "| Rank | Operation | Workload | Time | Calls | Avg | Bytes | Bandwidth |",
-                    "|------|-----------|----------|------|-------|-----|-------|-----------|",
+                    ranking
+                    + (" Percentiles are per-operation duration sketches, within 1% of exact." if summary.name_sketches else ""),
+                    "",
+                    header + " Bytes | Bandwidth |",
+                    divider + "-------|-----------|",
                 ]
             )
             for idx, (name, entry) in enumerate(top_names, start=1):
                 calls = entry["count"]
                 avg_s = entry["time_s"] / calls if calls else 0.0
                 bytes_text = bytes_to_human(entry["bytes"]) if entry["bytes"] > 0 else "-"
-                lines.append(
-                    f"| {idx} | `{self._truncate(name, 70)}` | {entry['workload']} | {entry['time_s']:.3f}s | "
-                    f"{calls} | {avg_s:.6f}s | {bytes_text} | {bandwidth_to_human(entry['bytes'], entry['time_s'])} |"
-                )
+                row = f"| {idx} | `{self._truncate(name, 70)}` | {entry['workload']} |"
+                if summary.nested:
+                    row += f" {entry.get('self_s', entry['time_s']):.3f}s |"
+                row += f" {entry['time_s']:.3f}s | {calls} | {avg_s:.6f}s |"
+                if show_tail:
+                    row += "".join(
+                        f" {entry[key]:.6f}s |" if key in entry else " - |" for key in ("p50_s", "p95_s", "p99_s", "max_s")
+                    )
+                lines.append(row + f" {bytes_text} | {bandwidth_to_human(entry['bytes'], entry['time_s'])} |")
 
         top_tracks = sorted(by_track.items(), key=lambda item: item[1], reverse=True)[:10]
         if top_tracks:
+            track_sketches = summary.track_sketches
             lines.extend(
                 [
                     "",
                     "## Busiest Tracks",
                     "",
-                    "| Track | Total Time |",
-                    "|-------|------------|",
+                    "| Track | Total Time |" + (" Slices | P50 | P99 | Max |" if track_sketches else ""),
+                    "|-------|------------|" + ("--------|-----|-----|-----|" if track_sketches else ""),
                 ]
             )
             for track, time_s in top_tracks:
-                lines.append(f"| {self._truncate(track or 'unlabeled', 80)} | {time_s:.3f}s |")
+                row = f"| {self._truncate(track or 'unlabeled', 80)} | {time_s:.3f}s |"
+                sketch = track_sketches.get(track)
+                if sketch is not None:
+                    row += f" {sketch.count:.0f} | {sketch.quantile(0.5):.6f}s | {sketch.quantile(0.99):.6f}s | {sketch.max:.6f}s |"
+                elif track_sketches:
+                    row += " - | - | - | - |"
+                lines.append(row)
 
-        transfer_events = [event for event in events if event.get("workload", "").startswith("Memcpy")]
-        if transfer_events:
-            transfer_time = sum(event.get("duration_s", 0.0) for event in transfer_events)
-            transfer_bytes = sum(event.get("bytes", 0.0) for event in transfer_events)
+        if summary.transfer_count:
+            transfer_time = summary.transfer_time_s
+            transfer_bytes = summary.transfer_bytes
             lines.extend(
                 [
                     "",
                     "## Transfer Summary",
                     "",
-                    f"- Transfer events: {len(transfer_events)}",
+                    f"- Transfer events: {summary.transfer_count}",
                     f"- Total transfer time: {transfer_time:.3f}s",
                     f"- Total transfer volume: {bytes_to_human(transfer_bytes)}" if transfer_bytes > 0 else "- Total transfer volume: unavailable",
                     f"- Aggregate transfer bandwidth: {bandwidth_to_human(transfer_bytes, transfer_time)}" if transfer_bytes > 0 else "- Aggregate transfer bandwidth: unavailable",
                 ]
             )
 
+        events = data.get("events")
+        concurrency = events.concurrency() if isinstance(events, EventTable) else None
+        if concurrency:
+            lines.extend(self._format_concurrency(concurrency))
+
+        kineto = events.kineto_breakdown() if isinstance(events, EventTable) else None
+        if kineto:
+            lines.extend(self._format_kineto(kineto, top_n))
+
+        latency = events.launch_latency() if isinstance(events, EventTable) else None
+        if latency:
+            lines.extend(self._format_launch_latency(latency, top_n))
+
+        counters = data.get("counters")
+        if counters is not None and len(counters):
+            lines.extend(self._format_counters(counters, events if isinstance(events, EventTable) else None, top_n))
+
         kernel_metrics = data.get("kernel_metrics", [])
         if kernel_metrics:
             occupancy_values = [row["occupancy"] for row in kernel_metrics if row.get("occupancy") is not None]
@@ -894,10 +4300,296 @@ class MarkdownFormatter:
 
         return "\n".join(lines)
 
+    def _format_kineto(self, kineto: Dict, top_n: int) -> List[str]:
+        device_s = kineto["device_s"]
+        lines = [
+            "",
+            "## PyTorch Attribution",
+            "",
+            f"- Device time (kernels, copies, memsets): {device_s:.6f}s",
+            f"- Device time with no linked launch: {kineto['unlinked_s']:.6f}s",
+            f"- Host sync stall: {kineto['sync_total_s']:.6f}s",
+        ]
+        for title, label, groups in (
+            ("Device Time by Launching Op", "Op", kineto["by_op"]),
+            ("Device Time by Python Module", "Module", kineto["by_module"]),
+        ):
+            if not groups:
+                continue
+            lines.extend(
+                ["", f"### {title}", "", f"| {label} | Device Time | Share | Launches |", f"|{'-' * (len(label) + 2)}|-------------|-------|----------|"]
+            )
+            for name, (time_s, count) in sorted(groups.items(), key=lambda item: item[1][0], reverse=True)[:top_n]:
+                share = time_s / device_s * 100.0 if device_s > 0 else 0.0
+                lines.append(f"| `{self._truncate(name, 70)}` | {time_s:.6f}s | {share:.2f}% | {count} |")
+        if kineto["syncs"]:
+            lines.extend(
+                [
+                    "",
+                    "### Host Syncs by Stall Time",
+                    "",
+                    "| Sync | Called From | Count | Total Stall | Max Stall |",
+                    "|------|-------------|-------|-------------|-----------|",
+                ]
+            )
+            for sync in kineto["syncs"]:
+                lines.append(
+                    f"| `{sync['name']}` | `{self._truncate(sync['context'], 60)}` | {sync['count']} | "
+                    f"{sync['stall_s'] * 1e3:.3f}ms | {sync['max_s'] * 1e3:.3f}ms |"
+                )
+        return lines
+
+    def _format_launch_latency(self, latency: Dict, top_n: int) -> List[str]:
+        overall = latency["delay_us"]
+        lines = [
+            "",
+            "## Launch Latency",
+            "",
+            f"- Launches linked to device work: {latency['links']}",
+            f"- Launch-to-start delay: P50 {overall.quantile(0.5):.1f}us, P95 {overall.quantile(0.95):.1f}us, "
+            f"P99 {overall.quantile(0.99):.1f}us, max {overall.max:.1f}us",
+            f"- Device idle waiting on late launches: {latency['starved_s'] * 1e3:.3f}ms across {latency['starved_gaps']} gaps",
+            "",
+            "| Launched Operation | Launches | Mean | P50 | P95 | P99 | Max |",
+            "|--------------------|----------|------|-----|-----|-----|-----|",
+        ]
+        ranked = sorted(latency["by_name"].items(), key=lambda item: item[1].sum, reverse=True)[:top_n]
+        for name, sketch in ranked:
+            lines.append(
+                f"| `{self._truncate(name, 70)}` | {sketch.count:.0f} | {sketch.mean:.1f}us | {sketch.quantile(0.5):.1f}us | "
+                f"{sketch.quantile(0.95):.1f}us | {sketch.quantile(0.99):.1f}us | {sketch.max:.1f}us |"
+            )
+        if latency["stretches"]:
+            lines.extend(
+                [
+                    "",
+                    "### GPU-Starved Stretches",
+                    "",
+                    "Runs of consecutive slices that were launched only after the device had already gone idle.",
+                    "",
+                    "| Track | Start ts (us) | Duration | Idle | Slices |",
+                    "|-------|---------------|----------|------|--------|",
+                ]
+            )
+            for stretch in latency["stretches"]:
+                lines.append(
+                    f"| {self._truncate(stretch['track'], 60)} | {stretch['start_us']:.3f} | {stretch['duration_s'] * 1e3:.3f}ms | "
+                    f"{stretch['idle_s'] * 1e3:.3f}ms | {stretch['slices']} |"
+                )
+        return lines
+
+    def _format_counters(self, counters: CounterTable, events: EventTable | None, top_n: int) -> List[str]:
+        stats = counters.stats()
+        lines = [
+            "",
+            "## Counter Tracks",
+            "",
+            "| Counter | Samples | Min | Mean | Max | Time-Weighted Avg |",
+            "|---------|---------|-----|------|-----|-------------------|",
+        ]
+        for row in sorted(stats, key=lambda item: item["name"]):
+            lines.append(
+                f"| {self._truncate(row['name'], 80)} | {row['samples']} | {row['min']:.6g} | {row['mean']:.6g} | "
+                f"{row['max']:.6g} | {row['time_weighted']:.6g} |"
+            )
+        if events is None or not len(events):
+            return lines
+
+        longest = heapq.nlargest(min(top_n, self.MAX_COUNTER_SLICES), range(len(events)), key=events.duration_s.__getitem__)
+        longest = [row for row in longest if events.duration_s[row] > 0.0]
+        if not longest:
+            return lines
+        # The most frequently sampled series, which are the ones likely to move within a single slice.
+        series = sorted(range(len(stats)), key=lambda idx: stats[idx]["samples"], reverse=True)[: self.MAX_COUNTER_COLUMNS]
+
+        def sampled(series_id: int, ts_us: float) -> str:
+            value = counters.value_at(series_id, ts_us)
+            return "-" if value is None else f"{value:.6g}"
+
+        lines.extend(
+            [
+                "",
+                "### Counters Around the Longest Slices",
+                "",
+                "Each cell is the counter value in effect at the slice's start -> end.",
+                "",
+                "| Slice | Track | Start ts (us) | Duration | " + " | ".join(self._truncate(stats[idx]["name"], 40) for idx in series) + " |",
+                "|-------|-------|---------------|----------|" + "|".join("---" for _ in series) + "|",
+            ]
+        )
+        for row in longest:
+            start = events.ts_us[row]
+            end = start + events.duration_s[row] * 1_000_000.0
+            cells = " | ".join(f"{sampled(idx, start)} -> {sampled(idx, end)}" for idx in series)
+            lines.append(
+                f"| `{self._truncate(events.names[events.name_ids[row]], 50)}` | {self._truncate(events.tracks[events.track_ids[row]], 40)} | "
+                f"{start:.3f} | {events.duration_s[row] * 1e3:.3f}ms | {cells} |"
+            )
+        return lines
+
+    def _format_concurrency(self, concurrency: Dict) -> List[str]:
+        span_s = concurrency["span_s"]
+        busy_s = concurrency["busy_s"]
+        lines = [
+            "",
+            "## Workload Concurrency",
+            "",
+            "Busy time is the union of each workload's slices, so nested or concurrent slices count once.",
+            "",
+            "| Workload | Busy Time | Share of Span |",
+            "|----------|-----------|---------------|",
+        ]
+        for workload, value in sorted(busy_s.items(), key=lambda item: item[1], reverse=True):
+            share = value / span_s * 100.0 if span_s > 0 else 0.0
+            lines.append(f"| {workload} | {value:.6f}s | {share:.2f}% |")
+        overlaps = sorted(concurrency["overlap_s"].items(), key=lambda item: item[1], reverse=True)
+        if overlaps:
+            lines.extend(
+                [
+                    "",
+                    "| Workloads | Overlap | Share of First Hidden | Share of Second Hidden |",
+                    "|-----------|---------|-----------------------|------------------------|",
+                ]
+            )
+            for (first, second), value in overlaps:
+                lines.append(
+                    f"| {first} + {second} | {value:.6f}s | {value / busy_s[first] * 100.0:.2f}% | {value / busy_s[second] * 100.0:.2f}% |"
+                )
+
+        if concurrency["device_tracks"]:
+            device_span = concurrency["device_span_s"]
+            idle = device_span - concurrency["device_busy_s"]
+            lines.extend(
+                [
+                    "",
+                    "## GPU Idle Gaps",
+                    "",
+                    f"- Device tracks: {concurrency['device_tracks']}",
+                    f"- Device busy: {concurrency['device_busy_s']:.6f}s of {device_span:.6f}s "
+                    f"({idle / device_span * 100.0 if device_span > 0 else 0.0:.2f}% with no device work)",
+                ]
+            )
+            if concurrency["gaps"]:
+                lines.extend(
+                    [
+                        "",
+                        "| Track | Gap Start ts (us) | Offset | Gap |",
+                        "|-------|-------------------|--------|-----|",
+                    ]
+                )
+                for gap in concurrency["gaps"]:
+                    offset = (gap["start_us"] - concurrency["start_us"]) / 1_000_000.0
+                    lines.append(f"| {self._truncate(gap['track'], 80)} | {gap['start_us']:.3f} | {offset:.6f}s | {gap['gap_s'] * 1e3:.3f}ms |")
+        return lines
+
+    def format_diff(self, base: Dict, new: Dict, base_file: str, new_file: str, top_n: int = 30, hotspot_threshold: float = 1.0) -> str:
+        unit = new["unit"]
+
+        def amount(value: float, signed: bool = False) -> str:
+            return unit_amount(value, unit, signed)
+
+        base_total, new_total = base["total"], new["total"]
+        rows = diff_rows(base, new)
+        change = (new_total - base_total) / base_total * 100.0 if base_total > 0 else 0.0
+
+        lines = [
+            f"# Profile Diff: {Path(base_file).name} -> {Path(new_file).name}",
+            "",
+            "## Summary",
+            "",
+            f"- Base total: {amount(base_total)} ({len(base['functions'])} functions)",
+            f"- New total: {amount(new_total)} ({len(new['functions'])} functions)",
+            f"- Change: {amount(new_total - base_total, signed=True)} ({change:+.2f}%)",
+        ]
+
+        def table(title: str, selected: List[Dict]) -> None:
+            if not selected:
+                return
+            lines.extend(
+                [
+                    "",
+                    f"## {title}",
+                    "",
+                    "| Rank | Function | Base Self | New Self | Delta | Delta % of Base | Share Base | Share New | Inclusive Delta |",
+                    "|------|----------|-----------|----------|-------|-----------------|------------|-----------|-----------------|",
+                ]
+            )
+            for idx, row in enumerate(selected[:top_n], start=1):
+                delta_pct = row["delta"] / base_total * 100.0 if base_total > 0 else 0.0
+                label = f"{self._truncate(row['function'], 70)}"
+                status = f" ({row['status']})" if row["status"] else ""
+                lines.append(
+                    f"| {idx} | `{label}`{status} | {amount(row['base'])} | {amount(row['new'])} | {amount(row['delta'], signed=True)} | "
+                    f"{delta_pct:+.2f}% | {row['base_share']:.2f}% | {row['new_share']:.2f}% | {amount(row['delta_incl'], signed=True)} |"
+                )
+
+        table("Regressions", [row for row in rows if row["delta"] > 0])
+        table("Improvements", sorted((row for row in rows if row["delta"] < 0), key=lambda row: row["delta"]))
+
+        appeared = [row for row in rows if row["status"] == "new" and row["new_share"] >= hotspot_threshold]
+        if appeared:
+            lines.extend(["", f"## New Hotspots (>= {hotspot_threshold}% of new total)", ""])
+            for row in appeared[:top_n]:
+                lines.append(f"- `{row['function']}`: {amount(row['new'])} ({row['new_share']:.2f}%)")
+        vanished = sorted(
+            (row for row in rows if row["status"] == "vanished" and row["base_share"] >= hotspot_threshold), key=lambda row: row["delta"]
+        )
+        if vanished:
+            lines.extend(["", f"## Vanished Hotspots (>= {hotspot_threshold}% of base total)", ""])
+            for row in vanished[:top_n]:
+                lines.append(f"- `{row['function']}`: {amount(row['base'])} ({row['base_share']:.2f}%)")
+
+        return "\n".join(lines)
+
+    def format_batch_index(self, rows: List[Dict], target: str) -> str:
+        failed = [row for row in rows if row["error"]]
+        # Units are not comparable, so timed inputs rank first and the rest are grouped by unit after them.
+        ranked = sorted(
+            (row for row in rows if not row["error"]), key=lambda row: (row["unit"] != "s", row["unit"], -row["total"], row["file"])
+        )
+        lines = [
+            f"# Batch Analysis: {target}",
+            "",
+            "## Summary",
+            "",
+            f"- Files analyzed: {len(rows) - len(failed)}",
+            f"- Files failed: {len(failed)}",
+            "",
+            "## Files By Total Time",
+            "",
+            "| Rank | File | Kind | Total | Top Hotspot | Hotspot Self | Hotspot Share |",
+            "|------|------|------|-------|-------------|--------------|---------------|",
+        ]
+        for idx, row in enumerate(ranked, start=1):
+            if row["top"]:
+                name, self_value = row["top"]
+                share = self_value / row["total"] * 100.0 if row["total"] > 0 else 0.0
+                top = f"`{self._truncate(name, 60)}` | {unit_amount(self_value, row['unit'])} | {share:.2f}%"
+            else:
+                top = "- | - | -"
+            total = unit_amount(row["total"], row["unit"]) if row["top"] else "-"
+            lines.append(f"| {idx} | [{Path(row['file']).name}]({row['report']}) | {row['kind']} | {total} | {top} |")
+        if failed:
+            lines.extend(["", "## Failures", ""])
+            for row in sorted(failed, key=lambda row: row["file"]):
+                lines.append(f"- `{row['file']}`: {row['error']}")
+        return "\n".join(lines)
+
     def _truncate(self, value: str, limit: int) -> str:
         return value if len(value) <= limit else value[: limit - 3] + "..."
 
 
+def trace_summary(data: Dict) -> TraceSummary:
+    """Summary of a trace parse result, whether aggregated by the parser or left as events."""
+    summary = data.get("summary")
+    if summary is None:
+        events = data.get("events", [])
+        if not isinstance(events, EventTable):
+            events = EventTable.from_dicts(events)
+        summary = events.summarize()
+    return summary
+
+
 def detect_csv_format(input_path: Path) -> str:
     with input_path.open(newline="") as fh:
         reader = csv.reader(fh)
@@ -907,38 +4599,873 @@ def detect_csv_format(input_path: Path) -> str:
         return "perf_csv"
     if {"name", "duration"} & normalized or {"operation", "time_ns"} & normalized or {"kernel_name"} & normalized:
         return "nsight_csv"
-    raise click.ClickException("Unsupported CSV format. Expected harness perf CSV or exported Nsight-style CSV.")
+    if not headers:
+        raise click.ClickException(f"{input_path} has no CSV header row")
+    return "metrics_csv"
+
+
+class ParseCache:
+    """Content-addressed on-disk cache of normalized parse results.
+
+    Entries are keyed by a BLAKE2 digest of the input bytes plus the parser
+    name and PARSE_CACHE_VERSION, and stored as pickles (EventTable columns
+    serialize as raw arrays). Digests are memoized by (path, size, mtime) so
+    an unchanged file is not re-hashed. Hits refresh the entry's mtime and
+    the oldest entries are evicted once the directory exceeds max_bytes.
+    Entries are unpickled as found, so the directory must not be writable by
+    untrusted users.
+    """
+
+    DIGEST_INDEX = "digests.json"
+    DIGEST_INDEX_LIMIT = 4096
+
+    def __init__(self, root: Path | None = None, max_bytes: int | None = None):
+        if root is None:
+            root = os.environ.get("FLAMEGRAPH_ANALYZER_CACHE_DIR")
+            root = Path(root) if root else Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "flamegraph-analyzer"
+        if max_bytes is None:
+            max_bytes = self.env_max_bytes()
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def env_max_bytes() -> int:
+        """Size limit from FLAMEGRAPH_ANALYZER_CACHE_MAX_MB (whole MiB, default 4096)."""
+        value = os.environ.get("FLAMEGRAPH_ANALYZER_CACHE_MAX_MB", "4096")
+        try:
+            megabytes = int(value)
+        except ValueError:
+            megabytes = -1
+        if megabytes < 0:
+            raise click.ClickException(f"FLAMEGRAPH_ANALYZER_CACHE_MAX_MB must be a whole number of MiB, got {value!r}")
+        return megabytes * 1024 * 1024
+
+    def get_or_parse(self, input_path: Path, parser):
+        parser_name = type(parser).__name__
+        tag = getattr(parser, "cache_tag", "")
+        key = self.key(input_path, f"{parser_name}:{tag}" if tag else parser_name)
+        cached = self.load(key)
+        if cached is not None:
+            return cached
+        result = parser.parse()
+        if isinstance(result, dict) and isinstance(result.get("events"), EventTable):
+            # Store the reductions with the columns so a hit skips the self-time sweep.
+            result["events"].summarize()
+        self.store(key, result)
+        return result
+
+    def key(self, input_path: Path, parser_name: str) -> str:
+        return hashlib.blake2b(
+            f"{self.digest(input_path)}:{parser_name}:{PARSE_CACHE_VERSION}".encode(), digest_size=20
+        ).hexdigest()
+
+    def digest(self, input_path: Path) -> str:
+        stat = input_path.stat()
+        stamp = f"{input_path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+        index = self._read_index()
+        if stamp in index:
+            return index[stamp]
+        hasher = hashlib.blake2b(digest_size=20)
+        with input_path.open("rb") as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b""):
+                hasher.update(chunk)
+        value = hasher.hexdigest()
+        index[stamp] = value
+        self._write_atomic(self.root / self.DIGEST_INDEX, json.dumps(dict(list(index.items())[-self.DIGEST_INDEX_LIMIT :])).encode())
+        return value
+
+    def load(self, key: str):
+        path = self.root / f"{key}.pkl"
+        try:
+            with path.open("rb") as fh:
+                value = pickle.load(fh)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated entries or pickles written by a different module layout are misses.
+            path.unlink(missing_ok=True)
+            return None
+        self._touch(path)
+        return value
+
+    def store(self, key: str, value) -> None:
+        path = self.root / f"{key}.pkl"
+        try:
+            self._write_atomic(path, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            self._touch(path)
+        except (OSError, pickle.PicklingError):
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for path in self.root.glob("*.pkl"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        # Kernel file timestamps tick coarsely; an explicit fine-grained stamp keeps the LRU order exact.
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _read_index(self) -> Dict[str, str]:
+        try:
+            return json.loads((self.root / self.DIGEST_INDEX).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _write_atomic(self, path: Path, payload: bytes) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(payload)
+        os.replace(tmp_path, path)
+
+
+def run_parser(parser, input_path: Path, cache: ParseCache | None):
+    return cache.get_or_parse(input_path, parser) if cache is not None else parser.parse()
+
+
+def input_kind(input_path: Path) -> str:
+    """Input kind by file suffix (and header, for CSV)."""
+    name = input_path.name.lower()
+    suffix = input_path.suffix.lower()
+    if suffix == ".gz" and Path(name[:-3]).suffix in FOLDED_SUFFIXES | {".json"}:
+        suffix = Path(name[:-3]).suffix
+    if suffix == ".svg":
+        return "svg"
+    if suffix in FOLDED_SUFFIXES:
+        return "folded"
+    if suffix in {".profile", ".prof"}:
+        return "profile"
+    if suffix == ".pprof":
+        return "pprof"
+    if suffix == ".json":
+        return "trace_json"
+    if suffix in {".pftrace", ".perfetto_trace", ".perfetto-trace", ".proto"}:
+        return "perfetto"
+    if suffix == ".csv":
+        return detect_csv_format(input_path)
+    raise click.ClickException(f"Unsupported file type: {input_path.suffix.lower()}")
+
+
+def make_parser(
+    kind: str, input_path: Path, jobs: int = 1, trace_rows: bool = False, time_column: str | None = None, summary_only: bool = False
+):
+    if kind == "svg":
+        return FlamegraphParser(input_path)
+    if kind == "folded":
+        return FoldedStackParser(input_path)
+    if kind == "profile":
+        return ProfileParser(input_path)
+    if kind == "pprof":
+        return GoPprofParser(input_path)
+    if kind == "trace_json":
+        return PerfettoTraceParser(input_path, jobs=jobs, rows=not summary_only)
+    if kind == "perfetto":
+        return PerfettoBinaryParser(input_path, rows=trace_rows)
+    if kind == "perf_csv":
+        return PerfCSVParser(input_path)
+    if kind == "metrics_csv":
+        return MetricsCSVParser(input_path, time_column=time_column)
+    return NsightCSVParser(input_path)
+
+
+def format_parsed(formatter: MarkdownFormatter, kind: str, parsed, input_file: str, top_n: int, threshold: float) -> str:
+    if kind == "svg":
+        return formatter.format_flamegraph(parsed, input_file)
+    if kind == "folded":
+        return formatter.format_folded(parsed, input_file, top_n=top_n)
+    if kind == "profile":
+        return formatter.format_profile(parsed, input_file, top_n=top_n, hotspot_threshold=threshold)
+    if kind == "pprof":
+        return formatter.format_go_pprof(parsed, input_file, top_n=top_n, hotspot_threshold=threshold)
+    if kind == "perf_csv":
+        return formatter.format_perf_csv(parsed, input_file)
+    if kind == "metrics_csv":
+        return formatter.format_metrics_csv(parsed, input_file)
+    return formatter.format_trace(parsed, input_file, top_n=top_n)
+
+
+def filter_parsed(kind: str, parsed, names: NameFilter):
+    """Apply --focus/--ignore/--hide to a parse result before any report or diff aggregates it.
+
+    Stack inputs (folded, pprof, and SVG flamegraphs, whose frame geometry is
+    turned back into stacks) keep whole samples by focus/ignore and cut hidden
+    frames out of each stack; traces do the same over slice nesting. pstats
+    rows and flat SVG nodes carry no stacks, so each name stands on its own.
+    """
+    if not names or kind in {"perf_csv", "metrics_csv"}:
+        return parsed
+    if kind == "folded":
+        return parsed.filtered(names)
+    if kind == "profile":
+        return add_percentages([row for row in parsed if names.keep(row["function"])], key="cumtime")
+    if kind == "svg":
+        tree = FlameTree(parsed)
+        if not tree.names:
+            return [frame for frame in parsed if names.keep(str(frame.get("function", "")))]
+        return tree.to_trie().filtered(names).to_frames(tree.unit)
+    if kind == "pprof":
+        trie = parsed.get("stacks")
+        if trie is None:
+            entries = [entry for entry in parsed["entries"] if names.keep(entry["function"])]
+            return {**parsed, "entries": entries}
+        trie = trie.filtered(names)
+        flat, cum = trie.function_values()
+        return {**parsed, "stacks": trie, "total_samples_s": trie.total, "entries": pprof_entries(flat, cum, trie.total)}
+    events = parsed.get("events")
+    if events is None:
+        raise click.ClickException(
+            "--focus, --ignore, and --hide need per-slice rows; drop --summary-only, or pass --trace-rows for binary Perfetto traces"
+        )
+    if not isinstance(events, EventTable):
+        events = EventTable.from_dicts(events)
+    events.filter_names(names)
+    filtered = {**parsed, "events": events}
+    if parsed.get("kernel_metrics"):
+        filtered["kernel_metrics"] = [metric for metric in parsed["kernel_metrics"] if names.keep(metric["name"])]
+    return filtered
+
+
+# Kinds that share one normalized model and can be diffed against each other.
+DIFF_FAMILIES = {
+    "svg": "flamegraph",
+    "folded": "flamegraph",
+    "profile": "profile",
+    "pprof": "pprof",
+    "trace_json": "trace",
+    "perfetto": "trace",
+    "nsight_csv": "trace",
+}
+
+
+def normalize_profile(kind: str, parsed) -> Dict:
+    """Reduce a parse result to {function: (self, total)} plus the unit and grand total."""
+    functions: Dict[str, List[float]] = {}
+
+    def add(name: str, self_value: float, total_value: float) -> None:
+        entry = functions.setdefault(name, [0.0, 0.0])
+        entry[0] += self_value
+        entry[1] += total_value
+
+    unit = "s"
+    if kind in {"svg", "folded"}:
+        tree = parsed.to_tree() if kind == "folded" else FlameTree(parsed)
+        # Bare SVG widths are pixels, not time, so they only diff against other pixel widths.
+        unit = {"samples": "samples", "seconds": "s"}.get(tree.unit, tree.unit)
+        for entry in tree.function_totals():
+            add(entry["function"], entry["self"], entry["inclusive"])
+        total = tree.total
+    elif kind == "profile":
+        # Line numbers drift between revisions, so match on function and file only.
+        for entry in parsed:
+            name = f"{entry['func_name']} ({entry['filename']})" if "func_name" in entry else entry["function"]
+            add(name, entry.get("tottime", 0.0), entry.get("cumtime", 0.0))
+        total = sum(entry.get("tottime", 0.0) for entry in parsed)
+    elif kind == "pprof":
+        unit = "s" if parsed.get("unit", "seconds") == "seconds" else parsed["unit"]
+        for entry in parsed["entries"]:
+            add(entry["function"], entry["flat_s"], entry["cum_s"])
+        total = parsed.get("total_samples_s") or sum(entry["flat_s"] for entry in parsed["entries"])
+    else:
+        summary = trace_summary(parsed)
+        for name, entry in summary.by_name.items():
+            add(name, entry.get("self_s", entry["time_s"]), entry["time_s"])
+        total = sum(self_value for self_value, _ in functions.values())
+    return {"kind": kind, "unit": unit, "total": total, "functions": {name: tuple(values) for name, values in functions.items()}}
+
+
+def diff_rows(base: Dict, new: Dict) -> List[Dict]:
+    """Per-function self/inclusive deltas between two normalized profiles, largest regression first."""
+    if base["unit"] != new["unit"]:
+        raise ValueError(f"cannot diff {base['unit']} against {new['unit']}: the inputs measure different units")
+    base_total, new_total = base["total"], new["total"]
+    rows = []
+    for name in base["functions"].keys() | new["functions"].keys():
+        base_self, base_incl = base["functions"].get(name, (0.0, 0.0))
+        new_self, new_incl = new["functions"].get(name, (0.0, 0.0))
+        rows.append(
+            {
+                "function": name,
+                "base": base_self,
+                "new": new_self,
+                "delta": new_self - base_self,
+                "delta_incl": new_incl - base_incl,
+                "base_share": base_self / base_total * 100.0 if base_total > 0 else 0.0,
+                "new_share": new_self / new_total * 100.0 if new_total > 0 else 0.0,
+                "status": "new" if name not in base["functions"] else "vanished" if name not in new["functions"] else "",
+            }
+        )
+    rows.sort(key=lambda row: row["delta"], reverse=True)
+    return rows
+
+
+def _load_normalized(
+    kind: str, input_path: Path, jobs: int, cache: bool, trace_rows: bool, names: NameFilter | None = None, summary_only: bool = False
+) -> Dict:
+    parser = make_parser(kind, input_path, jobs, trace_rows, summary_only=summary_only)
+    parsed = run_parser(parser, input_path, ParseCache() if cache else None)
+    return normalize_profile(kind, filter_parsed(kind, parsed, names))
+
+
+def diff_inputs(
+    base_path: Path,
+    new_path: Path,
+    formatter: MarkdownFormatter,
+    top_n: int,
+    threshold: float,
+    jobs: int,
+    cache: bool,
+    trace_rows: bool,
+    names: NameFilter | None = None,
+    summary_only: bool = False,
+) -> str:
+    """Parse both inputs and format their per-function diff.
+
+    The two inputs are parsed side by side in worker processes, unless trace
+    JSON will be sharded across `jobs` workers anyway: then they are parsed one
+    after the other, so there is one pool at a time and the tables cross one
+    process boundary instead of two.
+    """
+    kinds = [input_kind(base_path), input_kind(new_path)]
+    families = [DIFF_FAMILIES.get(kind) for kind in kinds]
+    if None in families:
+        raise click.ClickException(f"Diff mode does not support {kinds[families.index(None)]} inputs")
+    if families[0] != families[1]:
+        raise click.ClickException(f"Cannot diff a {kinds[0]} input against a {kinds[1]} input")
+    if jobs > 1 and "trace_json" in kinds:
+        base, new = [
+            _load_normalized(kind, path, jobs, cache, trace_rows, names, summary_only) for kind, path in zip(kinds, (base_path, new_path))
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            futures = [
+                pool.submit(_load_normalized, kind, path, 1, cache, trace_rows, names, summary_only)
+                for kind, path in zip(kinds, (base_path, new_path))
+            ]
+            base, new = [future.result() for future in futures]
+    if base["unit"] != new["unit"]:
+        raise click.ClickException(
+            f"Cannot diff {base_path} ({base['unit']}) against {new_path} ({new['unit']}): the inputs measure different units"
+        )
+    return formatter.format_diff(base, new, str(base_path), str(new_path), top_n=top_n, hotspot_threshold=threshold)
+
+
+def collect_batch_inputs(target: str) -> List[Path]:
+    """Supported profile files under a directory (recursively) or matching a glob."""
+    root = Path(target)
+    candidates = sorted(root.rglob("*")) if root.is_dir() else sorted(Path(path) for path in glob.glob(target, recursive=True))
+    inputs = []
+    for path in candidates:
+        if not path.is_file():
+            continue
+        try:
+            input_kind(path)
+        except (click.ClickException, OSError, UnicodeDecodeError):
+            continue
+        inputs.append(path)
+    return inputs
+
+
+def batch_report_name(input_path: Path, root: Path | None) -> str:
+    """Flatten an input's path below the batch root into a unique markdown file name."""
+    relative = input_path.relative_to(root) if root is not None else Path(input_path.name)
+    return "__".join(relative.parts) + ".md"
+
+
+def _analyze_batch_file(
+    input_path: Path,
+    report_path: Path,
+    top_n: int,
+    threshold: float,
+    cache: bool,
+    trace_rows: bool,
+    names: NameFilter | None = None,
+    summary_only: bool = False,
+) -> Dict:
+    """Batch worker: parse one input, write its markdown, and return the index row."""
+    row = {"file": str(input_path), "report": report_path.name, "kind": None, "total": 0.0, "unit": "s", "top": None, "error": None}
+    try:
+        kind = row["kind"] = input_kind(input_path)
+        parser = make_parser(kind, input_path, 1, trace_rows, summary_only=summary_only)
+        parsed = filter_parsed(kind, run_parser(parser, input_path, ParseCache() if cache else None), names)
+        report_path.write_text(format_parsed(MarkdownFormatter(), kind, parsed, str(input_path), top_n, threshold))
+        if kind in DIFF_FAMILIES:
+            model = normalize_profile(kind, parsed)
+            row["total"], row["unit"] = model["total"], model["unit"]
+            if model["functions"]:
+                name, (self_value, _) = max(model["functions"].items(), key=lambda item: item[1][0])
+                row["top"] = (name, self_value)
+    except Exception as exc:  # one unreadable profile must not sink the whole batch
+        row["error"] = f"{type(exc).__name__}: {exc}"
+    return row
+
+
+def run_batch(
+    target: str,
+    output_dir: Path,
+    top_n: int,
+    threshold: float,
+    jobs: int,
+    cache: bool,
+    trace_rows: bool,
+    names: NameFilter | None = None,
+    summary_only: bool = False,
+) -> Path:
+    """Analyze every input under `target` in a process pool, echoing rows as they finish, then write index.md."""
+    inputs = collect_batch_inputs(target)
+    if not inputs:
+        raise click.ClickException(f"No supported profile files found for {target}")
+    root = Path(target) if Path(target).is_dir() else Path(os.path.commonpath([path.parent for path in inputs]))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rows = []
+    with ProcessPoolExecutor(max_workers=min(jobs, len(inputs))) as pool:
+        futures = [
+            pool.submit(
+                _analyze_batch_file, path, output_dir / batch_report_name(path, root), top_n, threshold, cache, trace_rows, names, summary_only
+            )
+            for path in inputs
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            row = future.result()
+            rows.append(row)
+            status = f"failed: {row['error']}" if row["error"] else f"-> {output_dir / row['report']}"
+            click.echo(f"[{done}/{len(inputs)}] {row['file']} {status}", err=True)
+    index_path = output_dir / "index.md"
+    index_path.write_text(MarkdownFormatter().format_batch_index(rows, target))
+    return index_path
+
+
+class ProfileIndex:
+    """One input loaded for serve mode, with its query indexes built up front.
+
+    Every input keeps its normalized {function: (self, total)} model, ranked
+    once by self and by total time. Trace inputs also keep the EventTable with
+    per-row self time, every row sorted by start time, and each track's rows
+    sorted by start time, so a time window or track filter is a bisect plus a
+    group-by over just the selected rows.
+    """
+
+    def __init__(self, path: Path, kind: str, parsed):
+        if kind not in DIFF_FAMILIES:
+            raise click.ClickException(f"Serve mode does not support {kind} inputs ({path})")
+        self.path = path
+        self.kind = kind
+        self.model = normalize_profile(kind, parsed)
+        functions = self.model["functions"]
+        self.ranked = {
+            "self": sorted(functions.items(), key=lambda item: item[1][0], reverse=True),
+            "total": sorted(functions.items(), key=lambda item: item[1][1], reverse=True),
+        }
+        events = parsed.get("events") if isinstance(parsed, dict) else None
+        self.events = events if isinstance(events, EventTable) and len(events) else None
+        if self.events is None:
+            return
+        events.resolve_begin_end()
+        self.self_s = events.self_times()
+        self.track_order: Dict[int, tuple] = {}
+        if numpy is not None:
+            ts = numpy.frombuffer(events.ts_us, dtype=numpy.float64)
+            self.end_us = float((ts + numpy.frombuffer(events.duration_s, dtype=numpy.float64) * 1_000_000.0).max())
+            order = numpy.argsort(ts, kind="stable")
+            self.order = array("q", order.astype(numpy.int64).tobytes())
+            self.order_ts = array("d", ts[order].tobytes())
+            tracks = numpy.frombuffer(events.track_ids, dtype=f"u{events.track_ids.itemsize}")[order]
+            by_track = order[numpy.argsort(tracks, kind="stable")]
+            track_ids, starts = numpy.unique(tracks[numpy.argsort(tracks, kind="stable")], return_index=True)
+            for track_id, rows in zip(track_ids.tolist(), numpy.split(by_track, starts[1:])):
+                self.track_order[track_id] = (array("q", rows.astype(numpy.int64).tobytes()), array("d", ts[rows].tobytes()))
+            return
+        self.end_us = max(ts + duration * 1_000_000.0 for ts, duration in zip(events.ts_us, events.duration_s))
+        order = sorted(range(len(events)), key=events.ts_us.__getitem__)
+        self.order = array("q", order)
+        self.order_ts = array("d", (events.ts_us[row] for row in order))
+        for row in order:
+            rows, stamps = self.track_order.setdefault(events.track_ids[row], (array("q"), array("d")))
+            rows.append(row)
+            stamps.append(events.ts_us[row])
+
+    def info(self, ident: int) -> Dict:
+        info = {
+            "id": ident,
+            "path": str(self.path),
+            "kind": self.kind,
+            "unit": self.model["unit"],
+            "total": self.model["total"],
+            "functions": len(self.model["functions"]),
+        }
+        if self.events is not None:
+            info["events"] = len(self.events)
+            info["tracks"] = [self.events.tracks[track] for track in self.track_order]
+            info["start_us"] = self.order_ts[0]
+            info["end_us"] = self.end_us
+        return info
+
+    def top(
+        self,
+        limit: int = 20,
+        names: NameFilter | None = None,
+        track: str | None = None,
+        start_us: float | None = None,
+        end_us: float | None = None,
+        sort: str = "self",
+    ) -> Dict:
+        """Top functions by self or total time; track and window filters need a trace input."""
+        if sort not in self.ranked:
+            raise ValueError("sort must be 'self' or 'total'")
+        names = names or NameFilter()
+        if track is None and start_us is None and end_us is None:
+            rows = [
+                {"name": name, "self": self_value, "total": total_value}
+                for name, (self_value, total_value) in self.ranked[sort]
+                if not names or names.keep(name)
+            ]
+            return {"unit": self.model["unit"], "rows": rows[:limit], "matched": len(rows)}
+        if self.events is None:
+            raise ValueError(f"track and time-window filters need a trace input, not {self.kind}")
+        selected = self._select_rows(track, start_us, end_us)
+        totals, selfs, counts = self._aggregate(selected)
+        events = self.events
+        rows = [
+            {"name": events.names[name_id], "self": selfs[name_id], "total": totals[name_id], "count": int(counts[name_id])}
+            for name_id in range(len(events.names))
+            if counts[name_id] and (not names or names.keep(events.names[name_id]))
+        ]
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        return {"unit": "s", "rows": rows[:limit], "matched": len(rows), "events": len(selected)}
+
+    def _select_rows(self, track: str | None, start_us: float | None, end_us: float | None) -> array:
+        """Rows starting inside [start_us, end_us) on tracks whose name matches `track`."""
+        low = -math.inf if start_us is None else start_us
+        high = math.inf if end_us is None else end_us
+        if track is None:
+            spans = [(self.order, self.order_ts)]
+        else:
+            pattern = re.compile(track)
+            spans = [
+                self.track_order[track_id]
+                for track_id in self.track_order
+                if pattern.search(self.events.tracks[track_id])
+            ]
+        selected = array("q")
+        for rows, stamps in spans:
+            selected.extend(rows[bisect.bisect_left(stamps, low) : bisect.bisect_left(stamps, high)])
+        return selected
+
+    def _aggregate(self, rows: array) -> tuple:
+        events = self.events
+        size = len(events.names)
+        if numpy is not None and len(rows):
+            picked = numpy.frombuffer(rows, dtype=numpy.int64)
+            ids = numpy.frombuffer(events.name_ids, dtype=f"u{events.name_ids.itemsize}")[picked]
+            totals = numpy.bincount(ids, weights=numpy.frombuffer(events.duration_s, dtype=numpy.float64)[picked], minlength=size)
+            selfs = numpy.bincount(ids, weights=numpy.frombuffer(self.self_s, dtype=numpy.float64)[picked], minlength=size)
+            return totals.tolist(), selfs.tolist(), numpy.bincount(ids, minlength=size).tolist()
+        totals = [0.0] * size
+        selfs = [0.0] * size
+        counts = [0] * size
+        for row in rows:
+            name_id = events.name_ids[row]
+            totals[name_id] += events.duration_s[row]
+            selfs[name_id] += self.self_s[row]
+            counts[name_id] += 1
+        return totals, selfs, counts
+
+
+class ProfileQueryHandler(BaseHTTPRequestHandler):
+    """JSON query endpoints over the ProfileIndex list in server.profiles.
+
+    GET /profiles                      loaded inputs
+    GET /top?profile=&n=&sort=self|total&focus=&ignore=&track=&start=&end=
+    GET /diff?base=&new=&n=&format=json|markdown
+    """
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        routes = {"/profiles": self._profiles, "/top": self._top, "/diff": self._diff}
+        route = routes.get(url.path.rstrip("/") or "/profiles")
+        if route is None:
+            self._send(404, {"error": f"unknown endpoint {url.path}", "endpoints": sorted(routes)})
+            return
+        started = time.perf_counter()
+        try:
+            status, body = route(params)
+        except (KeyError, ValueError, re.error) as exc:
+            status, body = 400, {"error": str(exc.args[0]) if isinstance(exc, KeyError) else str(exc)}
+        if isinstance(body, dict):
+            body["elapsed_ms"] = (time.perf_counter() - started) * 1000.0
+        self._send(status, body)
+
+    def _profile(self, params: Dict, key: str = "profile") -> ProfileIndex:
+        wanted = params.get(key, "0")
+        profiles = self.server.profiles
+        if wanted.isdigit() and int(wanted) < len(profiles):
+            return profiles[int(wanted)]
+        for profile in profiles:
+            if wanted in {str(profile.path), profile.path.name}:
+                return profile
+        raise KeyError(f"no loaded profile {wanted!r}")
+
+    def _profiles(self, params: Dict) -> tuple:
+        return 200, {"profiles": [profile.info(ident) for ident, profile in enumerate(self.server.profiles)]}
+
+    def _top(self, params: Dict) -> tuple:
+        profile = self._profile(params)
+        result = profile.top(
+            limit=int(params.get("n", 20)),
+            names=NameFilter(params.get("focus"), params.get("ignore")),
+            track=params.get("track"),
+            start_us=float(params["start"]) if "start" in params else None,
+            end_us=float(params["end"]) if "end" in params else None,
+            sort=params.get("sort", "self"),
+        )
+        return 200, {"profile": str(profile.path), **result}
+
+    def _diff(self, params: Dict) -> tuple:
+        base, new = self._profile(params, "base"), self._profile(params, "new")
+        if DIFF_FAMILIES[base.kind] != DIFF_FAMILIES[new.kind]:
+            raise ValueError(f"cannot diff a {base.kind} input against a {new.kind} input")
+        limit = int(params.get("n", 20))
+        if params.get("format") == "markdown":
+            return 200, MarkdownFormatter().format_diff(base.model, new.model, str(base.path), str(new.path), top_n=limit)
+        rows = diff_rows(base.model, new.model)
+        return 200, {
+            "base": str(base.path),
+            "new": str(new.path),
+            "unit": new.model["unit"],
+            "base_total": base.model["total"],
+            "new_total": new.model["total"],
+            "regressions": [row for row in rows if row["delta"] > 0][:limit],
+            "improvements": [row for row in reversed(rows) if row["delta"] < 0][:limit],
+        }
+
+    def _send(self, status: int, body) -> None:
+        if isinstance(body, str):
+            payload, content_type = body.encode("utf-8"), "text/markdown; charset=utf-8"
+        else:
+            payload, content_type = json.dumps(body).encode("utf-8"), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def address_string(self) -> str:
+        # Unix socket peers have no (host, port) address.
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format: str, *args) -> None:
+        click.echo(f"{self.address_string()} {format % args}", err=True)
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def load_profiles(paths: List[Path], jobs: int, cache: bool, trace_rows: bool, names: NameFilter | None = None) -> List[ProfileIndex]:
+    parse_cache = ParseCache() if cache else None
+    profiles = []
+    for path in paths:
+        kind = input_kind(path)
+        parsed = run_parser(make_parser(kind, path, jobs, trace_rows), path, parse_cache)
+        profiles.append(ProfileIndex(path, kind, filter_parsed(kind, parsed, names)))
+    return profiles
+
+
+def make_query_server(address: str, profiles: List[ProfileIndex]):
+    """HTTP server on HOST:PORT, or on a Unix socket for `unix:PATH`.
+
+    A stale socket left at PATH is replaced; any other existing file is refused rather than deleted.
+    """
+    if address.startswith("unix:"):
+        socket_path = address[5:]
+        if not socket_path:
+            raise click.ClickException("--serve unix: needs a socket path")
+        try:
+            mode = os.lstat(socket_path).st_mode
+        except FileNotFoundError:
+            mode = None
+        if mode is not None:
+            if not stat.S_ISSOCK(mode):
+                raise click.ClickException(f"--serve refuses to replace {socket_path}: it exists and is not a socket")
+            os.unlink(socket_path)
+        server = UnixHTTPServer(socket_path, ProfileQueryHandler)
+    else:
+        host, _, port = address.rpartition(":")
+        if not port.isdigit():
+            raise click.ClickException(f"--serve expects HOST:PORT or unix:PATH, got {address!r}")
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), ProfileQueryHandler)
+    server.profiles = profiles
+    return server
 
 
 @click.command()
-@click.argument("input_file", type=click.Path(exists=True))
-@click.option("-o", "--output", type=click.Path(), help="Output markdown file (default: stdout)")
+@click.argument("input_files", metavar="[INPUT_FILE]...", nargs=-1, type=click.Path(exists=True))
+@click.option("-o", "--output", type=click.Path(), help="Output markdown file (default: stdout); report directory with --batch")
 @click.option("-n", "--top-n", type=int, default=50, help="Number of top functions or operations to display (default: 50)")
 @click.option("-t", "--threshold", type=float, default=1.0, help="Hotspot threshold percentage (default: 1.0)")
-def cli(input_file, output, top_n, threshold):
-    """Convert SVG, Go pprof, Python profile, Perfetto JSON, or CSV profiling exports to markdown."""
-    input_path = Path(input_file)
-    suffix = input_path.suffix.lower()
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    default=1,
+    help="Worker processes for sharded trace JSON parsing, --batch, or --merge; 0 uses every CPU (default: 1)",
+)
+@click.option("--cache/--no-cache", default=True, help="Reuse parse results cached under ~/.cache/flamegraph-analyzer (default: on); use --no-cache with a shared or untrusted cache directory")
+@click.option("--trace-rows", is_flag=True, help="Fetch every slice from trace_processor_shell instead of SQL aggregates")
+@click.option("--folded-out", type=click.Path(), help="Write the aggregated stacks of a folded input back out as folded text")
+@click.option("--svg-out", type=click.Path(), help="Render the aggregated stacks of a folded input as a flamegraph SVG")
+@click.option(
+    "--diff",
+    nargs=2,
+    type=click.Path(exists=True),
+    metavar="BASE NEW",
+    help="Compare two inputs of the same kind and rank per-function regressions",
+)
+@click.option(
+    "--batch",
+    metavar="DIR_OR_GLOB",
+    help="Analyze every supported file under a directory or matching a glob; -o names the report directory",
+)
+@click.option(
+    "--merge",
+    metavar="DIR_OR_GLOB",
+    help="Sum every .prof/.profile under a directory or matching a glob into one profile with per-input spread",
+)
+@click.option("--hot-paths", type=int, default=0, metavar="K", help="For pstats inputs, report the K heaviest call paths from the caller graph")
+@click.option("--time-column", metavar="NAME", help="Read a CSV as generic metrics and aggregate every numeric column into buckets of this column")
+@click.option(
+    "--serve",
+    metavar="ADDRESS",
+    help="Load every INPUT_FILE once and answer JSON queries over HTTP on HOST:PORT, or on a Unix socket with unix:PATH",
+)
+@click.option("--focus", metavar="REGEX", help="Keep only samples or slices with a frame (or enclosing slice) matching REGEX")
+@click.option("--ignore", metavar="REGEX", help="Drop samples or slices with a frame (or enclosing slice) matching REGEX")
+@click.option("--hide", metavar="REGEX", help="Remove frames or slices matching REGEX, charging their self time to the caller")
+@click.option(
+    "--summary-only",
+    is_flag=True,
+    help="Stream trace JSON into per-name/per-track totals in bounded memory, skipping self time and the row-based sections",
+)
+def cli(
+    input_files,
+    output,
+    top_n,
+    threshold,
+    jobs,
+    cache,
+    trace_rows,
+    folded_out,
+    svg_out,
+    diff,
+    batch,
+    merge,
+    hot_paths,
+    time_column,
+    serve,
+    focus,
+    ignore,
+    hide,
+    summary_only,
+):
+    """Convert SVG, folded stacks, Go pprof, Python profile, Perfetto JSON (optionally gzipped), or CSV profiling exports to markdown."""
     formatter = MarkdownFormatter()
-
-    if suffix == ".svg":
-        markdown = formatter.format_flamegraph(FlamegraphParser(input_path).parse(), input_file)
-    elif suffix in {".profile", ".prof"}:
-        markdown = formatter.format_profile(ProfileParser(input_path).parse(), input_file, top_n=top_n, hotspot_threshold=threshold)
-    elif suffix == ".pprof":
-        markdown = formatter.format_go_pprof(GoPprofParser(input_path).parse(), input_file, top_n=top_n, hotspot_threshold=threshold)
-    elif suffix == ".json":
-        markdown = formatter.format_trace(PerfettoTraceParser(input_path).parse(), input_file, top_n=top_n)
-    elif suffix in {".pftrace", ".perfetto_trace", ".perfetto-trace", ".proto"}:
-        markdown = formatter.format_trace(PerfettoBinaryParser(input_path).parse(), input_file, top_n=top_n)
-    elif suffix == ".csv":
-        csv_format = detect_csv_format(input_path)
-        if csv_format == "perf_csv":
-            markdown = formatter.format_perf_csv(PerfCSVParser(input_path).parse(), input_file)
-        else:
-            markdown = formatter.format_trace(NsightCSVParser(input_path).parse(), input_file, top_n=top_n)
+    try:
+        names = NameFilter(focus, ignore, hide)
+    except ValueError as exc:
+        raise click.ClickException(str(exc)) from None
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    if cache:
+        # Check the cache limit once here rather than failing inside every batch or merge worker.
+        ParseCache.env_max_bytes()
+    if summary_only and serve:
+        raise click.UsageError("--serve keeps every slice for its time-window and track queries; drop --summary-only.")
+    if serve:
+        if not input_files or diff or batch or merge:
+            raise click.UsageError("--serve needs one or more INPUT_FILEs and cannot be combined with --diff, --batch, or --merge.")
+        started = time.perf_counter()
+        profiles = load_profiles([Path(path) for path in input_files], jobs, cache, trace_rows, names)
+        server = make_query_server(serve, profiles)
+        click.echo(f"Loaded {len(profiles)} input(s) in {time.perf_counter() - started:.2f}s; serving on {serve}", err=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if isinstance(server, UnixHTTPServer):
+                os.unlink(server.server_address)
+        return
+    if len(input_files) > 1:
+        raise click.UsageError("Pass a single INPUT_FILE, or several with --serve.")
+    input_file = input_files[0] if input_files else None
+    if batch:
+        if input_file is not None or diff:
+            raise click.UsageError("--batch cannot be combined with INPUT_FILE or --diff.")
+        index_path = run_batch(batch, Path(output or "flamegraph-analysis"), top_n, threshold, jobs, cache, trace_rows, names, summary_only)
+        click.echo(f"Batch index written to: {index_path}")
+        return
+    if merge:
+        if input_file is not None or diff:
+            raise click.UsageError("--merge cannot be combined with INPUT_FILE or --diff.")
+        inputs = collect_batch_inputs(merge)
+        others = [path for path in inputs if input_kind(path) != "profile"]
+        if Path(merge).is_dir():
+            # A directory is swept for pstats files; traces or logs next to them are not merge inputs.
+            inputs = [path for path in inputs if path not in others]
+        elif others:
+            raise click.ClickException(f"--merge only accepts pstats profiles, got {others[0]}")
+        if not inputs:
+            raise click.ClickException(f"No profile files found for {merge}")
+        merged = filter_parsed("profile", merge_profile_files(inputs, jobs, cache), names)
+        markdown = formatter.format_profile(merged, merge, top_n=top_n, hotspot_threshold=threshold, merged_inputs=len(inputs))
+    elif diff:
+        if input_file is not None:
+            raise click.UsageError("Pass either INPUT_FILE or --diff BASE NEW, not both.")
+        markdown = diff_inputs(Path(diff[0]), Path(diff[1]), formatter, top_n, threshold, jobs, cache, trace_rows, names, summary_only)
     else:
-        raise click.ClickException(f"Unsupported file type: {suffix}")
+        if input_file is None:
+            raise click.UsageError("Missing argument 'INPUT_FILE' (or pass --diff BASE NEW).")
+        input_path = Path(input_file)
+        kind = input_kind(input_path)
+        if (folded_out or svg_out) and kind != "folded":
+            raise click.ClickException("--folded-out and --svg-out need a .folded or .collapsed input")
+        if hot_paths and kind != "profile":
+            raise click.ClickException("--hot-paths needs a .prof or .profile input")
+        if hot_paths and names:
+            # The path search splits time along caller edges; dropping or splicing frames would change every share.
+            raise click.UsageError("--hot-paths cannot be combined with --focus, --ignore, or --hide.")
+        if time_column:
+            if kind not in {"perf_csv", "nsight_csv", "metrics_csv"}:
+                raise click.ClickException("--time-column needs a .csv input")
+            kind = "metrics_csv"
+        if names and kind in {"perf_csv", "metrics_csv"}:
+            raise click.ClickException("--focus, --ignore, and --hide need a profile, flamegraph, or trace input")
+        parse_cache = ParseCache() if cache else None
+        parsed = run_parser(make_parser(kind, input_path, jobs, trace_rows, time_column, summary_only), input_path, parse_cache)
+        parsed = filter_parsed(kind, parsed, names)
+        if folded_out:
+            with open(folded_out, "w", encoding="utf-8") as fh:
+                parsed.write_folded(fh)
+        if svg_out:
+            with open(svg_out, "w", encoding="utf-8") as fh:
+                parsed.write_svg(fh, title=input_path.name)
+        markdown = format_parsed(formatter, kind, parsed, input_file, top_n, threshold)
+        if hot_paths:
+            graph = run_parser(CallGraphParser(input_path), input_path, parse_cache)
+            markdown += "\n\n" + formatter.format_call_paths(graph, hot_paths)
 
     if output:
         Path(output).write_text(markdown)
@@ -0,0 +1,903 @@
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import sys
+from pathlib import Path
+
+import click
+import pytest
+from click.testing import CliRunner
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from flamegraph_analyzer import main  # noqa: E402
+
+
+TRACE_EVENTS = [
+    {"ph": "M", "name": "thread_name", "pid": 1, "tid": 1, "args": {"name": "main"}},
+    {"ph": "X", "name": "forward", "cat": "cpu_op", "pid": 1, "tid": 1, "ts": 0, "dur": 100},
+    {"ph": "X", "name": "volta_sgemm_kernel", "cat": "kernel", "pid": 0, "tid": 7, "ts": 10, "dur": 60},
+    {"ph": "X", "name": "Memcpy HtoD", "cat": "gpu_memcpy", "pid": 0, "tid": 7, "ts": 80, "dur": 20},
+    {"ph": "i", "name": "marker", "pid": 1, "tid": 1, "ts": 150},
+]
+
+
+def write_trace(tmp_path: Path, payload, name: str = "trace.json") -> Path:
+    path = tmp_path / name
+    text = json.dumps(payload)
+    if name.endswith(".gz"):
+        with gzip.open(path, "wt", encoding="utf-8") as fh:
+            fh.write(text)
+    else:
+        path.write_text(text)
+    return path
+
+
+def slice_event(name: str, ts: float, dur: float, tid: int = 1, cat: str = "", **args) -> dict:
+    """A complete (X) trace slice on pid 0; keyword arguments become its args."""
+    event = {"ph": "X", "name": name, "pid": 0, "tid": tid, "ts": ts, "dur": dur}
+    if cat:
+        event["cat"] = cat
+    if args:
+        event["args"] = args
+    return event
+
+
+def test_trace_event_stream_handles_chunk_boundaries_and_leading_metadata():
+    payload = {"schemaVersion": 1, "deviceProperties": [{"name": "GPU 0"}], "traceEvents": TRACE_EVENTS, "otherData": {}}
+    events = list(main.TraceEventStream(io.StringIO(json.dumps(payload)), chunk_size=7))
+    assert events == TRACE_EVENTS
+
+
+def test_trace_event_stream_accepts_unterminated_array_format():
+    text = "[" + ",\n".join(json.dumps(event) for event in TRACE_EVENTS) + ",\n"
+    events = list(main.TraceEventStream(io.StringIO(text), chunk_size=5))
+    assert events == TRACE_EVENTS
+
+
+def test_perfetto_trace_parser_streams_gzip_into_event_table(tmp_path):
+    plain = main.PerfettoTraceParser(write_trace(tmp_path, {"traceEvents": TRACE_EVENTS})).parse()
+    gzipped = main.PerfettoTraceParser(write_trace(tmp_path, {"traceEvents": TRACE_EVENTS}, "trace.json.gz")).parse()
+
+    summary = gzipped["events"].summarize()
+    assert summary.event_count == 4
+    assert summary.by_name["forward"]["time_s"] == 100 / 1_000_000.0
+    assert summary.transfer_count == 1
+    assert gzipped["trace_span_s"] == plain["trace_span_s"] == 150 / 1_000_000.0
+
+    formatter = main.MarkdownFormatter()
+    assert formatter.format_trace(plain, "trace.json") == formatter.format_trace(gzipped, "trace.json")
+
+
+def test_event_table_interns_strings_and_matches_dict_summary(monkeypatch):
+    events = [
+        {"name": "k", "category": "kernel", "track": "gpu", "workload": "GPU Compute", "duration_s": 0.5, "bytes": 0.0},
+        {"name": "copy", "category": "", "track": "gpu", "workload": "Memcpy HtoD", "duration_s": 0.25, "bytes": 1024.0},
+        {"name": "k", "category": "kernel", "track": "gpu", "workload": "GPU Compute", "duration_s": 0.5, "bytes": 0.0},
+        {"name": "dropped", "track": "cpu", "duration_s": -1.0},
+    ]
+    table = main.EventTable.from_dicts(events)
+    assert len(table) == 3
+    assert table.names.values == ["k", "copy"]
+    assert list(table.name_ids) == [0, 1, 0]
+
+    for accelerated in (main.numpy, None):
+        monkeypatch.setattr(main, "numpy", accelerated)
+        summary = table.summarize()
+        kernel = summary.by_name["k"]
+        assert {key: kernel[key] for key in ("time_s", "self_s", "count", "bytes", "workload")} == {
+            "time_s": 1.0,
+            "self_s": 1.0,
+            "count": 2,
+            "bytes": 0.0,
+            "workload": "GPU Compute",
+        }
+        assert abs(kernel["p50_s"] - 0.5) <= 0.5 * 0.01 and kernel["max_s"] == 0.5
+        assert summary.by_track == {"gpu": 1.25}
+        assert summary.by_workload_bytes["Memcpy HtoD"] == 1024.0
+        assert (summary.transfer_count, summary.transfer_bytes) == (1, 1024.0)
+
+
+def test_sharded_parse_matches_serial_output(tmp_path, monkeypatch):
+    events = [
+        {
+            "ph": "X" if idx % 5 else "i",
+            "name": ["aten::mm", "volta_sgemm_kernel", "Memcpy HtoD", "naïve_op"][idx % 4],
+            "cat": "kernel",
+            "pid": idx % 2,
+            "tid": idx % 3,
+            "ts": idx * 10,
+            "dur": idx % 7 + idx % 4 + idx % 6 / 2,
+            "args": {"inputs": [{"shape": [1, 2]}, {"shape": [3]}]},
+        }
+        for idx in range(300)
+    ]
+    events += [{"ph": "C", "name": "queue", "pid": 0, "ts": idx * 10, "args": {"depth": idx % 9}} for idx in range(0, 300, 25)]
+    # B/E pairs with an X between each B and its E, spread through the file so shard boundaries split some of them.
+    for idx in range(100):
+        events[idx * 6 : idx * 6] = [
+            {"ph": "B", "name": "step", "pid": 0, "tid": 9, "ts": idx * 30},
+            slice_event("fwd", idx * 30 + 5, 10, tid=9),
+            {"ph": "E", "pid": 0, "tid": 9, "ts": idx * 30 + 20 + idx % 3},
+        ]
+    path = write_trace(tmp_path, {"otherData": {"version": 1}, "traceEvents": events})
+
+    shards = main.plan_trace_shards(path, 3, window=64)
+    assert len(shards) == 3
+    assert shards[-1][1] == path.stat().st_size
+
+    serial = main.PerfettoTraceParser(path).parse()
+    sharded = main.PerfettoTraceParser(path, jobs=3).parse()
+    formatter = main.MarkdownFormatter()
+    assert formatter.format_trace(sharded, "trace.json") == formatter.format_trace(serial, "trace.json")
+
+    plan = main.plan_trace_shards
+    monkeypatch.setattr(main, "plan_trace_shards", lambda path, count: plan(path, count, window=64))
+    assert any(main._parse_trace_shard(path, start, end, rows=False)[4] for start, end in main.plan_trace_shards(path, 3)[1:])
+    serial_summary = main.PerfettoTraceParser(path, rows=False).parse()
+    sharded_summary = main.PerfettoTraceParser(path, jobs=3, rows=False).parse()
+    merged, whole = sharded_summary["summary"], serial_summary["summary"]
+    assert (merged.event_count, merged.by_track) == (whole.event_count, pytest.approx(whole.by_track))
+    assert merged.by_name["step"]["count"] == 100
+    for name, entry in whole.by_name.items():
+        assert merged.by_name[name] == {**entry, "time_s": pytest.approx(entry["time_s"]), "self_s": pytest.approx(entry["self_s"])}
+    assert formatter.format_trace(sharded_summary, "trace.json") == formatter.format_trace(serial_summary, "trace.json")
+
+
+def test_self_time_nests_complete_and_begin_end_slices(tmp_path, monkeypatch):
+    events = [
+        # Child X events are emitted before their parent, as Kineto does.
+        {"ph": "X", "name": "leaf", "pid": 1, "tid": 1, "ts": 10, "dur": 30},
+        {"ph": "X", "name": "inner", "pid": 1, "tid": 1, "ts": 5, "dur": 50},
+        {"ph": "X", "name": "outer", "pid": 1, "tid": 1, "ts": 0, "dur": 100},
+        {"ph": "B", "name": "step", "pid": 1, "tid": 2, "ts": 0},
+        {"ph": "X", "name": "leaf", "pid": 1, "tid": 2, "ts": 20, "dur": 40},
+        {"ph": "E", "pid": 1, "tid": 2, "ts": 200},
+        {"ph": "X", "name": "other_thread", "pid": 1, "tid": 3, "ts": 10, "dur": 30},
+    ]
+    data = main.PerfettoTraceParser(write_trace(tmp_path, {"traceEvents": events})).parse()
+    assert len(data["events"]) == 6
+
+    for accelerated in (main.numpy, None):
+        monkeypatch.setattr(main, "numpy", accelerated)
+        by_name = data["events"].summarize().by_name
+        assert round(by_name["outer"]["self_s"] * 1e6) == 50
+        assert round(by_name["inner"]["self_s"] * 1e6) == 20
+        assert round(by_name["leaf"]["self_s"] * 1e6) == 70
+        assert round(by_name["step"]["time_s"] * 1e6) == 200
+        assert round(by_name["step"]["self_s"] * 1e6) == 160
+        assert round(by_name["other_thread"]["self_s"] * 1e6) == 30
+
+    markdown = main.MarkdownFormatter().format_trace(data, "trace.json")
+    assert "| 1 | `step` |" in markdown
+    assert "| 2 | `leaf` |" in markdown
+
+
+class CountingParser:
+    def __init__(self, path: Path):
+        self.path = path
+        self.calls = 0
+
+    def parse(self):
+        self.calls += 1
+        return {"text": self.path.read_text(), "padding": "x" * 4096}
+
+
+def test_parse_cache_reuses_results_until_content_changes(tmp_path):
+    source = tmp_path / "input.txt"
+    source.write_text("first")
+    cache = main.ParseCache(tmp_path / "cache")
+    parser = CountingParser(source)
+
+    assert cache.get_or_parse(source, parser)["text"] == "first"
+    assert cache.get_or_parse(source, parser)["text"] == "first"
+    assert parser.calls == 1
+
+    source.write_text("second")
+    assert cache.get_or_parse(source, parser)["text"] == "second"
+    assert parser.calls == 2
+
+
+def test_parse_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = main.ParseCache(tmp_path / "cache", max_bytes=10_000)
+    sources = []
+    for idx in range(3):
+        source = tmp_path / f"input{idx}.txt"
+        source.write_text(str(idx))
+        sources.append(source)
+        parser = CountingParser(source)
+        cache.get_or_parse(source, parser)
+        if idx == 1:
+            # Touch the first entry so the second becomes least recently used.
+            cache.get_or_parse(sources[0], CountingParser(sources[0]))
+
+    entries = list((tmp_path / "cache").glob("*.pkl"))
+    assert len(entries) == 2
+    assert cache.load(cache.key(sources[1], "CountingParser")) is None
+    assert cache.load(cache.key(sources[0], "CountingParser")) is not None
+
+
+def test_malformed_cache_limit_is_a_usage_error(monkeypatch):
+    monkeypatch.setenv("FLAMEGRAPH_ANALYZER_CACHE_MAX_MB", "1g")
+    result = CliRunner().invoke(main.cli, [str(ROOT / "example.prof")])
+    assert result.exit_code == 1 and "FLAMEGRAPH_ANALYZER_CACHE_MAX_MB must be a whole number of MiB, got '1g'" in result.output
+    assert CliRunner().invoke(main.cli, [str(ROOT / "example.prof"), "--no-cache"]).exit_code == 0
+
+
+class SQLiteSession:
+    """Stand-in for TraceProcessorSession backed by a minimal copy of the trace_processor schema."""
+
+    def __init__(self):
+        import sqlite3
+
+        self.queries = []
+        self.db = sqlite3.connect(":memory:")
+        self.db.executescript(
+            """
+            CREATE TABLE process (upid INTEGER, pid INTEGER, name TEXT);
+            CREATE TABLE thread (utid INTEGER, upid INTEGER, tid INTEGER, name TEXT);
+            CREATE TABLE thread_track (id INTEGER, utid INTEGER);
+            CREATE TABLE slice (id INTEGER, track_id INTEGER, parent_id INTEGER, name TEXT, category TEXT, ts INTEGER, dur INTEGER);
+            INSERT INTO process VALUES (1, 100, 'python');
+            INSERT INTO thread VALUES (1, 1, 101, 'main');
+            INSERT INTO thread_track VALUES (10, 1);
+            INSERT INTO slice VALUES (1, 10, NULL, 'step', 'cpu_op', 0, 1000);
+            INSERT INTO slice VALUES (2, 10, 1, 'matmul_kernel', 'kernel', 100, 300);
+            INSERT INTO slice VALUES (3, 10, 1, 'matmul_kernel', 'kernel', 500, 100);
+            INSERT INTO slice VALUES (4, 10, NULL, 'unfinished', '', 2000, -1);
+            """
+        )
+
+    def query(self, sql):
+        self.queries.append(sql)
+        cursor = self.db.execute(sql)
+        columns = [column[0] for column in cursor.description]
+        return [{key: "" if value is None else str(value) for key, value in zip(columns, row)} for row in cursor]
+
+
+def test_perfetto_binary_parser_aggregates_inside_one_session():
+    session = SQLiteSession()
+    data = main.PerfettoBinaryParser(Path("trace.pftrace")).parse_session(session)
+    assert len(session.queries) == 1
+
+    summary = data["summary"]
+    assert data["trace_span_s"] == 1000 / 1_000_000_000.0
+    assert summary.event_count == 3
+    step = summary.by_name["step"]
+    assert (step["count"], step["self_s"] * 1e9) == (1, 600.0)
+    kernel = summary.by_name["matmul_kernel"]
+    assert kernel["time_s"] * 1e9 == 400.0
+    assert (kernel["p50_s"] * 1e9, kernel["max_s"] * 1e9) == (100.0, 300.0)
+    assert summary.by_track == {"python / main / pid=100 / tid=101": 1400 / 1_000_000_000.0}
+
+    markdown = main.MarkdownFormatter().format_trace(data, "trace.pftrace")
+    assert "| P50 | P95 | P99 | Max |" in markdown
+
+    rows = main.PerfettoBinaryParser(Path("trace.pftrace"), rows=True).parse_session(SQLiteSession())
+    assert len(rows["events"]) == 3
+
+
+def test_flamegraph_parser_streams_func_g_and_graphviz_nodes(tmp_path):
+    svg = tmp_path / "mixed.svg"
+    svg.write_text(
+        """<?xml version="1.0"?>
+<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" width="1200" height="100">
+  <g id="frames">
+    <g class="func_g"><title>main (2.00s, 100.00%)</title><rect x="0" y="80" width="1200" height="15"/></g>
+    <g class="func_g"><title>work (1.50s, 75.00%)</title><rect x="0" y="64" width="900" height="15"/></g>
+  </g>
+  <g id="graph0" class="graph">
+    <g id="node1" class="node"><g id="a_node1"><a xlink:title="runtime.mallocgc (0.50s)"><text>mallocgc</text></a></g></g>
+  </g>
+</svg>"""
+    )
+    parser = main.FlamegraphParser(svg)
+    assert [frame["function"] for frame in parser.iter_frames()] == ["main (2.00s, 100.00%)", "work (1.50s, 75.00%)", "runtime.mallocgc"]
+
+    frames = parser.parse()
+    assert [frame["time_s"] for frame in frames] == [2.0, 1.5, 0.5]
+    assert frames[1]["x"] == 0.0 and frames[1]["width"] == 900.0
+
+
+def test_flame_tree_rebuilds_icicle_geometry_and_merges_recursion(tmp_path):
+    def frame(name, samples, x, y, width):
+        return f'<g class="func_g"><title>{name} ({samples:,} samples)</title><rect x="{x}" y="{y}" width="{width}" height="15"/></g>'
+
+    svg = tmp_path / "icicle.svg"
+    svg.write_text(
+        '<svg xmlns="http://www.w3.org/2000/svg" width="1000" height="100">'
+        + frame("main", 1000, 0, 0, 1000)
+        + frame("walk", 600, 0, 16, 600)
+        + frame("walk", 400, 0, 32, 400)
+        + frame("leaf", 300, 0, 48, 300)
+        + frame("io", 200, 600, 16, 200)
+        + "</svg>"
+    )
+    frames = main.FlamegraphParser(svg).parse()
+    tree = main.FlameTree(frames)
+
+    assert tree.unit == "samples" and tree.total == 1000.0
+    assert tree.names == ["main", "walk", "io", "walk", "leaf"]
+    assert tree.parents == [-1, 0, 0, 1, 3]
+    totals = {entry["function"]: entry for entry in tree.function_totals()}
+    assert totals["walk"]["self"] == 300.0 and totals["walk"]["inclusive"] == 600.0
+    assert totals["main"]["self"] == 200.0
+    assert tree.heaviest_paths(1) == [(300.0, ["main", "walk", "walk", "leaf"])]
+
+    report = main.MarkdownFormatter().format_flamegraph(frames, svg.name)
+    assert "1. 30.00% self (300 samples): `main` -> `walk` -> `walk` -> `leaf`" in report
+
+
+def test_folded_stacks_aggregate_into_trie_and_round_trip(tmp_path):
+    folded = tmp_path / "stacks.folded"
+    folded.write_text("main;walk;walk;leaf 300\nmain;io 200\nmain;walk 100\nmain;io 50\nnot a stack line\nmain 150\n")
+    trie = main.FoldedStackParser(folded).parse()
+
+    assert trie.lines == 5 and trie.total == 800.0 and len(trie) == 5
+    out = io.StringIO()
+    trie.write_folded(out)
+    assert out.getvalue() == "main 150\nmain;io 250\nmain;walk 100\nmain;walk;walk;leaf 300\n"
+
+    report = main.MarkdownFormatter().format_folded(trie, folded.name)
+    assert "| 1 | `leaf` | 300 samples | 37.50% | 300 samples | 37.50% |" in report
+    assert "| 4 | `walk` | 100 samples | 12.50% | 400 samples | 50.00% |" in report
+
+    svg = tmp_path / "stacks.svg"
+    with svg.open("w") as fh:
+        trie.write_svg(fh)
+    tree = main.FlameTree(main.FlamegraphParser(svg).parse())
+    assert tree.heaviest_paths(1) == [(300.0, ["all", "main", "walk", "walk", "leaf"])]
+
+    empty = tmp_path / "empty.folded"
+    empty.write_text("# nothing recorded\n")
+    result = CliRunner().invoke(main.cli, [str(empty), "--no-cache", "--svg-out", str(tmp_path / "empty.svg")])
+    assert result.exit_code == 0, result.output
+    assert "No frames to draw" in (tmp_path / "empty.svg").read_text()
+
+
+def test_diff_ranks_regressions_and_new_or_vanished_hotspots(tmp_path):
+    base = tmp_path / "base.folded"
+    new = tmp_path / "new.folded"
+    base.write_text("main;walk;leaf 300\nmain;io 200\nmain;gone 100\n")
+    new.write_text("main;walk;leaf 500\nmain;io 150\nmain;fresh 80\n")
+
+    result = CliRunner().invoke(main.cli, ["--no-cache", "--diff", str(base), str(new)])
+    assert result.exit_code == 0, result.output
+    assert "- Change: +130 samples (+21.67%)" in result.output
+    regressions = result.output.split("## Regressions")[1].split("## Improvements")[0]
+    assert regressions.index("`leaf`") < regressions.index("`fresh` (new)")
+    assert "- `gone`: 100 samples (16.67%)" in result.output.split("## Vanished Hotspots")[1]
+
+    mixed = CliRunner().invoke(main.cli, ["--no-cache", "--diff", str(base), str(ROOT / "example.prof")])
+    assert mixed.exit_code != 0 and "Cannot diff a folded input against a profile input" in mixed.output
+
+    # A bare flamegraph SVG only has pixel widths, which are not samples.
+    svg = tmp_path / "widths.svg"
+    svg.write_text(
+        '<svg xmlns="http://www.w3.org/2000/svg"><g class="func_g"><title>main</title><rect x="0" y="0" width="900" height="15"/></g></svg>'
+    )
+    assert main.normalize_profile("svg", main.FlamegraphParser(svg).parse())["unit"] == "width"
+    units = CliRunner().invoke(main.cli, ["--no-cache", "--diff", str(svg), str(new)])
+    assert units.exit_code != 0 and "(width) against" in units.output and "(samples)" in units.output
+
+
+def test_batch_mode_writes_reports_and_ranked_index(tmp_path):
+    inputs = tmp_path / "nightly"
+    (inputs / "gpu").mkdir(parents=True)
+    (inputs / "cpu.prof").write_bytes((ROOT / "example.prof").read_bytes())
+    (inputs / "gpu" / "stacks.folded").write_text("main;walk 30\nmain;io 10\n")
+    write_trace(inputs / "gpu", TRACE_EVENTS, name="step.json")
+    (inputs / "notes.txt").write_text("not a profile\n")
+    reports = tmp_path / "reports"
+
+    result = CliRunner().invoke(main.cli, ["--no-cache", "--batch", str(inputs), "-o", str(reports), "-j", "2"])
+    assert result.exit_code == 0, result.output
+    assert sorted(path.name for path in reports.iterdir()) == ["cpu.prof.md", "gpu__stacks.folded.md", "gpu__step.json.md", "index.md"]
+    assert (reports / "gpu__stacks.folded.md").read_text().startswith("# Folded Stack Analysis: stacks.folded")
+
+    index = (reports / "index.md").read_text()
+    assert "- Files analyzed: 3" in index
+    ranked = [line.split(" | ")[1] for line in index.splitlines() if line.startswith("| ") and "](" in line]
+    assert ranked == ["[cpu.prof](cpu.prof.md)", "[step.json](gpu__step.json.md)", "[stacks.folded](gpu__stacks.folded.md)"]
+    assert "| `walk` | 30 samples | 75.00% |" in index
+
+
+def test_call_graph_heaviest_paths_split_time_across_callers():
+    main_fn, a, b, leaf, rec = (("app.py", line, name) for line, name in enumerate(["main", "a", "b", "leaf", "rec"]))
+    stats = {
+        main_fn: (1, 1, 1.0, 10.0, {}),
+        a: (1, 1, 0.5, 6.0, {main_fn: (1, 1, 0.5, 6.0)}),
+        b: (1, 1, 0.8, 3.0, {main_fn: (1, 1, 0.8, 3.0)}),
+        leaf: (2, 2, 6.0, 6.0, {a: (1, 1, 4.5, 4.5), b: (1, 1, 1.5, 1.5)}),
+        # Recursive function: the rec -> rec edge must not create an infinite path.
+        rec: (1, 3, 0.5, 0.5, {a: (1, 1, 0.5, 0.5), rec: (2, 2, 0.3, 0.3)}),
+    }
+    graph = main.CallGraph.from_stats(stats)
+    order, _ = graph.topological_dag()
+    assert [graph.labels[node] for node in order][:1] == ["main (app.py:0)"]
+
+    paths = graph.heaviest_paths(3)
+    assert [[name.split(" ")[0] for name, _ in path["frames"]] for path in paths] == [
+        ["main", "a", "leaf"],
+        ["main", "b", "leaf"],
+        ["main"],
+    ]
+    assert [round(path["self_time"], 6) for path in paths] == [4.5, 1.5, 1.0]
+    assert [round(flow, 6) for _, flow in paths[0]["frames"]] == [10.0, 6.0, 4.5]
+    assert round(graph.total, 6) == 10.0
+
+    report = main.MarkdownFormatter().format_call_paths(graph, 1)
+    assert "1. `leaf (app.py:3)`: 4.500s own time (45.00% of total)" in report
+
+
+def test_merge_profiles_sums_runs_and_flags_uneven_functions(tmp_path):
+    def row(name, tottime, cumtime, ncalls=1):
+        return {"function": name, "func_name": name, "ncalls": ncalls, "tottime": tottime, "cumtime": cumtime}
+
+    merged = main.merge_profiles(
+        [
+            [row("steady", 1.0, 2.0), row("spiky", 0.1, 0.1)],
+            [row("steady", 1.0, 2.0, ncalls=3), row("spiky", 2.9, 2.9)],
+            [row("steady", 1.0, 2.0)],
+        ]
+    )
+    by_name = {entry["function"]: entry for entry in merged}
+    assert [entry["function"] for entry in merged] == ["steady", "spiky"]
+    assert by_name["steady"]["ncalls"] == 5 and by_name["steady"]["cumtime"] == 6.0 and by_name["steady"]["cumtime_cv"] == 0.0
+    assert by_name["spiky"]["runs"] == 2 and by_name["spiky"]["cumtime_min"] == 0.0 and by_name["spiky"]["cumtime_max"] == 2.9
+    assert by_name["spiky"]["cumtime_cv"] > main.HIGH_VARIANCE_CV
+
+    report = main.MarkdownFormatter().format_profile(merged, "workers", merged_inputs=3)
+    assert "| 2 | `spiky` | 1.000s | 1.344s | 0.000s | 2.900s | 1.34 | 2/3 | high variance |" in report
+
+    workers = tmp_path / "workers"
+    workers.mkdir()
+    for idx in range(3):
+        (workers / f"worker{idx}.prof").write_bytes((ROOT / "example.prof").read_bytes())
+    trace = write_trace(workers, {"traceEvents": []})
+    result = CliRunner().invoke(main.cli, ["--no-cache", "--merge", str(workers), "-j", "2"])
+    assert result.exit_code == 0, result.output
+    assert "- Inputs merged: 3" in result.output and "- High-variance functions (stddev >= 50% of mean): 0" in result.output
+
+    named = CliRunner().invoke(main.cli, ["--no-cache", "--merge", str(trace)])
+    assert named.exit_code != 0 and "--merge only accepts pstats profiles" in named.output
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number: int, value) -> bytes:
+    if isinstance(value, int):
+        return _varint(number << 3) + _varint(value)
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def _packed(values) -> bytes:
+    return b"".join(_varint(value) for value in values)
+
+
+def test_go_pprof_parser_decodes_profile_proto_without_go(tmp_path, monkeypatch):
+    strings = ["", "samples", "count", "cpu", "nanoseconds", "main.main", "main.work", "main.inlined", "runtime.main"]
+    functions = [_field(5, _field(1, idx + 1) + _field(2, strings.index(name))) for idx, name in enumerate(strings[5:])]
+    locations = [
+        _field(4, _field(1, 1) + _field(4, _field(1, 3)) + _field(4, _field(1, 2))),  # main.inlined inlined into main.work
+        _field(4, _field(1, 2) + _field(4, _field(1, 1))),
+        _field(4, _field(1, 3) + _field(4, _field(1, 4))),
+    ]
+    samples = [
+        _field(2, _field(1, _packed([1, 2, 3])) + _field(2, _packed([3, 30_000_000]))),
+        _field(2, _field(1, _packed([2, 3])) + _field(2, _packed([1, 10_000_000]))),
+        _field(2, _field(1, _packed([1, 2, 3])) + _field(2, _packed([1, 10_000_000]))),
+    ]
+    message = (
+        _field(1, _field(1, 1) + _field(2, 2))
+        + _field(1, _field(1, 3) + _field(2, 4))
+        + b"".join(samples + locations + functions)
+        + b"".join(_field(6, value.encode()) for value in strings)
+        + _field(10, 2_000_000_000)
+    )
+    profile = tmp_path / "cpu.pprof"
+    profile.write_bytes(gzip.compress(message))
+    monkeypatch.setattr(main.shutil, "which", lambda name: None)
+
+    data = main.GoPprofParser(profile).parse()
+    assert data["duration_s"] == 2.0 and data["unit"] == "seconds" and data["sample_type"] == "cpu"
+    assert abs(data["total_samples_s"] - 0.05) < 1e-12
+    entries = {entry["function"]: entry for entry in data["entries"]}
+    assert data["entries"][0]["function"] == "main.inlined"
+    assert abs(entries["main.inlined"]["flat_s"] - 0.04) < 1e-12 and entries["main.work"]["flat_s"] == 0.0
+    assert abs(entries["main.main"]["flat_s"] - 0.01) < 1e-12 and abs(entries["main.main"]["cum_s"] - 0.05) < 1e-12
+    assert list(data["stacks"].iter_folded()) == ["runtime.main;main.main 0.01", "runtime.main;main.main;main.work;main.inlined 0.04"]
+
+    report = main.MarkdownFormatter().format_go_pprof(data, profile.name)
+    assert "| 1 | `main.inlined` | 0.04s | 80.00% | 0.04s | 80.00% |" in report
+
+
+def write_perf_csv(path: Path, rows) -> Path:
+    fields = ["t_unix", "fps", "frame_max_ms", "frame_p99_ms", "update_max_ms", "draw_max_ms", "heap_alloc", "heap_inuse"]
+    fields += ["pause_delta_ns", "num_gc_delta", "wave", "enemies", "bullets"]
+    defaults = {"update_max_ms": 2.0, "draw_max_ms": 4.0, "heap_alloc": 64 << 20, "heap_inuse": 80 << 20, "pause_delta_ns": 0}
+    defaults.update(num_gc_delta=0, wave=1, enemies=5, bullets=50)
+    lines = [",".join(fields)]
+    for idx, row in enumerate(rows):
+        values = {"t_unix": 1000 + idx, **defaults, **row}
+        lines.append(",".join(str(values[field]) for field in fields))
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def test_perf_csv_trims_warmup_and_reports_windows(tmp_path):
+    warmup = [{"fps": 30.0 + idx % 3, "frame_max_ms": 60.0, "frame_p99_ms": 45.0} for idx in range(20)]
+    steady = [{"fps": 60.0 + idx % 3, "frame_max_ms": 17.0 + idx % 5, "frame_p99_ms": 16.5} for idx in range(100)]
+    data = main.PerfCSVParser(write_perf_csv(tmp_path / "perf.csv", warmup + steady), warmup_scan_rows=50, window_rows=30).parse()
+
+    assert data["samples"] == 120 and data["warmup"]["rows"] == 20 and data["steady_rows"] == 100
+    assert data["metrics"]["fps"].min == 60.0 and data["metrics"]["frame_max_ms"].max == 21.0
+    assert abs(data["metrics"]["fps"].quantile(0.5) - 61.0) <= 61.0 * 0.01
+    assert [window["rows"] for window in data["windows"]] == [30, 30, 30, 10]
+    assert data["windows"][0]["start"] == 1020 and data["windows"][0]["frame_max_p99"] == 21.0
+    assert len(data["worst_rows"]) == 5 and all(row["frame_max_ms"] == 21.0 for row in data["worst_rows"])
+
+    report = main.MarkdownFormatter().format_perf_csv(data, "perf.csv")
+    assert "- Warm-up trimmed: first 20 samples, avg FPS 30.95" in report
+    assert "| 1020 | 30 | 61.0 | 19.00 | 21.00 | 21.00 |" in report
+
+    # Long logs keep a bounded, evenly strided subset of the windows.
+    parser = main.PerfCSVParser(tmp_path / "perf.csv", warmup_scan_rows=50, window_rows=30)
+    parser.MAX_WINDOWS = 2
+    sampled = parser.parse()
+    assert [window["start"] for window in sampled["windows"]] == [1020, 1080]
+    assert (sampled["window_count"], sampled["window_stride"]) == (4, 2)
+    assert "Showing 1 of every 2 non-overlapping windows (4 total)." in main.MarkdownFormatter().format_perf_csv(sampled, "perf.csv")
+
+    # A slowdown later in the run is a regression, not warm-up, and is kept.
+    regression = [{"fps": 60.0, "frame_max_ms": 17.0, "frame_p99_ms": 16.0}] * 40 + [{"fps": 40.0, "frame_max_ms": 30.0, "frame_p99_ms": 28.0}] * 40
+    data = main.PerfCSVParser(write_perf_csv(tmp_path / "regression.csv", regression)).parse()
+    assert data["warmup"]["rows"] == 0 and data["steady_rows"] == 80
+
+
+def test_perf_csv_attributes_frame_spikes_to_gc_and_update(tmp_path):
+    rows = [{"fps": 60.0, "frame_max_ms": 16.0, "frame_p99_ms": 15.0, "heap_alloc": (64 + idx) << 20} for idx in range(60)]
+    rows[20].update(frame_max_ms=40.0, pause_delta_ns=20_000_000, num_gc_delta=1)
+    rows[40].update(frame_max_ms=36.0, update_max_ms=22.0)
+    rows[41].update(frame_max_ms=36.0, update_max_ms=22.0)
+    data = main.PerfCSVParser(write_perf_csv(tmp_path / "perf.csv", rows), trim_warmup=False).parse()
+
+    stutter = data["stutter"]
+    assert (stutter["spikes"], stutter["clusters"]) == (3, 2)
+    assert stutter["jank_ms"] == {"gc": 20.0, "update": 40.0, "draw": 0.0, "unexplained": 4.0}
+    worst = stutter["worst_clusters"]
+    assert [(cluster["rows"], cluster["source"]) for cluster in worst] == [(2, "update"), (1, "gc")]
+    assert worst[1]["start"] == 1020 and worst[1]["gc"] == 1
+    assert stutter["gc_heap_growth"] == stutter["heap_growth"] == 1 << 20
+
+    markdown = main.MarkdownFormatter().format_perf_csv(data, "perf.csv")
+    assert "| GC pause | 20.0 | 31.2% |" in markdown
+    assert "Heap growth before GC-driven clusters: 1.00 MiB/s over 1 clusters" in markdown
+
+
+def test_metrics_csv_infers_types_and_buckets_by_time(tmp_path, monkeypatch):
+    lines = ["elapsed_s,latency_ms,requests,host,started_at"]
+    for idx in range(40):
+        latency = "" if idx == 7 else f"{idx % 4 + 0.5}"
+        lines.append(f"{idx * 0.5},{latency},{idx},h{idx % 2},2024-05-01T00:00:{idx:02d}Z")
+    lines.append("20.0,bogus,1.5")
+    path = tmp_path / "metrics.csv"
+    path.write_text("\n".join(lines) + "\n")
+    assert main.input_kind(path) == "metrics_csv"
+    # Infer from the first rows only, so the later fractional and bogus cells exercise widening and invalid counts.
+    monkeypatch.setattr(main.MetricsCSVParser, "INFER_ROWS", 10)
+
+    for accelerated in (main.numpy, None):
+        monkeypatch.setattr(main, "numpy", accelerated)
+        data = main.MetricsCSVParser(path, time_column="elapsed_s").parse()
+        table = data["table"]
+        assert table.types == ["float", "float", "float", "string", "datetime"]
+        assert (data["rows"], table.columns[2].typecode) == (41, "d")
+        latency = data["stats"]["latency_ms"]
+        assert (latency["count"], latency["missing"], latency["invalid"]) == (39, 2, 1)
+        assert (latency["min"], latency["max"], latency["p50"]) == (0.5, 3.5, 1.5)
+        assert data["stats"]["host"]["top"] == [("h0", 20), ("h1", 20)] and data["stats"]["host"]["missing"] == 1
+        assert data["stats"]["started_at"]["max"] - data["stats"]["started_at"]["min"] == 39.0
+
+        buckets = data["time"]
+        assert buckets["width"] == 0.5
+        assert [bucket["rows"] for bucket in buckets["buckets"]] == [1] * 41
+        assert buckets["buckets"][7]["means"]["latency_ms"] is None
+        assert buckets["buckets"][-1]["means"] == {"latency_ms": None, "requests": 1.5}
+
+    result = CliRunner().invoke(main.cli, [str(path), "--no-cache", "--time-column", "elapsed_s"])
+    assert result.exit_code == 0, result.output
+    assert "| `requests` | float | 41 | 0 |" in result.output
+    assert "## Time Buckets by `elapsed_s` (width 0.5)" in result.output
+
+
+def test_trace_summary_sketches_per_name_and_track_merge(monkeypatch):
+    durations = [0.001 * (idx % 100 + 1) for idx in range(1000)] + [0.0]
+    events = [{"name": "step", "track": f"tid={idx % 2}", "duration_s": duration} for idx, duration in enumerate(durations)]
+    table = main.EventTable.from_dicts(events)
+
+    sketches = {}
+    for accelerated in (main.numpy, None):
+        monkeypatch.setattr(main, "numpy", accelerated)
+        sketches[accelerated] = main.group_sketches(table.name_ids, table.duration_s, 1)[0]
+    fast, slow = sketches.values()
+    assert (fast.count, fast.zero_count, fast.min, fast.max) == (slow.count, slow.zero_count, 0.0, 0.1)
+    assert fast.bins == slow.bins
+    assert abs(fast.quantile(0.99) - 0.099) <= 0.099 * 0.01
+
+    halves = [main.EventTable.from_dicts(events[:500]).summarize(), main.EventTable.from_dicts(events[500:]).summarize()]
+    halves[0].merge(halves[1])
+    merged = halves[0]
+    whole = table.summarize()
+    assert merged.by_name["step"]["p95_s"] == whole.by_name["step"]["p95_s"]
+    assert merged.track_sketches["tid=0"].count == 501 and merged.by_name["step"]["max_s"] == 0.1
+
+    markdown = main.MarkdownFormatter().format_trace({"events": table}, "trace.json")
+    assert "| Track | Total Time | Slices | P50 | P99 | Max |" in markdown
+    assert f"{whole.by_name['step']['p99_s']:.6f}s | 0.100000s |" in markdown
+
+
+def test_concurrency_sweep_reports_overlap_and_gpu_gaps(tmp_path, monkeypatch):
+    events = [
+        slice_event("forward", 0, 800, cat="cpu_op"),
+        slice_event("sgemm", 0, 100, tid=7, cat="kernel"),
+        slice_event("sgemm", 150, 100, tid=7, cat="kernel"),
+        slice_event("relu", 600, 100, tid=7, cat="kernel"),
+        slice_event("relu_inner", 610, 50, tid=7, cat="kernel"),
+        slice_event("Memcpy HtoD (Pageable -> Device)", 50, 150, tid=8, cat="gpu_memcpy"),
+        slice_event("Memcpy HtoD (Pageable -> Device)", 300, 100, tid=8, cat="gpu_memcpy"),
+        {"ph": "i", "name": "marker", "pid": 0, "tid": 8, "ts": 500},
+    ]
+    data = main.PerfettoTraceParser(write_trace(tmp_path, {"traceEvents": events})).parse()
+    concurrency = data["events"].concurrency(max_gaps=2)
+    monkeypatch.setattr(main, "numpy", None)
+    assert data["events"].concurrency(max_gaps=2) == concurrency
+    monkeypatch.undo()
+
+    assert concurrency["busy_s"] == {"CPU Op": 800e-6, "GPU Compute": 300e-6, "Memcpy HtoD": 250e-6}
+    assert concurrency["overlap_s"][("GPU Compute", "Memcpy HtoD")] == pytest.approx(100e-6)
+    assert concurrency["device_tracks"] == 2
+    assert (concurrency["device_busy_s"], concurrency["device_span_s"]) == (pytest.approx(450e-6), 700e-6)
+    assert [(gap["track"], gap["start_us"], gap["gap_s"]) for gap in concurrency["gaps"]] == [
+        ("pid=0 / tid=7", 250.0, pytest.approx(350e-6)),
+        ("pid=0 / tid=8", 200.0, pytest.approx(100e-6)),
+    ]
+
+    markdown = main.MarkdownFormatter().format_trace(data, "trace.json")
+    assert "| GPU Compute + Memcpy HtoD | 0.000100s | 33.33% | 40.00% |" in markdown
+    assert "| pid=0 / tid=7 | 250.000 | 0.000250s | 0.350ms |" in markdown
+
+
+def test_counter_events_become_series_sampled_around_slices(tmp_path):
+    def counter(ts, **args):
+        return {"ph": "C", "name": "GPU Memory", "pid": 0, "ts": ts, "args": args}
+
+    events = [
+        slice_event("big_alloc", 100, 200),
+        slice_event("small", 400, 10),
+        counter(0, allocated=100, reserved=200, label="x"),
+        counter(350, allocated=120),
+        counter(150, allocated=300),
+        counter(500, allocated=120),
+    ]
+    path = write_trace(tmp_path, {"traceEvents": events})
+    data = main.PerfettoTraceParser(path).parse()
+    counters = data["counters"]
+    assert counters.names.values == ["pid=0 / GPU Memory / allocated", "pid=0 / GPU Memory / reserved"]
+    assert isinstance(counters.values, main.array)
+
+    allocated, reserved = counters.stats()
+    assert (allocated["samples"], allocated["min"], allocated["mean"], allocated["max"]) == (4, 100.0, 160.0, 300.0)
+    assert allocated["time_weighted"] == (100 * 150 + 300 * 200 + 120 * 150) / 500
+    assert (reserved["samples"], reserved["time_weighted"]) == (1, 200.0)
+    assert (counters.value_at(0, 99.0), counters.value_at(0, 300.0), counters.value_at(1, -1.0)) == (100.0, 300.0, None)
+
+    markdown = main.MarkdownFormatter().format_trace(data, "trace.json")
+    assert "| pid=0 / GPU Memory / allocated | 4 | 100 | 160 | 300 | 186 |" in markdown
+    assert "| `big_alloc` | pid=0 / tid=1 | 100.000 | 0.200ms | 100 -> 300 | 200 -> 200 |" in markdown
+
+
+def test_launch_latency_joins_correlation_and_flows(tmp_path):
+    def launch(ts, correlation=None):
+        args = {"correlation": correlation} if correlation is not None else {}
+        return slice_event("cudaLaunchKernel", ts, 3, cat="cuda_runtime", **args)
+
+    def kernel(name, ts, dur, correlation=None):
+        args = {"correlation": correlation} if correlation is not None else {}
+        return slice_event(name, ts, dur, tid=7, cat="kernel", **args)
+
+    events = [
+        launch(0, 1),
+        kernel("sgemm", 10, 20, 1),
+        kernel("sgemm", 30, 20, 2),
+        launch(8, 2),
+        launch(60, 3),
+        kernel("relu", 70, 10, 3),
+        launch(85),
+        {"ph": "s", "cat": "ac2g", "id": 4, "pid": 0, "tid": 1, "ts": 85},
+        {"ph": "f", "cat": "ac2g", "id": 4, "pid": 0, "tid": 7, "ts": 95, "bp": "e"},
+        kernel("relu", 95, 5),
+        launch(90, 5),
+        kernel("relu", 120, 10, 5),
+    ]
+    path = write_trace(tmp_path, {"traceEvents": events})
+    table = main.PerfettoTraceParser(path).parse()["events"]
+    sharded = main.EventTable(nested=True)
+    sharded.extend(table)
+    assert sharded.launch_links() == table.launch_links()
+    assert len(table.launch_links()) == 5
+
+    latency = table.launch_latency()
+    assert latency["by_name"]["sgemm"].count == 2 and latency["by_name"]["sgemm"].max == 22.0
+    assert (latency["by_name"]["relu"].count, latency["by_name"]["relu"].max) == (3, 30.0)
+    assert (latency["starved_s"], latency["starved_gaps"]) == (pytest.approx(35e-6), 2)
+    assert latency["stretches"] == [
+        {"track": "pid=0 / tid=7", "start_us": 50.0, "duration_s": pytest.approx(50e-6), "idle_s": pytest.approx(35e-6), "slices": 2}
+    ]
+
+    markdown = main.MarkdownFormatter().format_trace({"events": table}, "trace.json")
+    assert "- Device idle waiting on late launches: 0.035ms across 2 gaps" in markdown
+    assert "| pid=0 / tid=7 | 50.000 | 0.050ms | 0.035ms | 2 |" in markdown
+
+
+def test_kineto_attributes_device_time_and_ranks_host_syncs(tmp_path):
+    events = [
+        slice_event("nn.Module: Linear_0", 0, 100, cat="python_function"),
+        slice_event("aten::linear", 5, 60, cat="cpu_op"),
+        slice_event("aten::addmm", 10, 40, cat="cpu_op"),
+        slice_event("cudaLaunchKernel", 15, 5, cat="cuda_runtime", correlation=1),
+        slice_event("aten::item", 70, 25, cat="cpu_op"),
+        slice_event("aten::_local_scalar_dense", 72, 22, cat="cpu_op"),
+        slice_event("cudaStreamSynchronize", 75, 18, cat="cuda_runtime"),
+        slice_event("cudaDeviceSynchronize", 120, 30, cat="cuda_runtime"),
+        slice_event("sgemm", 20, 50, tid=7, cat="kernel", correlation=1),
+        slice_event("Memcpy DtoH (Device -> Pageable)", 80, 5, tid=7, cat="gpu_memcpy"),
+    ]
+    data = main.PerfettoTraceParser(write_trace(tmp_path, {"traceEvents": events})).parse()
+    table = data["events"]
+    workloads = {table.names[name_id]: table.workloads[workload_id] for name_id, workload_id in zip(table.name_ids, table.workload_ids)}
+    assert workloads["cudaLaunchKernel"] == "CPU Runtime" and workloads["cudaStreamSynchronize"] == "Synchronization"
+    assert (workloads["aten::addmm"], workloads["nn.Module: Linear_0"], workloads["sgemm"]) == ("CPU Op", "Python", "GPU Compute")
+    assert workloads["Memcpy DtoH (Device -> Pageable)"] == "Memcpy DtoH"
+
+    kineto = table.kineto_breakdown()
+    assert kineto["by_op"] == {"aten::addmm": (50e-6, 1)}
+    assert kineto["by_module"] == {"nn.Module: Linear_0": (50e-6, 1)}
+    assert (kineto["device_s"], kineto["unlinked_s"]) == (pytest.approx(55e-6), 5e-6)
+    assert [(sync["name"], sync["context"], sync["count"]) for sync in kineto["syncs"]] == [
+        ("cudaDeviceSynchronize", "(no Python frame)", 1),
+        ("aten::item", "nn.Module: Linear_0", 1),
+    ]
+    assert kineto["sync_total_s"] == pytest.approx(55e-6)
+
+    markdown = main.MarkdownFormatter().format_trace(data, "trace.json")
+    assert "| `aten::addmm` | 0.000050s | 90.91% | 1 |" in markdown
+    assert "| `aten::item` | `nn.Module: Linear_0` | 1 | 0.025ms | 0.025ms |" in markdown
+
+
+def test_serve_answers_top_window_track_and_diff_queries(tmp_path):
+    import threading
+    import urllib.request
+
+    base = write_trace(tmp_path, {"traceEvents": [slice_event("step", 0, 1000), slice_event("matmul", 100, 400)]})
+    new = [slice_event("step", 0, 2000), slice_event("matmul", 100, 1200), slice_event("matmul", 3000, 500, tid=2)]
+    new_path = write_trace(tmp_path, {"traceEvents": new + [slice_event("loader", 4000, 300, tid=2)]}, "new.json")
+    profiles = main.load_profiles([base, new_path], jobs=1, cache=False, trace_rows=False)
+    server = main.make_query_server("127.0.0.1:0", profiles)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def query(path):
+        with urllib.request.urlopen(url + path) as response:
+            return json.load(response)
+
+    try:
+        assert [profile["events"] for profile in query("/profiles")["profiles"]] == [2, 4]
+        top = query("/top?profile=new.json&n=2")
+        assert [(row["name"], row["self"]) for row in top["rows"]] == [("matmul", pytest.approx(1.7e-3)), ("step", pytest.approx(0.8e-3))]
+        window = query("/top?profile=1&start=2500&end=5000&ignore=^load&sort=total")
+        assert [(row["name"], row["count"]) for row in window["rows"]] == [("matmul", 1)]
+        assert query("/top?profile=1&track=tid%3D1")["events"] == 2
+        diff = query("/diff?base=0&new=1")
+        assert diff["regressions"][0]["function"] == "matmul"
+        assert diff["regressions"][0]["delta"] == pytest.approx(1.3e-3)
+        for bad in ("/top?profile=missing", "/top?focus=(", "/top?profile=1&track=("):
+            with pytest.raises(urllib.error.HTTPError) as error:
+                query(bad)
+            assert error.value.code == 400
+            assert json.load(error.value)["error"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    precious = tmp_path / "precious.txt"
+    precious.write_text("keep me")
+    with pytest.raises(click.ClickException, match="not a socket"):
+        main.make_query_server(f"unix:{precious}", profiles)
+    assert precious.read_text() == "keep me"
+    with pytest.raises(click.ClickException, match="HOST:PORT"):
+        main.make_query_server(str(tmp_path / "serve.sock"), profiles)
+
+
+def test_focus_ignore_hide_filter_stacks_and_trace_slices(tmp_path):
+    folded = tmp_path / "stacks.folded"
+    folded.write_text("main;run;parse;lex 5\nmain;run;eval 3\nmain;gc 2\nmain;run;parse 1\n")
+    trie = main.FoldedStackParser(folded).parse()
+    assert list(trie.filtered(main.NameFilter(focus="parse")).iter_folded()) == ["main;run;parse 1", "main;run;parse;lex 5"]
+    assert list(trie.filtered(main.NameFilter(ignore="^gc$", hide="^run$")).iter_folded()) == [
+        "main;eval 3",
+        "main;parse 1",
+        "main;parse;lex 5",
+    ]
+
+    names = main.NameFilter(hide="^run$")
+    svg_frames = main.filter_parsed("svg", trie.to_frames("samples"), names)
+    assert {entry["function"]: entry["self"] for entry in main.FlameTree(svg_frames).function_totals()} == {
+        "main": 0.0,
+        "parse": 1.0,
+        "lex": 5.0,
+        "eval": 3.0,
+        "gc": 2.0,
+    }
+    assert set(names._cache) == {"main", "run", "parse", "lex", "eval", "gc"}
+
+    trace = write_trace(
+        tmp_path,
+        {
+            "traceEvents": [
+                slice_event("step", 0, 100),
+                slice_event("forward", 0, 60),
+                slice_event("matmul", 10, 30),
+                slice_event("backward", 60, 40),
+                slice_event("matmul", 70, 20),
+            ]
+        },
+    )
+    parsed = main.filter_parsed("trace_json", main.PerfettoTraceParser(trace).parse(), main.NameFilter(hide="forward|backward"))
+    by_name = main.trace_summary(parsed).by_name
+    assert {name: entry["self_s"] for name, entry in by_name.items()} == {"step": pytest.approx(50e-6), "matmul": pytest.approx(50e-6)}
+
+    result = CliRunner().invoke(main.cli, [str(trace), "--no-cache", "--focus", "^forward$"])
+    assert result.exit_code == 0, result.output
+    assert "`backward`" not in result.output and "`forward`" in result.output
+
+    hot = CliRunner().invoke(main.cli, [str(ROOT / "example.prof"), "--no-cache", "--hot-paths", "3", "--ignore", "sleep"])
+    assert hot.exit_code == 2 and "--hot-paths cannot be combined" in hot.output
+
+
+def test_summary_only_trace_parse_matches_row_totals(tmp_path, monkeypatch):
+    events = [{"ph": "X", "name": f"op{idx % 3}", "pid": 0, "tid": idx % 2, "ts": idx * 10, "dur": idx % 7 + 1} for idx in range(50)]
+    events += [{"ph": "B", "name": "step", "pid": 0, "tid": 5, "ts": 0}, {"ph": "E", "pid": 0, "tid": 5, "ts": 400}]
+    trace = write_trace(tmp_path, {"traceEvents": events})
+    monkeypatch.setattr(main.PerfettoTraceParser, "SUMMARY_CHUNK", 8)
+
+    data = main.PerfettoTraceParser(trace, rows=False).parse()
+    assert "events" not in data
+    summary = data["summary"]
+    rows = main.trace_summary(main.PerfettoTraceParser(trace).parse())
+    assert summary.event_count == rows.event_count == 51
+    assert summary.by_track == pytest.approx(rows.by_track)
+    for name, entry in rows.by_name.items():
+        assert (summary.by_name[name]["count"], summary.by_name[name]["p95_s"]) == (entry["count"], entry["p95_s"])
+        assert summary.by_name[name]["time_s"] == pytest.approx(entry["time_s"])
+    assert summary.by_name["step"]["time_s"] == pytest.approx(400e-6)
+
+    result = CliRunner().invoke(main.cli, [str(trace), "--no-cache", "--summary-only"])
+    assert result.exit_code == 0, result.output
+    assert "Total self time" not in result.output and "`step`" in result.output
+    assert "Ranked by inclusive time" in result.output and "| Self |" not in result.output
+    assert result.output.index("`step`") < result.output.index("`op0`")